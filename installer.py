@@ -4,16 +4,38 @@
 import sys
 import os
 import json
+import queue
 import tempfile
 import threading
 import requests
+import urllib3
 import logging
 import time
+import hashlib
+import bz2
+import functools
+import math
+import mmap
+import random
+import errno
+import selectors
+import socket
+import email.utils
+import http.client
+import shutil
+import struct
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
 from pathlib import Path
+from urllib.parse import urljoin, quote
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QWidget, 
                            QStackedWidget, QHBoxLayout, QLabel, QFileDialog)
-from PyQt5.QtCore import Qt, QPropertyAnimation, QRect, pyqtSignal, QThread, QObject, QTimer
-from PyQt5.QtGui import QIcon, QPixmap, QFont, QColor, QPalette
+from PyQt5.QtCore import (Qt, QPropertyAnimation, QRect, pyqtSignal, QObject, QTimer,
+                          QRunnable, QThreadPool, QSize, QUrl)
+from PyQt5.QtGui import QIcon, QPixmap, QImage, QFont, QColor, QPalette
+from PyQt5.QtNetwork import QNetworkAccessManager, QNetworkRequest, QNetworkReply
 from PyQt5 import uic
 import ctypes
 import traceback
@@ -36,6 +58,93 @@ else:
 
 logger = logging.getLogger(__name__)
 
+# 版本信息接口
+INFO_URL = 'http://pcfs.eno.ink:3001/api/info'
+# 备用版本信息接口（逗号分隔），与 INFO_URL 同时请求，先返回有效数据的接口胜出，其余请求随即取消
+INFO_ENDPOINTS = [url.strip() for url in os.environ.get('BLORET_INFO_ENDPOINTS', '').split(',') if url.strip()]
+
+# 下载配置
+DOWNLOAD_CONNECTIONS = 4  # 分段下载的并行连接数，设为 1 则始终单连接下载
+DOWNLOAD_MIN_SEGMENT_SIZE = 1024 * 1024  # 每段最小 1MB，文件太小时不分段
+DOWNLOAD_CHUNK_MIN = 64 * 1024  # 每次读取的最小字节数
+DOWNLOAD_CHUNK_MAX = 4 * 1024 * 1024  # 每次读取的最大字节数
+DOWNLOAD_CHUNK_TARGET_TIME = 0.25  # 按实测速度调整读取大小，使每次读取约耗时 0.25 秒
+# urllib3 1.x 没有 read1，read 要读满才返回：分成小块读取，停滞看门狗才能及时看到到达的字节
+DOWNLOAD_READ_PIECE = 8 * 1024
+PROGRESS_INTERVAL = 0.1  # 下载进度信号的最小间隔（秒），与读取大小无关
+PROGRESS_SPEED_WINDOW = 2.0  # 当前速度的统计窗口（秒）
+PROGRESS_SPEED_SMOOTHING = 5.0  # 平滑速度（EWMA）的时间常数（秒），剩余时间按平滑速度估算
+
+# 下载校验：与 /api/info 中的 SHA-256 不一致时重新下载损坏的部分，最多尝试的次数
+DOWNLOAD_VERIFY_ATTEMPTS = 2
+
+# 边下载边解压：下载 zip 的同时按本地文件头顺序解压，结束时用中央目录校验
+STREAMING_EXTRACT = True
+
+# 并行解压配置
+EXTRACT_WORKERS = min(8, os.cpu_count() or 4)  # 解压线程数
+EXTRACT_CHUNK_SIZE = 1024 * 1024
+
+# 增量安装：安装目录中记录各文件 CRC-32 的索引文件
+INSTALL_INDEX_NAME = '.bloret-install-index.json'
+# 替换安装目录时始终保留的用户数据（相对安装目录），安装包中没有的其他旧文件不再保留
+USER_DATA_PATHS = ('.minecraft', 'config', 'config.json', 'log', 'logs')
+
+# 增量更新：已有安装时按文件清单只下载变化的文件
+DELTA_MAX_RATIO = 0.5  # 需要下载的字节超过全部文件大小的这个比例时，直接下载完整安装包
+MANIFEST_SUFFIX = '.manifest.json'
+PATCH_FORMATS = ('bsdiff4',)  # 支持的二进制补丁格式（BSDIFF40）
+PATCH_CHUNK_SIZE = 1024 * 1024
+
+# 镜像选择配置
+MIRROR_PROBE_BYTES = 256 * 1024  # 每个镜像测速时下载的字节数
+MIRROR_PROBE_TIMEOUT = 5  # 单个镜像测速的超时时间（秒）
+MIRROR_CHECK_WINDOW = 5.0  # 统计下载速度的滑动窗口（秒）
+MIRROR_SWITCH_RATIO = 0.3  # 实际速度低于测速结果的 30% 时切换到下一个镜像
+
+# 停滞检测：单个连接在滑动窗口内的速度低于下限时断开，从当前位置重新连接
+STALL_WINDOW = 10.0  # 统计窗口（秒）
+STALL_MIN_SPEED = 4 * 1024  # 速度下限（字节/秒）
+STALL_CHECK_INTERVAL = 0.5  # 检查间隔（秒）
+STALL_MAX_RESTARTS = 3  # 同一连接连续停滞超过该次数时放弃当前镜像
+
+# HTTP 连接池配置（所有网络请求共用一个会话，复用 keep-alive 连接）
+HTTP_POOL_SIZE = 16  # 每个主机保留的最大连接数，需不少于分段下载连接数 + 镜像测速连接数
+HTTP_POOL_HOSTS = 10  # 缓存连接池的主机数量（pcfs.eno.ink 及各镜像主机）
+HTTP_CONNECT_TIMEOUT = 5  # 建立连接的超时时间（秒）
+HTTP_READ_TIMEOUT = 30  # 读取数据的超时时间（秒）
+HTTP_MAX_RETRIES = 2  # 连接失败、5xx 等临时错误的自动重试次数（由 RetryPolicy 重试的请求不使用）
+HTTP_RETRY_BACKOFF = 0.5  # 重试间隔的退避系数（秒）
+# 网络传输后端：'requests' 在工作线程中阻塞请求；'qt' 用 QNetworkAccessManager 事件驱动，不需要工作线程
+NETWORK_BACKEND = os.environ.get('BLORET_NETWORK_BACKEND', 'requests')
+# 长期存在的工作线程数：获取版本信息、预下载/下载、安装以及已取消但尚未退出的任务共用
+WORKER_POOL_SIZE = 4
+# 下载和解压内部子任务（分段、测速、哈希、边下边解压、停滞检查、并行解压）共用的线程数
+TASK_POOL_SIZE = 32
+HAPPY_EYEBALLS_DELAY = 0.25  # 建立连接时依次尝试各地址的间隔（秒），IPv6 不通时很快改用 IPv4
+CONNECT_CANCEL_CHECK_INTERVAL = 0.1  # 建立连接期间检查请求是否已取消的间隔（秒）
+
+# 获取版本信息和下载失败时的重试策略（这些请求不使用连接池的自动重试，失败后从已下载的位置继续）
+RETRY_BASE_DELAY = 1.0  # 第一次重试前的最长等待时间（秒），之后每次翻倍，实际等待时间随机抖动
+RETRY_MAX_DELAY = 30.0  # 单次等待的上限（秒）
+INFO_RETRY_ATTEMPTS = 3  # 获取版本信息的最多尝试次数
+INFO_RETRY_MAX_ELAPSED = 30.0  # 获取版本信息的总耗时上限（秒），超过后不再重试
+DOWNLOAD_RETRY_ATTEMPTS = 5  # 下载的最多尝试次数（每次依次尝试所有镜像）
+DOWNLOAD_RETRY_MAX_ELAPSED = 300.0  # 下载重试的总耗时上限（秒）
+
+# 本地缓存配置
+CACHE_DIR = os.path.join(os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.cache'),
+                         'Bloret-Launcher-Setup', 'cache')
+ASSET_CACHE_MAX_SIZE = 20 * 1024 * 1024  # 界面资源缓存上限，超出后按最近最少使用淘汰
+INFO_CACHE_MAX_SIZE = 1024 * 1024  # 版本信息缓存上限
+# 完整安装包缓存（按 SHA-256 保存），修复、重装和多个用户安装时无需重新下载
+PACKAGE_CACHE_MAX_SIZE = int(os.environ.get('BLORET_PACKAGE_CACHE_SIZE', 512 * 1024 * 1024))
+# 只读的共享安装包缓存目录（如机房的网络共享），本地缓存未命中时查找
+SHARED_PACKAGE_CACHE_DIR = os.environ.get('BLORET_SHARED_PACKAGE_CACHE', '')
+# 安装统计记录：每次下载失败或安装完成时追加一行 JSON（不依赖日志开关），只保留最近 METRICS_HISTORY 条
+METRICS_FILE = os.path.join(os.path.dirname(CACHE_DIR), 'install-metrics.jsonl')
+METRICS_HISTORY = 20
+
 # 尝试导入 QFluentWidgets
 try:
     from qfluentwidgets import (FluentWindow, NavigationItemPosition, setTheme, Theme, 
@@ -52,6 +161,881 @@ except ImportError:
     from PyQt5.QtWidgets import (QPushButton, QProgressBar, QLabel, QScrollArea, 
                                QFrame, QRadioButton, QLineEdit, QCheckBox)
 
+# 共享 HTTP 会话（_http_session_no_retry 与它共用连接池，但不自动重试）
+_http_session = None
+_http_session_no_retry = None
+_http_session_lock = threading.Lock()
+
+# 主机名解析结果缓存：(主机, 端口) -> getaddrinfo 结果，进程内一直有效
+_resolved_hosts = {}
+_resolved_hosts_lock = threading.Lock()
+
+# 当前线程中正在执行的 RequestsTransport 请求（reply 属性），连接类把连接登记到请求上，取消时立即断开
+_active_request = threading.local()
+
+_CONNECT_IN_PROGRESS = {0, errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN,
+                        getattr(errno, 'WSAEWOULDBLOCK', errno.EWOULDBLOCK)}
+
+
+def resolve_host(host, port):
+    """解析主机的所有地址，并按 IPv6 / IPv4 交替排列（第一个地址的协议族优先）"""
+    key = (host, port)
+    with _resolved_hosts_lock:
+        cached = _resolved_hosts.get(key)
+    if cached is not None:
+        return cached
+    infos = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+    families = {}
+    for info in infos:
+        families.setdefault(info[0], []).append(info)
+    groups = list(families.values())
+    ordered = [group[i] for i in range(max(len(group) for group in groups)) for group in groups if i < len(group)]
+    with _resolved_hosts_lock:
+        _resolved_hosts[key] = ordered
+    return ordered
+
+
+def forget_host(host, port):
+    """删除主机的解析缓存（所有地址都连接失败时，下次重新解析）"""
+    with _resolved_hosts_lock:
+        _resolved_hosts.pop((host, port), None)
+
+
+def happy_eyeballs_connect(address, timeout=None, source_address=None, socket_options=None, cancelled=None):
+    """同时尝试主机的多个地址建立 TCP 连接，先连上的胜出（Happy Eyeballs，RFC 8305）
+    
+    按 resolve_host 的顺序每隔 HAPPY_EYEBALLS_DELAY 秒发起下一个地址的连接，某个地址失败时立即尝试下一个。
+    IPv6 不通的网络上不必等到连接超时才改用 IPv4。
+    cancelled() 返回 True 时（请求已取消）放弃连接，抛出 ConnectionAbortedError。
+    """
+    host, port = address
+    addresses = resolve_host(host, port)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    selector = selectors.DefaultSelector()
+    pending = set()
+    errors = []
+    winner = None
+    index = 0
+    next_start = time.monotonic()
+    try:
+        while winner is None:
+            if cancelled is not None and cancelled():
+                raise ConnectionAbortedError(f"连接 {host}:{port} 已取消")
+            now = time.monotonic()
+            if index < len(addresses) and (not pending or now >= next_start):
+                family, sock_type, proto, _, sockaddr = addresses[index]
+                index += 1
+                sock = None
+                try:
+                    sock = socket.socket(family, sock_type, proto)
+                    for option in socket_options or ():
+                        sock.setsockopt(*option)
+                    if source_address:
+                        sock.bind(source_address)
+                    sock.setblocking(False)
+                    result = sock.connect_ex(sockaddr)
+                    if result not in _CONNECT_IN_PROGRESS:
+                        raise OSError(result, os.strerror(result))
+                    selector.register(sock, selectors.EVENT_WRITE)
+                    pending.add(sock)
+                    next_start = now + HAPPY_EYEBALLS_DELAY
+                except OSError as e:
+                    errors.append(e)
+                    if sock is not None:
+                        sock.close()
+                continue
+            if not pending:
+                forget_host(host, port)
+                raise errors[-1] if errors else OSError(f"无法解析主机: {host}")
+            wait_time = next_start - now if index < len(addresses) else None
+            if deadline is not None:
+                if now >= deadline:
+                    raise socket.timeout(f"连接 {host}:{port} 超时")
+                wait_time = deadline - now if wait_time is None else min(wait_time, deadline - now)
+            if cancelled is not None:
+                wait_time = min(wait_time, CONNECT_CANCEL_CHECK_INTERVAL) if wait_time is not None \
+                    else CONNECT_CANCEL_CHECK_INTERVAL
+            for key, _ in selector.select(wait_time):
+                sock = key.fileobj
+                selector.unregister(sock)
+                pending.discard(sock)
+                error = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if error == 0 and winner is None:
+                    winner = sock
+                else:
+                    errors.append(OSError(error, os.strerror(error)))
+                    sock.close()
+                    # 失败时不必等待间隔，立即尝试下一个地址
+                    next_start = now
+        winner.setblocking(True)
+        winner.settimeout(timeout)
+        return winner
+    finally:
+        for sock in pending:
+            sock.close()
+        selector.close()
+
+
+class _HappyEyeballsConnectionMixin:
+    """用 happy_eyeballs_connect 建立连接的 urllib3 连接类
+    
+    在 RequestsTransport 请求中使用时把连接登记到该请求上，请求取消时立即断开，不必等到超时。
+    """
+    
+    def request(self, *args, **kwargs):
+        reply = getattr(_active_request, 'reply', None)
+        if reply is not None:
+            reply._attach(self)
+        return super().request(*args, **kwargs)
+    
+    def _new_conn(self):
+        timeout = self.timeout if isinstance(self.timeout, (int, float)) else None
+        reply = getattr(_active_request, 'reply', None)
+        try:
+            return happy_eyeballs_connect((self._dns_host, self.port), timeout,
+                                          self.source_address, self.socket_options,
+                                          (lambda: reply.aborted) if reply is not None else None)
+        except socket.gaierror as e:
+            name_resolution_error = getattr(urllib3.exceptions, 'NameResolutionError', None)
+            if name_resolution_error is not None:
+                raise name_resolution_error(self.host, self, e) from e
+            raise urllib3.exceptions.NewConnectionError(self, f"Failed to resolve {self.host}: {e}") from e
+        except socket.timeout as e:
+            raise urllib3.exceptions.ConnectTimeoutError(
+                self, f"Connection to {self.host} timed out. (connect timeout={self.timeout})") from e
+        except OSError as e:
+            raise urllib3.exceptions.NewConnectionError(self, f"Failed to establish a new connection: {e}") from e
+
+
+def _happy_eyeballs_pool_classes():
+    """连接池类：与 urllib3 默认的相同，只是建立连接时同时尝试多个地址"""
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+    
+    class HappyEyeballsHTTPConnection(_HappyEyeballsConnectionMixin, HTTPConnection):
+        pass
+    
+    class HappyEyeballsHTTPSConnection(_HappyEyeballsConnectionMixin, HTTPSConnection):
+        pass
+    
+    class HappyEyeballsHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = HappyEyeballsHTTPConnection
+    
+    class HappyEyeballsHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = HappyEyeballsHTTPSConnection
+    
+    return {'http': HappyEyeballsHTTPConnectionPool, 'https': HappyEyeballsHTTPSConnectionPool}
+
+
+def create_http_session(pool_size=None, max_retries=None, share_pool_with=None):
+    """创建带连接池和重试策略的 HTTP 会话（建立连接时同时尝试 IPv6 / IPv4 地址）
+    
+    share_pool_with 为另一个会话时复用它的连接池，两个会话只有重试策略不同。
+    """
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    pool_size = HTTP_POOL_SIZE if pool_size is None else pool_size
+    max_retries = HTTP_MAX_RETRIES if max_retries is None else max_retries
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        backoff_factor=HTTP_RETRY_BACKOFF,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        raise_on_status=False  # 重试用尽后返回最后的响应，由调用方 raise_for_status
+    )
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_HOSTS, pool_maxsize=pool_size, max_retries=retry)
+    if share_pool_with is not None:
+        adapter.poolmanager = share_pool_with.get_adapter('https://').poolmanager
+    else:
+        adapter.poolmanager.pool_classes_by_scheme = _happy_eyeballs_pool_classes()
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['User-Agent'] = 'Bloret-Launcher-Setup'
+    return session
+
+
+def get_http_session(retries=True):
+    """获取进程内共享的 HTTP 会话（线程安全，首次调用时创建）
+    
+    已由 RetryPolicy 负责重试的请求（获取版本信息、下载）传 retries=False，
+    避免连接池的自动重试叠加在 RetryPolicy 之下，使实际尝试次数和耗时成倍增加。
+    """
+    global _http_session, _http_session_no_retry
+    with _http_session_lock:
+        if _http_session is None:
+            _http_session = create_http_session()
+        if retries:
+            return _http_session
+        if _http_session_no_retry is None:
+            _http_session_no_retry = create_http_session(max_retries=0, share_pool_with=_http_session)
+        return _http_session_no_retry
+
+
+class InstallMetrics:
+    """安装过程的统计：各项网络操作的调用次数、重试次数、总耗时和出错类型"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._operations = {}
+    
+    def record(self, operation, retries, elapsed, errors):
+        with self._lock:
+            entry = self._operations.setdefault(operation, {'calls': 0, 'retries': 0, 'elapsed': 0.0, 'errors': {}})
+            entry['calls'] += 1
+            entry['retries'] += retries
+            entry['elapsed'] += elapsed
+            for kind, count in errors.items():
+                entry['errors'][kind] = entry['errors'].get(kind, 0) + count
+    
+    def snapshot(self):
+        """返回统计数据的副本：{操作: {calls, retries, elapsed, errors: {错误类型: 次数}}}"""
+        with self._lock:
+            return {name: dict(entry, errors=dict(entry['errors'])) for name, entry in self._operations.items()}
+    
+    def summary(self):
+        parts = []
+        for name, entry in self.snapshot().items():
+            errors = ', '.join(f"{kind}×{count}" for kind, count in entry['errors'].items())
+            parts.append(f"{name}: {entry['calls']} 次，重试 {entry['retries']} 次，耗时 {entry['elapsed']:.1f}s"
+                         + (f"（{errors}）" if errors else ''))
+        return '; '.join(parts) or '无'
+    
+    def save(self, result, path=None):
+        """把当前统计追加到记录文件（默认 METRICS_FILE），result 为 'success' 或错误信息"""
+        path = path or METRICS_FILE
+        record = {'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'result': result, 'operations': self.snapshot()}
+        try:
+            lines = []
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    lines = [line for line in f.read().splitlines() if line.strip()]
+            lines = lines[max(0, len(lines) - METRICS_HISTORY + 1):]
+            lines.append(json.dumps(record, ensure_ascii=False))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"写入安装统计失败: {e}")
+
+
+_install_metrics = InstallMetrics()
+
+
+def get_install_metrics():
+    """获取进程内共享的安装统计"""
+    return _install_metrics
+
+
+def _error_chain(error):
+    """依次返回异常及其原因（__cause__ / __context__，以及 requests / urllib3 包装的底层异常）"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        reason = getattr(error, 'reason', None)
+        if isinstance(reason, BaseException):
+            error = reason
+        elif error.args and isinstance(error.args[0], BaseException):
+            error = error.args[0]
+        else:
+            error = error.__cause__ or error.__context__
+
+
+class RetryPolicy:
+    """临时网络错误的重试策略：区分错误类型，按带随机抖动的指数退避重试，429/503 遵守 Retry-After"""
+    
+    def __init__(self, max_attempts, max_elapsed, base_delay=None, max_delay=None):
+        self.max_attempts = max_attempts
+        self.max_elapsed = max_elapsed
+        self.base_delay = RETRY_BASE_DELAY if base_delay is None else base_delay
+        self.max_delay = RETRY_MAX_DELAY if max_delay is None else max_delay
+    
+    @staticmethod
+    def classify(error):
+        """返回错误类型（dns / connect / timeout / reset / server / throttled / stalled），不可重试时返回 None"""
+        if isinstance(error, DownloadCancelledError):
+            return None
+        if isinstance(error, (MirrorTooSlowError, ConnectionStalledError)):
+            return 'stalled'
+        if isinstance(error, requests.HTTPError):
+            status = error.response.status_code if error.response is not None else 0
+            if status == 429:
+                return 'throttled'
+            if status >= 500 or status == 408:
+                return 'server'
+            # 404 等客户端错误重试也不会成功
+            return None
+        chain = list(_error_chain(error))
+        name_resolution_error = getattr(urllib3.exceptions, 'NameResolutionError', ())
+        if any(isinstance(cause, (socket.gaierror, name_resolution_error)) for cause in chain):
+            return 'dns'
+        if isinstance(error, requests.ConnectTimeout) or any(
+                isinstance(cause, (ConnectionRefusedError, urllib3.exceptions.NewConnectionError)) for cause in chain):
+            return 'connect'
+        if any(isinstance(cause, (requests.Timeout, socket.timeout, urllib3.exceptions.TimeoutError))
+               for cause in chain):
+            return 'timeout'
+        if any(isinstance(cause, (IncompleteDownloadError, ConnectionError, requests.ConnectionError,
+                                  requests.exceptions.ChunkedEncodingError, http.client.IncompleteRead,
+                                  urllib3.exceptions.ProtocolError)) for cause in chain):
+            return 'reset'
+        return None
+    
+    def delay(self, retry, error):
+        """第 retry 次重试前的等待时间：服务器给出 Retry-After 时按其等待，否则为 [0, 指数退避上限] 内的随机值"""
+        response = getattr(error, 'response', None)
+        if isinstance(error, requests.HTTPError) and response is not None and response.status_code in (429, 503):
+            retry_after = response.headers.get('retry-after', '')
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                pass
+            try:
+                return max(0.0, email.utils.parsedate_to_datetime(retry_after).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+    
+    def run(self, operation, func, cancel_event=None, on_retry=None):
+        """执行 func，遇到可重试的错误时等待后重试；结果（重试次数、耗时、错误类型）记入安装统计"""
+        started = time.monotonic()
+        retries = 0
+        errors = {}
+        try:
+            while True:
+                try:
+                    return func()
+                except Exception as e:
+                    kind = self.classify(e)
+                    if kind is None or (cancel_event is not None and cancel_event.is_set()):
+                        raise
+                    errors[kind] = errors.get(kind, 0) + 1
+                    delay = self.delay(retries, e)
+                    if retries + 1 >= self.max_attempts or time.monotonic() - started + delay > self.max_elapsed:
+                        raise
+                    retries += 1
+                    logger.warning(f"{operation} 失败（{kind}），{delay:.1f} 秒后第 {retries} 次重试: {e}")
+                    if on_retry is not None:
+                        on_retry()
+                    if cancel_event is not None:
+                        if cancel_event.wait(delay):
+                            raise DownloadCancelledError("下载已取消")
+                    else:
+                        time.sleep(delay)
+        finally:
+            get_install_metrics().record(operation, retries, time.monotonic() - started, errors)
+
+
+class AssetCache:
+    """远程资源的本地缓存：按 URL 保存内容及 ETag/Last-Modified，超出容量时按 LRU 淘汰"""
+    
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+        self.index_path = os.path.join(directory, 'index.json')
+        self._lock = threading.Lock()
+        self._index = None
+    
+    def _load_index(self):
+        if self._index is None:
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    self._index = json.load(f)
+            except Exception:
+                self._index = {}
+        return self._index
+    
+    def _save_index(self):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = self.index_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._index, f)
+            os.replace(tmp_path, self.index_path)
+        except Exception as e:
+            logger.warning(f"写入资源缓存索引失败: {e}")
+    
+    def _file_path(self, url):
+        return os.path.join(self.directory, hashlib.sha1(url.encode('utf-8')).hexdigest())
+    
+    def get(self, url):
+        """读取缓存内容，返回 (内容, 条目信息)，未命中时返回 (None, None)"""
+        with self._lock:
+            entry = self._load_index().get(url)
+            if entry is None:
+                return None, None
+            try:
+                with open(self._file_path(url), 'rb') as f:
+                    content = f.read()
+            except OSError:
+                # 缓存文件已丢失，删除失效的索引
+                del self._index[url]
+                self._save_index()
+                return None, None
+            entry['last_used'] = time.time()
+            self._save_index()
+            return content, dict(entry)
+    
+    def conditional_headers(self, url):
+        """根据缓存的校验信息生成条件请求头"""
+        with self._lock:
+            entry = self._load_index().get(url) or {}
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+    
+    def put(self, url, content, etag='', last_modified=''):
+        """写入缓存并按 LRU 淘汰超出容量的条目"""
+        with self._lock:
+            index = self._load_index()
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                tmp_path = self._file_path(url) + '.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(content)
+                os.replace(tmp_path, self._file_path(url))
+            except Exception as e:
+                logger.warning(f"写入资源缓存失败: {url}: {e}")
+                return
+            index[url] = {
+                'etag': etag or '',
+                'last_modified': last_modified or '',
+                'size': len(content),
+                'last_used': time.time()
+            }
+            self._evict(keep=url)
+            self._save_index()
+    
+    def touch(self, url, etag=None, last_modified=None):
+        """服务器返回 304（或内容未变化的 200）时刷新最近使用时间；提供 etag / last_modified 时一并更新"""
+        with self._lock:
+            entry = self._load_index().get(url)
+            if entry is not None:
+                entry['last_used'] = time.time()
+                if etag is not None:
+                    entry['etag'] = etag
+                if last_modified is not None:
+                    entry['last_modified'] = last_modified
+                self._save_index()
+    
+    def _evict(self, keep=None):
+        total = sum(entry.get('size', 0) for entry in self._index.values())
+        for url in sorted(self._index, key=lambda u: self._index[u].get('last_used', 0)):
+            if total <= self.max_size:
+                break
+            if url == keep:
+                continue
+            total -= self._index[url].get('size', 0)
+            del self._index[url]
+            try:
+                os.remove(self._file_path(url))
+            except OSError:
+                pass
+            logger.debug(f"淘汰资源缓存: {url}")
+
+
+_asset_cache = None
+_asset_cache_lock = threading.Lock()
+
+
+def get_asset_cache():
+    """获取共享的界面资源缓存"""
+    global _asset_cache
+    with _asset_cache_lock:
+        if _asset_cache is None:
+            _asset_cache = AssetCache(os.path.join(CACHE_DIR, 'assets'), ASSET_CACHE_MAX_SIZE)
+        return _asset_cache
+
+
+_info_cache = None
+
+
+def get_info_cache():
+    """获取 /api/info 响应的缓存（与图片缓存分开，避免被图片挤出）"""
+    global _info_cache
+    with _asset_cache_lock:
+        if _info_cache is None:
+            _info_cache = AssetCache(os.path.join(CACHE_DIR, 'metadata'), INFO_CACHE_MAX_SIZE)
+        return _info_cache
+
+
+def get_info_endpoints():
+    """返回所有版本信息接口，主接口在前"""
+    endpoints = [INFO_URL]
+    for url in INFO_ENDPOINTS:
+        if url not in endpoints:
+            endpoints.append(url)
+    return endpoints
+
+
+def validate_info(data):
+    """检查 /api/info 数据的基本结构，不符合时抛出 ValueError"""
+    if not isinstance(data, dict):
+        raise ValueError("版本信息不是 JSON 对象")
+    version = data.get('latestVersion')
+    if not isinstance(version, str) or not version:
+        raise ValueError("版本信息缺少 latestVersion")
+    if not isinstance(data.get('downloads', {}), dict):
+        raise ValueError("版本信息中的 downloads 格式不正确")
+    return data
+
+
+def load_cached_info(url=None):
+    """读取上次成功获取的 /api/info 数据，没有缓存时返回 None
+
+    未指定 url 时按 get_info_endpoints 的顺序返回第一个可用的缓存
+    """
+    for endpoint in [url] if url else get_info_endpoints():
+        content, _ = get_info_cache().get(endpoint)
+        if content is None:
+            continue
+        try:
+            return validate_info(json.loads(content.decode('utf-8')))
+        except Exception as e:
+            logger.warning(f"缓存的版本信息已损坏: {e}")
+    return None
+
+
+_created_staging_parents = {}  # 暂存目录 -> make_staging_dir 为它新建的上级目录
+
+
+def make_staging_dir(install_path):
+    """在安装目录旁边（同一卷上）创建空的暂存目录，解压完成后可直接重命名替换安装目录"""
+    install_path = os.path.normpath(install_path)
+    parent = os.path.dirname(install_path)
+    created = not os.path.isdir(parent)
+    os.makedirs(parent, exist_ok=True)
+    path = tempfile.mkdtemp(prefix=os.path.basename(install_path) + '.staging-', dir=parent)
+    if created or parent in _created_staging_parents.values():
+        _created_staging_parents[path] = parent
+    return path
+
+
+def discard_staging_dir(path):
+    """删除未使用的暂存目录；上级目录是 make_staging_dir 新建的且已为空时一并删除"""
+    if not path:
+        return
+    shutil.rmtree(path, ignore_errors=True)
+    parent = _created_staging_parents.pop(path, None)
+    if parent:
+        try:
+            os.rmdir(parent)
+        except OSError:
+            pass
+
+
+class PackageCache:
+    """按内容哈希（SHA-256）保存完整安装包的缓存
+    
+    index.json 记录每个安装包的大小、下载地址（及各地址的 ETag / Last-Modified）和最后使用时间，
+    总大小超过上限时按最近最少使用淘汰。read_only 的缓存（如共享目录）只读取，不写入也不淘汰。
+    """
+    
+    def __init__(self, directory, max_size=0, read_only=False):
+        self.directory = directory
+        self.max_size = max_size
+        self.read_only = read_only
+        self.index_path = os.path.join(directory, 'index.json')
+        self._lock = threading.Lock()
+        self._index = None
+    
+    def _load_index(self):
+        if self._index is None or self.read_only:
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    self._index = json.load(f)
+            except Exception:
+                self._index = {}
+        return self._index
+    
+    def _save_index(self):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = self.index_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._index, f)
+            os.replace(tmp_path, self.index_path)
+        except Exception as e:
+            logger.warning(f"写入安装包缓存索引失败: {e}")
+    
+    def _file_path(self, sha256):
+        return os.path.join(self.directory, sha256 + '.zip')
+    
+    def lookup(self, urls=(), sha256=None, probe=None):
+        """按哈希或下载地址查找安装包，返回其 SHA-256，未命中时返回 None
+        
+        没有哈希时同一地址上的文件可能已经更新：需要传入 probe(url)（返回服务器当前的
+        total_size / etag / last_modified，见 NetworkWorker._probe_download），
+        大小和 ETag / Last-Modified 都与加入缓存时一致才算命中；没有 probe 时不按地址查找。
+        """
+        with self._lock:
+            index = self._load_index()
+            if sha256:
+                candidates = [(sha256, None, None)] if sha256 in index else []
+            elif probe is None:
+                candidates = []
+            else:
+                candidates = [(key, url, dict(entry.get('validators', {}).get(url, {})))
+                              for key, entry in index.items() for url in urls if url in entry.get('urls', [])]
+            sizes = {key: index[key].get('size') for key, _, _ in candidates}
+        probed = {}
+        for key, url, validators in candidates:
+            try:
+                if os.path.getsize(self._file_path(key)) != sizes[key]:
+                    continue
+            except OSError:
+                continue
+            if url is not None:
+                if not validators:
+                    continue
+                if url not in probed:
+                    probed[url] = probe(url)
+                if not self._same_file(probed[url], sizes[key], validators):
+                    logger.info(f"服务器上的文件已变化，不使用缓存的安装包: {url}")
+                    continue
+            return key
+        return None
+    
+    @staticmethod
+    def _same_file(remote, size, validators):
+        """服务器当前的文件与缓存时是否一致：大小相同，且 ETag（没有时比较 Last-Modified）相同"""
+        if remote.get('total_size') != size:
+            return False
+        if validators.get('etag'):
+            return remote.get('etag') == validators['etag']
+        return bool(validators.get('last_modified')) and remote.get('last_modified') == validators['last_modified']
+    
+    def validators(self, sha256):
+        """安装包各下载地址加入缓存时的 ETag / Last-Modified：{地址: {etag, last_modified}}"""
+        with self._lock:
+            entry = self._load_index().get(sha256) or {}
+            return {url: dict(value) for url, value in entry.get('validators', {}).items()}
+    
+    def fetch(self, sha256, dest):
+        """把缓存的安装包放到 dest（同一卷上用硬链接，否则复制）并校验哈希，成功时返回 True"""
+        try:
+            _link_or_copy(self._file_path(sha256), dest)
+            if _file_sha256(dest) != sha256:
+                raise Exception("缓存的安装包已损坏")
+        except Exception as e:
+            logger.warning(f"读取缓存的安装包失败: {sha256}: {e}")
+            if os.path.exists(dest):
+                os.remove(dest)
+            if not self.read_only:
+                self.remove(sha256)
+            return False
+        if not self.read_only:
+            with self._lock:
+                entry = self._load_index().get(sha256)
+                if entry is not None:
+                    entry['last_used'] = time.time()
+                    self._save_index()
+        return True
+    
+    def put(self, path, sha256, urls=(), validators=None):
+        """把下载完成的安装包加入缓存并按 LRU 淘汰超出容量的安装包
+        
+        validators 为 {地址: {etag, last_modified}}，没有哈希时 lookup 据此判断服务器上的文件是否已变化。
+        """
+        if self.read_only:
+            return
+        with self._lock:
+            index = self._load_index()
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                if sha256 not in index or not os.path.exists(self._file_path(sha256)):
+                    _link_or_copy(path, self._file_path(sha256))
+            except Exception as e:
+                logger.warning(f"写入安装包缓存失败: {e}")
+                return
+            entry = index.setdefault(sha256, {'urls': []})
+            entry['size'] = os.path.getsize(self._file_path(sha256))
+            entry['last_used'] = time.time()
+            entry['urls'] = list(dict.fromkeys(list(urls) + entry.get('urls', [])))
+            if validators:
+                entry['validators'] = dict(entry.get('validators', {}), **validators)
+            self._evict(keep=sha256)
+            self._save_index()
+        logger.info(f"安装包已加入缓存: {sha256}")
+    
+    def remove(self, sha256):
+        with self._lock:
+            if self._load_index().pop(sha256, None) is not None:
+                self._save_index()
+            try:
+                os.remove(self._file_path(sha256))
+            except OSError:
+                pass
+    
+    def _evict(self, keep=None):
+        total = sum(entry.get('size', 0) for entry in self._index.values())
+        for sha256 in sorted(self._index, key=lambda key: self._index[key].get('last_used', 0)):
+            if total <= self.max_size:
+                break
+            if sha256 == keep:
+                continue
+            total -= self._index[sha256].get('size', 0)
+            del self._index[sha256]
+            try:
+                os.remove(self._file_path(sha256))
+            except OSError:
+                pass
+            logger.info(f"淘汰缓存的安装包: {sha256}")
+
+
+def _source_validators(url, etag, last_modified):
+    """PackageCache.put 的 validators 参数：服务器没有返回 ETag / Last-Modified 时为空"""
+    if not etag and not last_modified:
+        return {}
+    return {url: {'etag': etag, 'last_modified': last_modified}}
+
+
+def _link_or_copy(src, dst):
+    """同一卷上创建硬链接（不复制数据），否则复制；dst 已存在时覆盖"""
+    tmp_path = dst + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        os.link(src, tmp_path)
+    except OSError:
+        shutil.copyfile(src, tmp_path)
+    os.replace(tmp_path, dst)
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(1024 * 1024)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+_package_caches = None
+
+
+def get_package_caches():
+    """获取安装包缓存：本地缓存在前，配置了共享目录时其后为只读的共享缓存"""
+    global _package_caches
+    with _asset_cache_lock:
+        if _package_caches is None:
+            _package_caches = [PackageCache(os.path.join(CACHE_DIR, 'packages'), PACKAGE_CACHE_MAX_SIZE)]
+            if SHARED_PACKAGE_CACHE_DIR:
+                _package_caches.append(PackageCache(SHARED_PACKAGE_CACHE_DIR, read_only=True))
+        return _package_caches
+
+
+class _ImageLoadTask(QRunnable):
+    """在线程池中下载并解码图片（QImage 可在非 GUI 线程使用，QPixmap 不行）"""
+    
+    def __init__(self, loader, key, url, size):
+        super().__init__()
+        self.loader = loader
+        self.key = key
+        self.url = url
+        self.size = size
+    
+    def run(self):
+        cache = get_asset_cache()
+        # 有缓存时先立即显示缓存内容，再在后台向服务器确认是否有更新
+        cached, _ = cache.get(self.url)
+        shown = cached is not None and self._emit_image(cached)
+        try:
+            response = get_http_session().get(self.url, headers=cache.conditional_headers(self.url),
+                                              timeout=(HTTP_CONNECT_TIMEOUT, 5))
+            if response.status_code == 304 and cached is not None:
+                logger.debug(f"图片未变化，使用缓存: {self.url}")
+                cache.touch(self.url)
+                if not shown:
+                    raise Exception("缓存的图片数据无法解码")
+                return
+            response.raise_for_status()
+            if response.content == cached and shown:
+                # 内容未变化，但服务器的校验信息可能已更新，记录下来以便下次得到 304
+                cache.touch(self.url, response.headers.get('etag', ''), response.headers.get('last-modified', ''))
+                return
+            if not self._emit_image(response.content):
+                raise Exception("图片数据无法解码")
+            cache.put(self.url, response.content,
+                      response.headers.get('etag', ''), response.headers.get('last-modified', ''))
+        except Exception as e:
+            logger.warning(f"加载图片失败: {self.url}: {e}")
+            if shown:
+                return
+            try:
+                self.loader.image_failed.emit(self.key)
+            except RuntimeError:
+                # 页面已销毁，无需再通知
+                pass
+    
+    def _emit_image(self, data):
+        """解码图片并按标签尺寸缩放，成功后通知主线程显示"""
+        image = QImage()
+        if not image.loadFromData(data) or image.isNull():
+            return False
+        if self.size.isValid() and not self.size.isEmpty():
+            image = image.scaled(self.size, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+        try:
+            self.loader.image_ready.emit(self.key, image)
+        except RuntimeError:
+            # 页面已销毁，无需再通知
+            pass
+        return True
+
+
+class ImageLoader(QObject):
+    """异步加载远程图片：页面先显示占位文字，图片到达后再替换"""
+    image_ready = pyqtSignal(int, QImage)
+    image_failed = pyqtSignal(int)
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._pending = {}  # key -> (标签, 失败时显示的文字)
+        self._next_key = 0
+        self.image_ready.connect(self._on_image_ready)
+        self.image_failed.connect(self._on_image_failed)
+    
+    def load(self, url, label, placeholder_text, failed_text):
+        """开始加载图片到 label，不阻塞 GUI 线程"""
+        label.setText(placeholder_text)
+        label.setAlignment(Qt.AlignCenter)
+        
+        ratio = label.devicePixelRatioF()
+        size = QSize(int(label.width() * ratio), int(label.height() * ratio))
+        key = self._next_key
+        self._next_key += 1
+        self._pending[key] = (label, failed_text)
+        QThreadPool.globalInstance().start(_ImageLoadTask(self, key, url, size))
+    
+    def _on_image_ready(self, key, image):
+        # 先显示缓存、后台确认有更新时会再次收到图片，因此不移除 key
+        label, _ = self._pending.get(key, (None, None))
+        if label is None:
+            return
+        pixmap = QPixmap.fromImage(image)
+        pixmap.setDevicePixelRatio(label.devicePixelRatioF())
+        label.setPixmap(pixmap)
+    
+    def _on_image_failed(self, key):
+        label, failed_text = self._pending.pop(key, (None, None))
+        if label is None:
+            return
+        label.setText(failed_text)
+        label.setAlignment(Qt.AlignCenter)
+
+
 # 页面类（已合并 page1.py / page2_1.py / page2_2.py / page3.py）
 class Page1(QWidget):
     def __init__(self, parent=None):
@@ -85,19 +1069,9 @@ class Page1(QWidget):
         logo_label.setFixedSize(100, 100)
         logo_label.setScaledContents(True)
         
-        # 尝试从 URL 加载 Logo
-        try:
-            response = requests.get("http://pcfs.eno.ink:3001/BL.png", timeout=5)
-            pixmap = QPixmap()
-            pixmap.loadFromData(response.content)
-            if not pixmap.isNull():
-                logo_label.setPixmap(pixmap)
-            else:
-                logo_label.setText("LOGO")
-                logo_label.setAlignment(Qt.AlignCenter)
-        except:
-            logo_label.setText("LOGO")
-            logo_label.setAlignment(Qt.AlignCenter)
+        # 从 URL 异步加载 Logo，加载完成前显示占位文字
+        self.image_loader = ImageLoader(self)
+        self.image_loader.load("http://pcfs.eno.ink:3001/BL.png", logo_label, "LOGO", "LOGO")
         
         header_layout.addWidget(logo_label)
         
@@ -453,11 +1427,14 @@ logger = logging.getLogger(__name__)
 class Page3(QWidget):
     install_progress = pyqtSignal(int)
     install_complete = pyqtSignal()
+    install_failed = pyqtSignal(str)
     
     def __init__(self, parent=None):
         super().__init__(parent)
         self.parent = parent
         self.install_config = {}
+        self.installing = False  # 安装任务正在运行（会使用 install_config 中的 extracted_dir）
+        self._cancel_event = threading.Event()
         self.initUI()
         
     def initUI(self):
@@ -491,6 +1468,11 @@ class Page3(QWidget):
         
         scroll_layout.addLayout(progress_layout)
         
+        # 下载状态（已下载 / 总大小、速度、剩余时间）
+        self.download_status_label = BodyLabel("")
+        self.download_status_label.setVisible(False)
+        scroll_layout.addWidget(self.download_status_label)
+        
         # 添加间距
         scroll_layout.addSpacing(40)
         
@@ -507,23 +1489,14 @@ class Page3(QWidget):
         image_layout = QHBoxLayout()
         image_layout.addStretch()
         
-        # 尝试从 URL 加载图片
+        # 从 URL 异步加载图片，不阻塞窗口显示
         self.image_label = StrongBodyLabel()
         self.image_label.setFixedSize(382, 488)
         self.image_label.setScaledContents(True)
         
-        try:
-            response = requests.get("http://pcfs.eno.ink:3001/BLlight.png", timeout=5)
-            pixmap = QPixmap()
-            pixmap.loadFromData(response.content)
-            if not pixmap.isNull():
-                self.image_label.setPixmap(pixmap)
-            else:
-                self.image_label.setText("图片加载失败")
-                self.image_label.setAlignment(Qt.AlignCenter)
-        except:
-            self.image_label.setText("图片加载失败")
-            self.image_label.setAlignment(Qt.AlignCenter)
+        self.image_loader = ImageLoader(self)
+        self.image_loader.load("http://pcfs.eno.ink:3001/BLlight.png", self.image_label,
+                               "正在加载图片...", "图片加载失败")
         
         image_layout.addWidget(self.image_label)
         image_layout.addStretch()
@@ -570,6 +1543,8 @@ class Page3(QWidget):
         # 连接信号
         self.install_progress.connect(self.update_progress)
         self.install_complete.connect(self.on_install_complete)
+        # 安装在工作线程中执行，失败信息通过信号回到 GUI 线程显示
+        self.install_failed.connect(self.show_install_error)
         
     def start_installation(self, install_config):
         """开始安装"""
@@ -579,12 +1554,12 @@ class Page3(QWidget):
         self.progress_bar.setValue(0)
         self.progress_label.setText("0%")
         
-        # 在后台线程中执行安装
-        logger.info(f"创建安装线程")
-        self.install_thread = threading.Thread(target=self.simulate_installation)
-        self.install_thread.daemon = True
-        self.install_thread.start()
-        logger.info(f"安装线程已启动")
+        # 在工作线程池中执行安装
+        logger.info(f"提交安装任务")
+        self.installing = True
+        self._cancel_event.clear()
+        get_worker_pool().submit(self.simulate_installation, self.cancel_installation)
+        logger.info(f"安装任务已提交")
         
     def simulate_installation(self):
         """模拟安装过程"""
@@ -607,11 +1582,19 @@ class Page3(QWidget):
             logger.error(f"安装过程失败: {e}")
             logger.error(traceback.format_exc())
             # 如果安装失败，显示错误信息
-            QTimer.singleShot(0, lambda: self.show_install_error(str(e)))
+            self.install_failed.emit(str(e))
+        finally:
+            self.installing = False
+    
+    def cancel_installation(self):
+        """取消安装（关闭线程池时调用）：安装任务在下一步开始前停止，并自行清理暂存目录"""
+        self._cancel_event.set()
     
     def install_from_downloaded_file(self, file_path):
         """从下载的文件安装"""
         temp_extract_dir = None
+        zip_infos = None
+        manifest_files = None
         try:
             import subprocess
             import shutil
@@ -632,81 +1615,101 @@ class Page3(QWidget):
             install_path = self.install_config.get('install_path', '')
             
             for step_text, progress in steps:
+                if self._cancel_event.is_set():
+                    raise DownloadCancelledError("安装已取消")
                 self.install_progress.emit(progress)
                 
                 if progress == 40:
                     # 解压文件（如果是zip文件）
                     logger.info(f"进度40%: 处理文件 {file_path}")
+                    extracted_dir = self.install_config.get('extracted_dir', '')
+                    self.install_config['extracted_dir'] = ''
                     if file_path.endswith('.zip'):
+                        with zipfile.ZipFile(file_path, 'r') as zip_ref:
+                            zip_infos = zip_ref.infolist()
+                    
+                    if file_path.endswith(MANIFEST_SUFFIX):
+                        # 增量更新：变化的文件已下载到暂存目录，其余文件从现有安装保留
+                        logger.info(f"按文件清单增量更新: {file_path}")
+                        with open(file_path, 'r', encoding='utf-8') as f:
+                            manifest_files = json.load(f)['files']
+                        names = [entry['path'] for entry in manifest_files]
+                        if not (extracted_dir and os.path.isdir(extracted_dir)
+                                and self.skipped_files_present(extracted_dir, install_path, names)):
+                            raise Exception("增量更新的文件不完整，请重新下载")
+                        temp_extract_dir = extracted_dir
+                        installer_exe = self.find_installer_exe(temp_extract_dir) or self.find_installer_exe(install_path)
+                        logger.info(f"找到的安装程序: {installer_exe}")
+                        if installer_exe:
+                            file_path = installer_exe
+                        else:
+                            raise Exception("未找到安装程序")
+                    elif file_path.endswith('.zip') and extracted_dir and os.path.isdir(extracted_dir):
+                        # 下载时已边下边解压并校验通过，直接使用解压目录
+                        logger.info(f"下载时已完成解压，跳过解压步骤: {extracted_dir}")
+                        temp_extract_dir = extracted_dir
+                        if os.path.dirname(os.path.normpath(extracted_dir)) != os.path.dirname(os.path.normpath(install_path)):
+                            # 解压目录不在安装目录旁边（例如预下载后更改了安装路径），先移动过去
+                            temp_extract_dir = make_staging_dir(install_path)
+                            os.rmdir(temp_extract_dir)
+                            logger.info(f"移动解压目录: {extracted_dir} -> {temp_extract_dir}")
+                            shutil.move(extracted_dir, temp_extract_dir)
+                        names = [info.filename for info in zip_infos if not info.is_dir()]
+                        if not self.skipped_files_present(temp_extract_dir, install_path, names):
+                            # 边下边解压时对比的是另一个安装目录，重新解压
+                            logger.warning(f"解压目录缺少的文件在安装目录中不存在，重新解压")
+                            shutil.rmtree(temp_extract_dir, ignore_errors=True)
+                            temp_extract_dir = None
+                    
+                    if file_path.endswith('.zip') and temp_extract_dir is None:
                         logger.info(f"检测到zip文件，开始解压: {file_path}")
-                        # 创建临时解压目录
-                        temp_extract_dir = os.path.join(os.path.dirname(file_path), 'bloret_temp')
-                        logger.info(f"创建临时解压目录: {temp_extract_dir}")
-                        os.makedirs(temp_extract_dir, exist_ok=True)
-                        logger.info(f"临时解压目录创建成功: {temp_extract_dir}")
+                        # 在安装目录旁边创建暂存目录，解压后直接重命名替换，不再复制一遍
+                        temp_extract_dir = make_staging_dir(install_path)
+                        logger.info(f"暂存目录创建成功: {temp_extract_dir}")
                         
-                        # 解压zip文件
+                        # 解压zip文件（多线程，解压进度映射到 40% ~ 60%；与现有安装相同的文件不再写入）
                         logger.info(f"开始解压zip文件到: {temp_extract_dir}")
-                        with zipfile.ZipFile(file_path, 'r') as zip_ref:
-                            zip_ref.extractall(temp_extract_dir)
+                        self._extract_progress = progress
+                        install_index = InstallIndex(install_path) if os.path.isdir(install_path) else None
+                        extract_zip_parallel(file_path, temp_extract_dir,
+                                             progress_callback=self._report_extract_progress,
+                                             install_index=install_index)
                         logger.info(f"zip文件解压完成")
-                        
-                        # 查找解压后的安装程序
+                    
+                    if file_path.endswith('.zip'):
+                        # 查找解压后的安装程序（未变化的文件仍在安装目录中）
                         logger.info(f"在解压目录中查找安装程序: {temp_extract_dir}")
                         installer_exe = self.find_installer_exe(temp_extract_dir)
+                        if not installer_exe and os.path.isdir(install_path):
+                            installer_exe = self.find_installer_exe(install_path)
                         logger.info(f"找到的安装程序: {installer_exe}")
                         if installer_exe:
                             file_path = installer_exe  # 更新为解压后的安装程序路径
                             logger.info(f"更新安装程序路径为: {file_path}")
                         else:
                             raise Exception("在zip文件中未找到安装程序")
-                    else:
+                    elif not file_path.endswith(MANIFEST_SUFFIX):
                         logger.info(f"不是zip文件，直接使用原路径: {file_path}")
                     
                     time.sleep(2)
                 elif progress == 60:
-                    # 文件复制
-                    logger.info(f"开始复制文件到安装目录: {install_path}")
+                    # 用暂存目录替换安装目录
+                    logger.info(f"开始替换安装目录: {install_path}")
                     try:
-                        # 创建安装目录（如果不存在）
-                        os.makedirs(install_path, exist_ok=True)
-                        
-                        # 如果是从解压目录复制文件
                         if temp_extract_dir and os.path.exists(temp_extract_dir):
-                            logger.info(f"从解压目录复制文件: {temp_extract_dir} -> {install_path}")
-                            import shutil
-                            
-                            # 复制所有文件和子目录，如果文件已存在则覆盖
-                            for root, dirs, files in os.walk(temp_extract_dir):
-                                # 计算相对路径
-                                rel_path = os.path.relpath(root, temp_extract_dir)
-                                if rel_path == '.':
-                                    target_dir = install_path
-                                else:
-                                    target_dir = os.path.join(install_path, rel_path)
-                                
-                                # 创建目标目录
-                                os.makedirs(target_dir, exist_ok=True)
-                                
-                                # 复制文件
-                                for file in files:
-                                    src_file = os.path.join(root, file)
-                                    dst_file = os.path.join(target_dir, file)
-                                    
-                                    # 如果目标文件已存在，先删除再复制（覆盖）
-                                    if os.path.exists(dst_file):
-                                        logger.info(f"文件已存在，准备覆盖: {dst_file}")
-                                        os.remove(dst_file)
-                                    
-                                    shutil.copy2(src_file, dst_file)
-                                    logger.debug(f"复制文件: {src_file} -> {dst_file}")
-                            
-                            logger.info(f"文件复制完成，覆盖模式已启用")
+                            if zip_infos:
+                                names = [info.filename for info in zip_infos if not info.is_dir()]
+                            else:
+                                names = [entry['path'] for entry in manifest_files or []]
+                            self.swap_install_dir(temp_extract_dir, install_path, names)
+                            # 暂存目录已成为安装目录，不需要再清理
+                            temp_extract_dir = None
+                            self.save_install_index(install_path, zip_infos, manifest_files)
                         else:
-                            logger.warning(f"没有找到解压目录，跳过文件复制")
+                            logger.warning(f"没有找到解压目录，跳过文件替换")
                             
                     except Exception as e:
-                        logger.error(f"文件复制失败: {e}")
+                        logger.error(f"替换安装目录失败: {e}")
                         raise
                     
                     time.sleep(1)
@@ -718,15 +1721,16 @@ class Page3(QWidget):
                     time.sleep(0.3)
                 
                 if progress == 100:
-                    # 安装完成 - 文件已经通过复制方式安装完成
-                    logger.info(f"安装完成！文件已成功复制到: {install_path}")
-                    logger.info(f"安装模式: 直接文件复制（覆盖模式已启用）")
+                    # 安装完成 - 暂存目录已替换为安装目录
+                    logger.info(f"安装完成！文件已安装到: {install_path}")
                     self.install_complete.emit()
                     
+        except DownloadCancelledError:
+            logger.info("安装已取消")
         except Exception as e:
             logger.error(f"安装过程捕获异常: {e}")
             logger.error(traceback.format_exc())
-            self.show_install_error(f"安装失败: {str(e)}")
+            self.install_failed.emit(f"安装失败: {str(e)}")
         finally:
             # 清理临时文件 - 确保传递正确的参数
             logger.info(f"finally块: 准备清理临时文件")
@@ -743,6 +1747,10 @@ class Page3(QWidget):
                 logger.info(f"使用当前的zip文件路径: {cleanup_file}")
             
             self.cleanup_temp_files(cleanup_file, temp_extract_dir)
+            if self._cancel_event.is_set():
+                # 取消时还没有用到的预解压目录
+                discard_staging_dir(self.install_config.get('extracted_dir', ''))
+                self.install_config['extracted_dir'] = ''
     
     def find_installer_exe(self, extract_dir):
         """在解压目录中查找安装程序"""
@@ -784,6 +1792,84 @@ class Page3(QWidget):
             logger.error(traceback.format_exc())
             return None
     
+    def skipped_files_present(self, staging_dir, install_path, names):
+        """增量安装时未写入暂存目录的文件必须存在于安装目录中（替换时会移动过去）"""
+        for name in names:
+            if os.path.exists(zip_member_path(staging_dir, name)):
+                continue
+            if not os.path.isfile(zip_member_path(install_path, name)):
+                logger.warning(f"文件既不在解压目录也不在安装目录中: {name}")
+                return False
+        return True
+    
+    def save_install_index(self, install_path, infos=None, manifest_files=None):
+        """记录安装后各文件的摘要，供下次增量安装使用"""
+        if not infos and not manifest_files:
+            return
+        try:
+            install_index = InstallIndex(install_path)
+            if infos:
+                install_index.rebuild(infos)
+            else:
+                install_index.rebuild_from_manifest(manifest_files)
+            install_index.save()
+        except Exception as e:
+            logger.warning(f"保存安装索引失败: {e}")
+    
+    def _report_extract_progress(self, done, total):
+        """把解压字节进度换算为 40% ~ 60% 的安装进度（可在解压线程调用）"""
+        value = 40 + (20 * done // total if total else 20)
+        if value > self._extract_progress:
+            self._extract_progress = value
+            self.install_progress.emit(min(value, 59))
+    
+    def swap_install_dir(self, staging_dir, install_path, names=()):
+        """用暂存目录替换安装目录
+        
+        names 为新安装包（zip 或文件清单）中的全部文件名。其中没有写入暂存目录的（与旧安装相同）
+        以及 USER_DATA_PATHS 中的用户数据先从旧安装移动到暂存目录，再通过目录重命名完成替换；
+        旧安装中的其他文件随旧目录删除。任何一步失败都会撤销，安装目录保持原样。
+        """
+        install_path = os.path.normpath(install_path)
+        old_dir = install_path + '.old'
+        moved = []
+        renamed = False
+        try:
+            if os.path.exists(install_path):
+                self._carry_over_files(install_path, staging_dir, list(names) + list(USER_DATA_PATHS), moved)
+                logger.info(f"保留旧安装中的 {len(moved)} 个文件/目录")
+                if os.path.exists(old_dir):
+                    shutil.rmtree(old_dir)
+                os.rename(install_path, old_dir)
+                renamed = True
+            os.rename(staging_dir, install_path)
+        except Exception:
+            # 恢复旧安装
+            if renamed:
+                os.rename(old_dir, install_path)
+            for src, dst in reversed(moved):
+                os.rename(dst, src)
+            raise
+        logger.info(f"安装目录替换完成: {staging_dir} -> {install_path}")
+        if renamed:
+            shutil.rmtree(old_dir, ignore_errors=True)
+    
+    def _carry_over_files(self, old_root, new_root, names, moved):
+        """把旧目录中的 names 移动到新目录中缺少的位置，已存在的以新目录为准"""
+        for name in names:
+            self._carry_over(zip_member_path(old_root, name), zip_member_path(new_root, name), moved)
+    
+    def _carry_over(self, src, dst, moved):
+        if not os.path.lexists(src):
+            return
+        if not os.path.lexists(dst):
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            os.rename(src, dst)
+            moved.append((src, dst))
+        elif os.path.isdir(src) and not os.path.islink(src) and os.path.isdir(dst):
+            for name in os.listdir(src):
+                self._carry_over(os.path.join(src, name), os.path.join(dst, name), moved)
+    
     def cleanup_temp_files(self, downloaded_file, temp_extract_dir):
         """清理临时文件"""
         try:
@@ -791,8 +1877,8 @@ class Page3(QWidget):
             logger.info(f"下载文件: {downloaded_file}")
             logger.info(f"临时解压目录: {temp_extract_dir}")
             
-            # 清理下载的zip文件
-            if downloaded_file and downloaded_file.endswith('.zip'):
+            # 清理下载的zip文件（增量更新时为文件清单）
+            if downloaded_file and downloaded_file.endswith(('.zip', MANIFEST_SUFFIX)):
                 logger.debug(f"检查下载的zip文件是否存在: {os.path.exists(downloaded_file)}")
                 if os.path.exists(downloaded_file):
                     logger.info(f"正在删除下载的zip文件: {downloaded_file}")
@@ -915,6 +2001,12 @@ class Page3(QWidget):
             self.progress_bar.setValue(value)
         if hasattr(self, 'progress_label'):
             self.progress_label.setText(f"{value}%")
+    
+    def update_download_status(self, record):
+        """显示下载进度记录（见 make_progress_record）"""
+        if hasattr(self, 'download_status_label'):
+            self.download_status_label.setText(f"下载 / Download: {format_progress_text(record)}")
+            self.download_status_label.setVisible(True)
 
     def on_install_complete(self):
         """安装完成时的UI更新"""
@@ -927,6 +2019,29 @@ class Page3(QWidget):
         if hasattr(self, 'finish_button'):
             self.finish_button.setVisible(True)
 
+    def show_install_error(self, message):
+        """安装失败时的UI更新（在 GUI 线程中执行）"""
+        logger.error(f"安装失败: {message}")
+        self.title_label.setText("安装失败 / Installation Failed")
+        self.download_status_label.setText(message)
+        self.download_status_label.setVisible(True)
+        if QFLUENT_AVAILABLE:
+            InfoBar.error(
+                title='安装失败',
+                content=message,
+                orient=Qt.Horizontal,
+                isClosable=True,
+                position=InfoBarPosition.TOP,
+                duration=-1,
+                parent=self
+            )
+        else:
+            from PyQt5.QtWidgets import QMessageBox
+            QMessageBox.critical(self, "安装失败", message)
+        # 显示完成按钮，让用户可以退出安装程序
+        self.finish_button.setText("退出 / Exit")
+        self.finish_button.setVisible(True)
+
     def on_finish_clicked(self):
         """点击完成按钮"""
         logger.info("用户点击完成，程序准备退出")
@@ -1022,85 +2137,2472 @@ class Page3(QWidget):
                 pass
 
 
+class DownloadJournal:
+    """断点续传记录：保存 URL、ETag/Last-Modified、文件总大小以及已完成的字节区间"""
+    
+    SAVE_INTERVAL = 1.0  # 下载过程中最多每秒写一次记录文件
+    
+    def __init__(self, path):
+        self.path = path
+        self.url = ''
+        self.etag = ''
+        self.last_modified = ''
+        self.total_size = 0
+        self.completed = []  # 已完成区间 [start, end)，按起点排序且互不重叠
+        self._lock = threading.Lock()
+        self._last_save = 0
+    
+    def load(self):
+        """从磁盘读取记录，不存在或已损坏时返回 False"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.url = data.get('url', '')
+            self.etag = data.get('etag', '')
+            self.last_modified = data.get('last_modified', '')
+            self.total_size = int(data.get('total_size', 0))
+            self.completed = sorted([int(s), int(e)] for s, e in data.get('completed', []))
+            return True
+        except Exception as e:
+            logger.debug(f"读取续传记录失败: {e}")
+            return False
+    
+    def matches(self, url, total_size, etag, last_modified, mirrors=()):
+        """判断记录是否对应服务器上的同一个文件
+
+        mirrors 为允许跨镜像续传的地址，只应在已知 SHA-256（下载完成后会校验）时提供
+        """
+        if self.total_size != total_size:
+            return False
+        if self.url != url:
+            # 不同镜像的 ETag 不可比较，只要求来自同一组镜像且大小一致，内容由最终的哈希校验保证
+            return self.url in mirrors
+        if etag or self.etag:
+            return etag == self.etag
+        if last_modified or self.last_modified:
+            return last_modified == self.last_modified
+        return True
+    
+    def reset(self, url, total_size, etag, last_modified):
+        """清空已完成区间，重新开始记录"""
+        with self._lock:
+            self.url = url
+            self.total_size = total_size
+            self.etag = etag
+            self.last_modified = last_modified
+            self.completed = []
+    
+    def switch_source(self, url, etag, last_modified):
+        """切换到另一个镜像继续下载，保留已完成的区间"""
+        with self._lock:
+            self.url = url
+            self.etag = etag
+            self.last_modified = last_modified
+    
+    def mark(self, start, end):
+        """记录 [start, end) 已写入文件，并与相邻区间合并"""
+        with self._lock:
+            merged = []
+            for s, e in self.completed:
+                if e < start or s > end:
+                    merged.append([s, e])
+                else:
+                    start, end = min(s, start), max(e, end)
+            merged.append([start, end])
+            merged.sort()
+            self.completed = merged
+    
+    def discard(self, start, end):
+        """把 [start, end) 重新标记为未完成（校验失败需要重新下载）"""
+        with self._lock:
+            remaining = []
+            for s, e in self.completed:
+                if e <= start or s >= end:
+                    remaining.append([s, e])
+                    continue
+                if s < start:
+                    remaining.append([s, start])
+                if e > end:
+                    remaining.append([end, e])
+            self.completed = remaining
+    
+    def contiguous_bytes(self):
+        """从文件开头起连续完成的字节数"""
+        with self._lock:
+            if self.completed and self.completed[0][0] == 0:
+                return self.completed[0][1]
+            return 0
+    
+    def completed_bytes(self):
+        """已完成的字节数"""
+        with self._lock:
+            return sum(e - s for s, e in self.completed)
+    
+    def missing_ranges(self):
+        """尚未完成的区间列表 [(start, end), ...]"""
+        with self._lock:
+            missing = []
+            pos = 0
+            for s, e in self.completed:
+                if s > pos:
+                    missing.append((pos, s))
+                pos = max(pos, e)
+            if pos < self.total_size:
+                missing.append((pos, self.total_size))
+            return missing
+    
+    def save(self):
+        """原子地写入记录文件"""
+        with self._lock:
+            data = {
+                'url': self.url,
+                'etag': self.etag,
+                'last_modified': self.last_modified,
+                'total_size': self.total_size,
+                'completed': self.completed
+            }
+            self._last_save = time.time()
+            try:
+                tmp_path = self.path + '.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                logger.warning(f"写入续传记录失败: {e}")
+    
+    def save_if_due(self):
+        """距离上次写入超过 SAVE_INTERVAL 时才写入，避免频繁 IO"""
+        if time.time() - self._last_save >= self.SAVE_INTERVAL:
+            self.save()
+    
+    def remove(self):
+        """下载完成后删除记录文件"""
+        try:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+        except Exception as e:
+            logger.warning(f"删除续传记录失败: {e}")
+
+
+class AdaptiveChunkSize:
+    """根据实测吞吐量调整每次读取的大小：慢速连接用小块保证响应及时，快速连接用大块减少循环次数"""
+    
+    def __init__(self, minimum=DOWNLOAD_CHUNK_MIN, maximum=DOWNLOAD_CHUNK_MAX,
+                 target_time=DOWNLOAD_CHUNK_TARGET_TIME):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_time = target_time
+        self.size = minimum
+    
+    def update(self, nbytes, elapsed):
+        """记录一次读取的字节数和耗时，调整下一次读取的大小"""
+        if nbytes < self.size:
+            # 读到结尾的短块不能反映速度
+            return
+        wanted = int(nbytes / max(elapsed, 1e-6) * self.target_time)
+        # 每次最多翻倍或减半，避免偶然的快慢波动造成大幅变化
+        wanted = max(self.size // 2, min(self.size * 2, wanted))
+        self.size = max(self.minimum, min(self.maximum, wanted))
+
+
+def iter_response_chunks(response, limit=None, on_read=None):
+    """按自适应大小读取流式响应（替代固定 chunk_size 的 iter_content）
+    
+    limit 为最多读取的字节数（分段下载时为分段长度）。
+    on_read(nbytes) 在每次从连接收到数据时调用，不必等整块读满；
+    慢速连接读满一块可能要很久，停滞看门狗按它统计实际到达的字节。
+    """
+    sizer = AdaptiveChunkSize()
+    remaining = limit
+    read1 = None
+    if on_read is not None:
+        read1 = getattr(response.raw, 'read1', None)
+        if read1 is None:
+            # urllib3 1.x：每次最多读 DOWNLOAD_READ_PIECE 字节，代替 read1
+            read1 = lambda size, **kwargs: response.raw.read(min(size, DOWNLOAD_READ_PIECE), **kwargs)
+    while remaining is None or remaining > 0:
+        size = sizer.size if remaining is None else min(sizer.size, remaining)
+        started = time.monotonic()
+        if read1 is None:
+            chunk = response.raw.read(size, decode_content=True)
+        else:
+            pieces = []
+            received = 0
+            while received < size:
+                piece = read1(size - received, decode_content=True)
+                if not piece:
+                    break
+                pieces.append(piece)
+                received += len(piece)
+                on_read(len(piece))
+            chunk = b''.join(pieces)
+        if not chunk:
+            break
+        sizer.update(len(chunk), time.monotonic() - started)
+        if remaining is not None:
+            remaining -= len(chunk)
+        yield chunk
+
+
+class ThroughputMonitor:
+    """按滑动窗口统计下载速度"""
+    
+    def __init__(self, window):
+        self.window = window
+        self.samples = deque()  # (时间, 累计字节数)
+    
+    def add_sample(self, total_bytes, now=None):
+        """记录一次累计下载字节数，并丢弃窗口之外的旧样本"""
+        now = time.time() if now is None else now
+        self.samples.append((now, total_bytes))
+        while len(self.samples) > 2 and now - self.samples[1][0] >= self.window:
+            self.samples.popleft()
+    
+    def covers_window(self):
+        """样本是否已覆盖完整的统计窗口"""
+        return len(self.samples) >= 2 and self.samples[-1][0] - self.samples[0][0] >= self.window
+    
+    def rate(self):
+        """窗口内的平均速度（字节/秒）"""
+        if len(self.samples) < 2:
+            return 0.0
+        (t0, b0), (t1, b1) = self.samples[0], self.samples[-1]
+        return (b1 - b0) / max(t1 - t0, 1e-6)
+
+
+def make_progress_record(done, total=None, speed=0.0, avg_speed=0.0):
+    """下载进度记录（download_progress 信号的参数）
+    
+    done / total 为已下载和总字节数（总大小未知时 total 和 percent 为 None），
+    speed 为当前速度，avg_speed 为平滑后的速度（字节/秒），eta 为预计剩余秒数（无法估算时为 None）。
+    """
+    total = total if total and total > 0 else None
+    percent = min(int(done * 100 / total), 100) if total else None
+    eta = None
+    if total and done >= total:
+        eta = 0.0
+    elif total and avg_speed > 0:
+        eta = (total - done) / avg_speed
+    return {'done': done, 'total': total, 'percent': percent,
+            'speed': speed, 'avg_speed': avg_speed, 'eta': eta}
+
+
+class ProgressTracker:
+    """根据累计下载字节数计算当前速度（滑动窗口）和平滑速度（按时间加权的 EWMA）"""
+    
+    def __init__(self, window=PROGRESS_SPEED_WINDOW, smoothing=PROGRESS_SPEED_SMOOTHING):
+        self.window = window
+        self.smoothing = smoothing
+        self.monitor = ThroughputMonitor(window)
+        self.avg_speed = 0.0
+        self._last = None  # (时间, 累计字节数)
+    
+    def update(self, done, total=None, now=None):
+        """记录当前累计字节数，返回进度记录"""
+        now = time.time() if now is None else now
+        if self._last is not None and done < self._last[1]:
+            # 重新开始下载（例如切换到不支持续传的镜像），速度从头统计
+            self.monitor = ThroughputMonitor(self.window)
+            self.avg_speed = 0.0
+            self._last = None
+        self.monitor.add_sample(done, now)
+        if self._last is not None and now > self._last[0]:
+            elapsed = now - self._last[0]
+            rate = (done - self._last[1]) / elapsed
+            if self.avg_speed <= 0:
+                self.avg_speed = rate
+            else:
+                alpha = 1 - math.exp(-elapsed / self.smoothing)
+                self.avg_speed += alpha * (rate - self.avg_speed)
+        self._last = (now, done)
+        return make_progress_record(done, total, self.monitor.rate(), self.avg_speed)
+
+
+def format_size(nbytes):
+    """把字节数格式化为 KB / MB / GB"""
+    for unit in ('B', 'KB', 'MB'):
+        if nbytes < 1024:
+            return f"{nbytes:.0f} {unit}" if unit == 'B' else f"{nbytes:.1f} {unit}"
+        nbytes /= 1024
+    return f"{nbytes:.2f} GB"
+
+
+def format_progress_text(record):
+    """进度记录的显示文本，例如 “37% · 12.3 MB / 45.6 MB · 5.2 MB/s · 剩余 0:07”"""
+    parts = []
+    if record['percent'] is not None:
+        parts.append(f"{record['percent']}%")
+        parts.append(f"{format_size(record['done'])} / {format_size(record['total'])}")
+    else:
+        parts.append(format_size(record['done']))
+    if record['avg_speed'] > 0 and (record['percent'] is None or record['percent'] < 100):
+        parts.append(f"{format_size(record['avg_speed'])}/s")
+    if record['eta'] is not None and record['eta'] > 0:
+        minutes, seconds = divmod(int(math.ceil(record['eta'])), 60)
+        parts.append(f"剩余 {minutes}:{seconds:02d}")
+    return ' · '.join(parts)
+
+
+class MirrorTooSlowError(Exception):
+    """当前镜像速度过低，需要切换到下一个镜像"""
+
+
+class IncompleteDownloadError(Exception):
+    """连接提前结束，收到的数据少于预期"""
+
+
+class SourceChangedError(Exception):
+    """服务器上的文件已变化（If-Range 请求返回了完整文件），已下载的部分不能再用"""
+
+
+class ConnectionStalledError(Exception):
+    """连接速度持续低于下限，已被看门狗断开"""
+
+
+class DownloadStalledError(MirrorTooSlowError):
+    """当前镜像的连接反复停滞，需要切换到下一个镜像"""
+
+
+def _response_socket(response):
+    sock = getattr(getattr(response.raw, 'connection', None), 'sock', None)
+    if sock is None:
+        # 服务器要求关闭连接（Connection: close）时，http.client 把套接字交给了响应对象
+        fp = getattr(getattr(response.raw, '_fp', None), 'fp', None)
+        sock = getattr(getattr(fp, 'raw', None), '_sock', None)
+    return sock
+
+
+def close_response(response):
+    """关闭流式响应；先关闭套接字的读写，让其他线程中阻塞的读取立即返回"""
+    try:
+        _response_socket(response).shutdown(socket.SHUT_RDWR)
+    except Exception:
+        pass
+    response.close()
+
+
+class _WatchedConnection:
+    """看门狗监控的一个连接"""
+    
+    def __init__(self, response, monitor):
+        self.response = response
+        self.monitor = monitor
+        self.received = 0  # 该连接已写入的字节数，由下载线程累加（重新连接时从这里继续）
+        self.arrived = 0  # 该连接已到达的字节数（含尚未凑满一块的数据），看门狗按它计速
+        self.stalled = False
+    
+    def count(self, nbytes):
+        """作为 iter_response_chunks 的 on_read 回调"""
+        self.arrived += nbytes
+    
+    def raise_if_stalled(self):
+        if self.stalled:
+            raise ConnectionStalledError(f"连接速度低于 {STALL_MIN_SPEED / 1024:.1f} KB/s，已断开")
+
+
+class StallWatchdog:
+    """下载停滞看门狗：按滑动窗口统计每个连接的速度，持续低于下限时断开该连接
+    
+    超时只能发现完全没有数据的连接，每隔几秒传来几个字节的连接会一直“下载中”；
+    断开后读取会出错，下载代码据此从当前位置重新连接或切换镜像。
+    """
+    
+    def __init__(self, window, min_speed, interval):
+        self.window = window
+        self.min_speed = min_speed
+        self.interval = interval
+        self._connections = set()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._future = None
+    
+    def start(self):
+        self._future = get_worker_pool().submit_task(self._run)
+    
+    def stop(self):
+        self._stop_event.set()
+        if self._future is not None:
+            wait([self._future])
+    
+    def watch(self, response):
+        """开始监控一个响应；读取时把返回对象的 count 作为 iter_response_chunks 的 on_read"""
+        connection = _WatchedConnection(response, ThroughputMonitor(self.window))
+        connection.monitor.add_sample(0)
+        with self._lock:
+            self._connections.add(connection)
+        return connection
+    
+    def unwatch(self, connection):
+        with self._lock:
+            self._connections.discard(connection)
+    
+    def check(self, now=None):
+        """检查所有连接，断开停滞的连接"""
+        with self._lock:
+            connections = list(self._connections)
+        for connection in connections:
+            connection.monitor.add_sample(connection.arrived, now)
+            rate = connection.monitor.rate()
+            if connection.monitor.covers_window() and rate < self.min_speed:
+                logger.warning(f"连接停滞：最近 {self.window:.0f} 秒速度 {rate / 1024:.1f} KB/s，断开后重新连接")
+                connection.stalled = True
+                self.unwatch(connection)
+                close_response(connection.response)
+    
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.check()
+
+
+class DownloadCancelledError(Exception):
+    """下载已被取消（例如快速启动时发现了更新的版本）"""
+
+
+class DownloadTarget:
+    """预分配到完整大小的下载文件，通过内存映射按偏移写入
+    
+    分段和续传下载的各线程直接写到自己的偏移位置，不需要 seek，也不经过 Python 的文件缓冲；
+    边下边解压和哈希计算从同一个映射读取。无法映射时退回按偏移写文件。
+    """
+    
+    def __init__(self, path, size, preallocate=True):
+        self.path = path
+        self.size = size
+        self._lock = threading.Lock()
+        self._map = None
+        self._file = open(path, 'r+b' if os.path.exists(path) else 'w+b')
+        if preallocate or os.fstat(self._file.fileno()).st_size != size:
+            self._preallocate()
+        if size > 0:
+            try:
+                self._map = mmap.mmap(self._file.fileno(), size)
+            except (OSError, ValueError) as e:
+                logger.warning(f"无法映射下载文件，改用按偏移写入: {e}")
+    
+    def _preallocate(self):
+        """一次性分配完整大小，避免文件在下载过程中分多次增长而产生碎片"""
+        self._file.truncate(0)
+        if hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(self._file.fileno(), 0, self.size)
+                return
+            except OSError:
+                pass
+        # Windows 上 SetEndOfFile 会直接分配磁盘空间
+        self._file.truncate(self.size)
+    
+    def write_at(self, offset, data):
+        """把 data 写到 offset 处（可在多个线程中并发调用，各自写不同区间）"""
+        if offset + len(data) > self.size:
+            raise Exception(f"写入位置超出文件大小: {offset + len(data)}/{self.size}")
+        if self._map is not None:
+            self._map[offset:offset + len(data)] = data
+        elif hasattr(os, 'pwrite'):
+            os.pwrite(self._file.fileno(), data, offset)
+        else:
+            with self._lock:
+                self._file.seek(offset)
+                self._file.write(data)
+                self._file.flush()
+    
+    def read_at(self, offset, size):
+        """从映射读取 [offset, offset + size)，没有映射或已关闭时返回 None（调用方改为读文件）"""
+        if self._map is None or offset + size > self.size:
+            return None
+        try:
+            return self._map[offset:offset + size]
+        except ValueError:
+            return None
+    
+    def flush(self):
+        if self._map is not None:
+            self._map.flush()
+    
+    def close(self):
+        """关闭映射和文件（重命名前必须关闭，Windows 不能重命名已映射的文件）"""
+        if self._map is not None:
+            self._map.flush()
+            self._map.close()
+        self._file.close()
+
+
+class StreamingHasher:
+    """跟随下载进度计算 SHA-256（可同时计算分块哈希），下载完成时不需要再读一遍文件
+    
+    刚写入的数据通常还在系统文件缓存中，读取时不会产生额外的磁盘 I/O。
+    """
+    
+    READ_SIZE = 1024 * 1024
+    
+    def __init__(self, path, available, block_size=0, target=None):
+        self.path = path
+        self.available = available  # 返回文件开头已连续写入磁盘的字节数
+        self.block_size = block_size
+        self.target = target  # 返回当前 DownloadTarget（可为 None），有映射时直接从映射读取
+        self.sha256 = None
+        self.block_digests = []
+        self.error = None
+        self._total_size = None
+        self._stop_event = threading.Event()
+        self._future = None
+    
+    def start(self):
+        self._future = get_worker_pool().submit_task(self._run)
+    
+    def stop(self):
+        """放弃计算（下载失败或取消时调用）"""
+        self._stop_event.set()
+        wait([self._future])
+    
+    def finish(self, total_size):
+        """下载完成后等待计算结束，返回 (SHA-256, 分块哈希列表)"""
+        self._total_size = total_size
+        wait([self._future])
+        if self.error is not None:
+            raise self.error
+        return self.sha256, self.block_digests
+    
+    def _run(self):
+        try:
+            self._hash()
+        except Exception as e:
+            self.error = e
+    
+    def _hash(self):
+        f = None
+        pos = 0
+        try:
+            while True:
+                available = self.available()
+                if available < pos:
+                    # 已写入的数据被重新下载（续传记录重置或切换镜像），从头计算
+                    pos = 0
+                if pos == 0:
+                    digest, block, block_filled, blocks = hashlib.sha256(), hashlib.sha256(), 0, []
+                total_size = self._total_size
+                if total_size is not None and pos >= total_size:
+                    break
+                if available == pos:
+                    if self._stop_event.is_set():
+                        return
+                    if total_size is not None:
+                        raise Exception("下载的文件不完整，无法计算哈希")
+                    time.sleep(0.05)
+                    continue
+                size = min(self.READ_SIZE, available - pos)
+                target = self.target() if self.target else None
+                data = target.read_at(pos, size) if target is not None else None
+                if data is None:
+                    if f is None:
+                        f = open(self.path, 'rb')
+                    f.seek(pos)
+                    data = f.read(size)
+                if not data:
+                    time.sleep(0.05)
+                    continue
+                digest.update(data)
+                pos += len(data)
+                if self.block_size:
+                    view = memoryview(data)
+                    while view:
+                        take = min(len(view), self.block_size - block_filled)
+                        block.update(view[:take])
+                        block_filled += take
+                        view = view[take:]
+                        if block_filled == self.block_size:
+                            blocks.append(block.hexdigest())
+                            block, block_filled = hashlib.sha256(), 0
+            if block_filled:
+                blocks.append(block.hexdigest())
+            self.sha256 = digest.hexdigest()
+            self.block_digests = blocks
+        finally:
+            if f is not None:
+                f.close()
+
+
+def zip_member_path(target_dir, name):
+    """与 zipfile 相同的路径处理：去掉盘符、绝对路径和 .. 等，防止写到目标目录之外"""
+    arcname = name.replace('/', os.path.sep)
+    if os.path.altsep:
+        arcname = arcname.replace(os.path.altsep, os.path.sep)
+    arcname = os.path.splitdrive(arcname)[1]
+    invalid = ('', os.path.curdir, os.path.pardir)
+    arcname = os.path.sep.join(x for x in arcname.split(os.path.sep) if x not in invalid)
+    if os.path.sep == '\\':
+        arcname = zipfile.ZipFile._sanitize_windows_name(arcname, os.path.sep)
+    return os.path.join(target_dir, arcname)
+
+
+class InstallIndex:
+    """安装目录中各文件的大小、修改时间和摘要（CRC-32 / SHA-256）缓存
+    
+    大小和修改时间都没变时直接使用缓存的摘要，不必重新读取文件。
+    """
+    
+    def __init__(self, install_path):
+        self.install_path = install_path
+        self.path = os.path.join(install_path, INSTALL_INDEX_NAME)
+        self.entries = {}  # 文件名 -> {'size', 'mtime_ns', 'crc'/'sha256'}
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"安装索引已损坏，将重新计算: {e}")
+    
+    def is_unchanged(self, name, crc, size):
+        """安装目录中的文件与 zip 条目（CRC-32 和大小）一致时返回 True"""
+        if name.endswith('/'):
+            return False
+        return self._digest(name, size, 'crc', self._file_crc) == crc
+    
+    def has_file(self, name, size, sha256):
+        """安装目录中的文件与文件清单中的记录（大小和 SHA-256）一致时返回 True"""
+        return self._digest(name, size, 'sha256', _file_sha256) == sha256
+    
+    def file_sha256(self, name):
+        """安装目录中文件的 SHA-256，文件不存在时返回 None"""
+        return self._digest(name, None, 'sha256', _file_sha256)
+    
+    def _digest(self, name, size, key, compute):
+        """返回文件的摘要；文件不存在或大小不是 size 时返回 None（不读取文件）"""
+        path = zip_member_path(self.install_path, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if not os.path.isfile(path) or (size is not None and stat.st_size != size):
+            return None
+        with self._lock:
+            entry = self.entries.get(name)
+            if entry and entry.get('size') == stat.st_size and entry.get('mtime_ns') == stat.st_mtime_ns:
+                if key in entry:
+                    return entry[key]
+            else:
+                entry = None
+        
+        value = compute(path)
+        with self._lock:
+            if entry is None:
+                entry = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+            entry[key] = value
+            self.entries[name] = entry
+        return value
+    
+    @staticmethod
+    def _file_crc(path):
+        crc = 0
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(EXTRACT_CHUNK_SIZE)
+                if not chunk:
+                    break
+                crc = zlib.crc32(chunk, crc)
+        return crc
+    
+    def rebuild(self, infos):
+        """安装完成后按 zip 条目重新生成索引"""
+        self._rebuild((info.filename, 'crc', info.CRC) for info in infos if not info.is_dir())
+    
+    def rebuild_from_manifest(self, files):
+        """按文件清单更新后重新生成索引"""
+        self._rebuild((entry['path'], 'sha256', entry['sha256']) for entry in files)
+    
+    def _rebuild(self, records):
+        entries = {}
+        for name, key, value in records:
+            try:
+                stat = os.stat(zip_member_path(self.install_path, name))
+            except OSError:
+                continue
+            entries[name] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, key: value}
+        with self._lock:
+            self.entries = entries
+    
+    def save(self):
+        with self._lock:
+            data = json.dumps(self.entries)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+
+def _offtin(buf):
+    """解码 bsdiff 的 8 字节整数（小端，最高位为符号位）"""
+    value = int.from_bytes(buf, 'little') & 0x7FFFFFFFFFFFFFFF
+    return -value if buf[7] & 0x80 else value
+
+
+@functools.lru_cache(maxsize=8)
+def _byte_masks(size):
+    return int.from_bytes(b'\x7f' * size, 'little'), int.from_bytes(b'\x80' * size, 'little')
+
+
+def _add_bytes(a, b):
+    """逐字节相加（模 256），用大整数按字节并行计算，避免逐字节的 Python 循环"""
+    size = len(a)
+    if not size:
+        return b''
+    low, high = _byte_masks(size)
+    x = int.from_bytes(a, 'little')
+    y = int.from_bytes(b, 'little')
+    return (((x & low) + (y & low)) ^ ((x ^ y) & high)).to_bytes(size, 'little')
+
+
+class _Bz2BlockReader:
+    """按需解压 bsdiff 补丁中的一个 bzip2 数据块"""
+    
+    def __init__(self, f, start, length):
+        self._file = f
+        self._pos = start
+        self._end = start + length
+        self._decompressor = bz2.BZ2Decompressor()
+        self._buffer = bytearray()
+    
+    def read(self, size):
+        while len(self._buffer) < size:
+            data = b''
+            if self._decompressor.needs_input:
+                if self._decompressor.eof or self._pos >= self._end:
+                    raise ValueError("补丁数据不完整")
+                self._file.seek(self._pos)
+                data = self._file.read(min(64 * 1024, self._end - self._pos))
+                self._pos += len(data)
+            self._buffer += self._decompressor.decompress(data, max(size - len(self._buffer), 64 * 1024))
+        result = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return result
+
+
+def apply_bsdiff_patch(old_path, patch_path, new_path):
+    """流式应用 BSDIFF40 格式（bsdiff4 生成的格式）的补丁，返回新文件的 SHA-256
+    
+    三个 bzip2 数据块按需解压，旧文件按控制数据定位读取，输出分块写入，内存占用与文件大小无关。
+    """
+    digest = hashlib.sha256()
+    patch_size = os.path.getsize(patch_path)
+    with open(patch_path, 'rb') as patch:
+        header = patch.read(32)
+        if len(header) != 32 or header[:8] != b'BSDIFF40':
+            raise ValueError("不支持的补丁格式")
+        ctrl_len, diff_len, new_size = _offtin(header[8:16]), _offtin(header[16:24]), _offtin(header[24:32])
+        if ctrl_len < 0 or diff_len < 0 or new_size < 0 or 32 + ctrl_len + diff_len > patch_size:
+            raise ValueError("补丁头部数据错误")
+        ctrl = _Bz2BlockReader(patch, 32, ctrl_len)
+        diff = _Bz2BlockReader(patch, 32 + ctrl_len, diff_len)
+        extra = _Bz2BlockReader(patch, 32 + ctrl_len + diff_len, patch_size - 32 - ctrl_len - diff_len)
+        
+        with open(old_path, 'rb') as old, open(new_path, 'wb') as new:
+            old_size = os.fstat(old.fileno()).st_size
+            old_pos = new_pos = 0
+            while new_pos < new_size:
+                control = ctrl.read(24)
+                add_len, copy_len, seek_len = _offtin(control[:8]), _offtin(control[8:16]), _offtin(control[16:])
+                if add_len < 0 or copy_len < 0 or new_pos + add_len + copy_len > new_size:
+                    raise ValueError("补丁控制数据错误")
+                
+                # 差异数据与旧文件对应位置逐字节相加（超出旧文件范围的部分按 0 处理）
+                while add_len:
+                    size = min(add_len, PATCH_CHUNK_SIZE)
+                    lead = min(max(-old_pos, 0), size)
+                    start, end = old_pos + lead, min(old_pos + size, old_size)
+                    old_data = bytes(lead)
+                    if start < end:
+                        old.seek(start)
+                        old_data += old.read(end - start)
+                    old_data += bytes(size - len(old_data))
+                    data = _add_bytes(diff.read(size), old_data)
+                    new.write(data)
+                    digest.update(data)
+                    old_pos += size
+                    new_pos += size
+                    add_len -= size
+                
+                # 额外数据直接写入
+                while copy_len:
+                    size = min(copy_len, PATCH_CHUNK_SIZE)
+                    data = extra.read(size)
+                    new.write(data)
+                    digest.update(data)
+                    new_pos += size
+                    copy_len -= size
+                
+                old_pos += seek_len
+    return digest.hexdigest()
+
+
+def extract_zip_parallel(zip_path, target_dir, workers=None, progress_callback=None, install_index=None):
+    """多线程解压 zip（zlib 解压时会释放 GIL）
+    
+    条目按大小从大到小交给共用的子任务线程池（最多同时 workers 个），每个线程使用自己的 ZipFile 句柄；
+    progress_callback(已解压字节, 总字节) 会在解压线程中调用。
+    传入 install_index 时跳过与现有安装相同的文件，返回跳过的条目数。
+    """
+    workers = workers or EXTRACT_WORKERS
+    with zipfile.ZipFile(zip_path) as zip_ref:
+        infos = zip_ref.infolist()
+    
+    # 目录先在当前线程创建，文件按大小降序排列，避免大文件最后才开始
+    members = []
+    for info in infos:
+        target = zip_member_path(target_dir, info.filename)
+        if info.is_dir():
+            os.makedirs(target, exist_ok=True)
+        else:
+            members.append((info, target))
+    members.sort(key=lambda member: member[0].file_size, reverse=True)
+    total = sum(info.file_size for info, _ in members)
+    logger.info(f"并行解压 {len(members)} 个文件（{total} 字节），线程数 {workers}")
+    
+    local = threading.local()
+    handles = []
+    lock = threading.Lock()
+    abort_event = threading.Event()
+    progress = {'done': 0, 'skipped': 0}
+    
+    def extract_member(info, target):
+        if abort_event.is_set():
+            return
+        if install_index is not None and install_index.is_unchanged(info.filename, info.CRC, info.file_size):
+            with lock:
+                progress['done'] += info.file_size
+                progress['skipped'] += 1
+                done = progress['done']
+            if progress_callback:
+                progress_callback(done, total)
+            return
+        zip_ref = getattr(local, 'zip_ref', None)
+        if zip_ref is None:
+            zip_ref = local.zip_ref = zipfile.ZipFile(zip_path)
+            with lock:
+                handles.append(zip_ref)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # ZipFile.open 在读完时校验 CRC，损坏的条目会抛出 BadZipFile
+        with zip_ref.open(info) as source, open(target, 'wb') as dest:
+            while not abort_event.is_set():
+                chunk = source.read(EXTRACT_CHUNK_SIZE)
+                if not chunk:
+                    break
+                dest.write(chunk)
+                with lock:
+                    progress['done'] += len(chunk)
+                    done = progress['done']
+                if progress_callback:
+                    progress_callback(done, total)
+    
+    futures = run_tasks(extract_member, members, workers)
+    try:
+        finished, _ = wait(futures, return_when=FIRST_EXCEPTION)
+        for future in finished:
+            if future.exception() is not None:
+                abort_event.set()
+                raise future.exception()
+    finally:
+        abort_event.set()
+        wait(futures)
+        for zip_ref in handles:
+            zip_ref.close()
+    if progress['skipped']:
+        logger.info(f"增量安装：跳过 {progress['skipped']} 个未变化的文件")
+    return progress['skipped']
+
+
+class StreamingZipExtractor:
+    """边下载边解压：按本地文件头顺序解压正在下载的 zip，下载完成后用中央目录校验
+
+    只处理可以顺序读取的条目（存储或 deflate、未加密），遇到其他情况时放弃，
+    安装步骤会回退到普通解压。
+    """
+    
+    READ_SIZE = 64 * 1024
+    
+    def __init__(self, source_path, target_dir, available, install_index=None, target=None):
+        self.source_path = source_path
+        self.target_dir = target_dir
+        self.available = available  # 返回文件开头已连续写入磁盘的字节数
+        self.install_index = install_index  # 提供时跳过与现有安装相同的文件
+        self.target = target  # 返回当前 DownloadTarget（可为 None），有映射时直接从映射读取
+        self.entries = {}  # 文件名 -> (CRC-32, 解压后大小)
+        self.ok = False
+        self.error = None
+        self._total_size = None
+        self._stop_event = threading.Event()
+        self._future = None
+        self._file = None
+        self._pos = 0
+    
+    def start(self):
+        """在共用的子任务线程中开始解压"""
+        self._future = get_worker_pool().submit_task(self._run)
+    
+    def source_complete(self, total_size):
+        """通知下载已完成，之后读取超出 total_size 即视为 zip 不完整"""
+        self._total_size = total_size
+    
+    def stop(self):
+        """停止解压（下载失败或取消时调用）"""
+        self._stop_event.set()
+    
+    def join(self):
+        """等待解压结束，之后不再读取下载文件"""
+        if self._future is not None:
+            wait([self._future])
+    
+    def verify(self, zip_path):
+        """用中央目录校验流式解压结果，文件名、CRC 和大小全部一致时返回 True"""
+        if not self.ok:
+            return False
+        try:
+            with zipfile.ZipFile(zip_path) as zip_ref:
+                infos = zip_ref.infolist()
+            if len(infos) != len(self.entries):
+                raise Exception(f"条目数量不一致: {len(self.entries)}/{len(infos)}")
+            for info in infos:
+                if self.entries.get(info.filename) != (info.CRC, info.file_size):
+                    raise Exception(f"条目与中央目录不一致: {info.filename}")
+            logger.info(f"边下边解压校验通过，共 {len(infos)} 个条目")
+            return True
+        except Exception as e:
+            logger.warning(f"边下边解压校验失败，安装时将回退到普通解压: {e}")
+            return False
+    
+    def _run(self):
+        try:
+            os.makedirs(self.target_dir, exist_ok=True)
+            self._wait_for(4)
+            self._file = open(self.source_path, 'rb')
+            while True:
+                signature = self._read(4)
+                if signature == b'PK\x03\x04':
+                    self._extract_entry()
+                elif signature in (b'PK\x01\x02', b'PK\x05\x06'):
+                    # 到达中央目录，所有条目已解压
+                    break
+                else:
+                    raise Exception("无法识别的 zip 结构")
+            self.ok = True
+        except Exception as e:
+            self.error = e
+            logger.info(f"边下边解压已停止: {e}")
+        finally:
+            if self._file is not None:
+                self._file.close()
+    
+    def _wait_for(self, end):
+        """等待文件开头至少 end 字节可读"""
+        while self.available() < end:
+            if self._stop_event.is_set():
+                raise DownloadCancelledError("解压已停止")
+            if self._total_size is not None and end > self._total_size:
+                raise Exception("zip 文件不完整")
+            time.sleep(0.05)
+    
+    def _read(self, size):
+        self._wait_for(self._pos + size)
+        target = self.target() if self.target else None
+        data = target.read_at(self._pos, size) if target is not None else None
+        if data is None:
+            self._file.seek(self._pos)
+            data = self._file.read(size)
+        if len(data) != size:
+            raise Exception("读取 zip 数据失败")
+        self._pos += size
+        return data
+    
+    def _read_some(self, size):
+        """读取最多 size 字节，至少等到 1 字节可读"""
+        self._wait_for(self._pos + 1)
+        size = min(size, self.available() - self._pos)
+        return self._read(size)
+    
+    def _extract_entry(self):
+        (_, flags, method, _, _, crc, compress_size, file_size,
+         name_len, extra_len) = struct.unpack('<HHHHHIIIHH', self._read(26))
+        raw_name = self._read(name_len)
+        extra = self._read(extra_len)
+        if flags & 0x1:
+            raise Exception("不支持加密的 zip 条目")
+        if method not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            raise Exception(f"不支持的压缩方式: {method}")
+        
+        # 文件名处理与 zipfile 保持一致，便于最后与中央目录比对
+        name = raw_name.decode('utf-8' if flags & 0x800 else 'cp437')
+        name = name.split('\x00', 1)[0]
+        if os.sep != '/':
+            name = name.replace(os.sep, '/')
+        
+        # 带数据描述符的存储条目无法确定数据长度（目录条目除外，数据一定为空）
+        has_descriptor = bool(flags & 0x8)
+        if has_descriptor and method == zipfile.ZIP_STORED:
+            if not name.endswith('/'):
+                raise Exception("不支持带数据描述符的存储条目")
+            compress_size = 0
+        
+        # zip64：大小字段为 0xFFFFFFFF 时真实值在扩展字段中
+        zip64 = False
+        if compress_size == 0xFFFFFFFF or file_size == 0xFFFFFFFF:
+            zip64 = True
+            offset = 0
+            while offset + 4 <= len(extra):
+                field_id, field_len = struct.unpack('<HH', extra[offset:offset + 4])
+                if field_id == 0x0001:
+                    values = extra[offset + 4:offset + 4 + field_len]
+                    if file_size == 0xFFFFFFFF:
+                        file_size, = struct.unpack('<Q', values[:8])
+                        values = values[8:]
+                    if compress_size == 0xFFFFFFFF:
+                        compress_size, = struct.unpack('<Q', values[:8])
+                    break
+                offset += 4 + field_len
+        
+        # 本地文件头中已有 CRC 和大小时，与现有安装相同的文件直接跳过
+        if (not has_descriptor and self.install_index is not None
+                and self.install_index.is_unchanged(name, crc, file_size)):
+            self._wait_for(self._pos + compress_size)
+            self._pos += compress_size
+            self.entries[name] = (crc, file_size)
+            return
+        
+        target = zip_member_path(self.target_dir, name)
+        running_crc = 0
+        written = 0
+        if name.endswith('/'):
+            os.makedirs(target, exist_ok=True)
+            out = None
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            out = open(target, 'wb')
+        try:
+            if method == zipfile.ZIP_STORED:
+                remaining = compress_size
+                while remaining:
+                    data = self._read(min(self.READ_SIZE, remaining))
+                    remaining -= len(data)
+                    running_crc = zlib.crc32(data, running_crc)
+                    written += len(data)
+                    out.write(data)
+            else:
+                decompressor = zlib.decompressobj(-15)
+                remaining = None if has_descriptor else compress_size
+                while not decompressor.eof:
+                    if remaining is None:
+                        data = self._read_some(self.READ_SIZE)
+                    elif remaining:
+                        data = self._read(min(self.READ_SIZE, remaining))
+                        remaining -= len(data)
+                    else:
+                        raise Exception(f"压缩数据不完整: {name}")
+                    output = decompressor.decompress(data)
+                    if output:
+                        running_crc = zlib.crc32(output, running_crc)
+                        written += len(output)
+                        if out is not None:
+                            out.write(output)
+                # 多读的部分属于下一个结构，回退读取位置
+                self._pos -= len(decompressor.unused_data)
+        finally:
+            if out is not None:
+                out.close()
+        
+        if has_descriptor:
+            descriptor = self._read(4)
+            if descriptor == b'PK\x07\x08':
+                descriptor = self._read(4)
+            crc, = struct.unpack('<I', descriptor)
+            if zip64:
+                compress_size, file_size = struct.unpack('<QQ', self._read(16))
+            else:
+                compress_size, file_size = struct.unpack('<II', self._read(8))
+        
+        if running_crc != crc or written != file_size:
+            raise Exception(f"条目校验失败: {name}")
+        self.entries[name] = (crc, file_size)
+
+
+def collect_download_mirrors(data, channel='stable', key='zip'):
+    """从 /api/info 返回的数据中收集所有 zip 下载源，gitcode 排在首位"""
+    sources = data.get('downloads', {}).get(channel, {})
+    mirrors = []
+    if isinstance(sources, dict):
+        names = sorted(sources, key=lambda name: name != 'gitcode')
+        for name in names:
+            source = sources[name]
+            url = source.get(key, '') if isinstance(source, dict) else ''
+            if url and url not in mirrors:
+                mirrors.append(url)
+    return mirrors
+
+
+def collect_package_digest(data, channel='stable'):
+    """读取 /api/info 中安装包的 SHA-256（downloads.<channel>.<源>.sha256，各下载源为同一文件）
+    
+    可选的 block_size 和 block_sha256（分块哈希列表）用于校验失败时只重新下载损坏的部分。
+    没有提供时返回空字典。
+    """
+    sources = data.get('downloads', {}).get(channel, {})
+    if isinstance(sources, dict):
+        for name in sorted(sources, key=lambda name: name != 'gitcode'):
+            source = sources[name]
+            if isinstance(source, dict) and source.get('sha256'):
+                digest = {'sha256': str(source['sha256']).lower()}
+                if source.get('block_size') and isinstance(source.get('block_sha256'), list):
+                    digest['block_size'] = int(source['block_size'])
+                    digest['block_sha256'] = [str(value).lower() for value in source['block_sha256']]
+                return digest
+    return {}
+
+
+def collect_manifest_urls(data, channel='stable'):
+    """收集各下载源提供的文件清单地址（downloads.<channel>.<源>.manifest），顺序与 zip 下载源相同"""
+    return collect_download_mirrors(data, channel, key='manifest')
+
+
+def parse_manifest(manifest, manifest_url):
+    """校验文件清单并把每个文件的下载地址解析为绝对地址
+    
+    清单格式: {"version": ..., "base_url": 可选, "pack": 可选,
+              "files": [{"path", "size", "sha256", "url" 或 "offset", "patches": 可选}]}
+    带 offset 的文件从 pack 文件中按 Range 读取，其余文件按 url（默认为 path）相对 base_url 下载。
+    patches 为从旧版本文件生成的二进制补丁: [{"from_sha256", "size", "url" 或 "offset", "format"}]。
+    返回 [{'path', 'size', 'sha256', 'url', 'offset', 'patches'}]，offset 为 None 表示整个地址就是该文件。
+    """
+    files = manifest.get('files') if isinstance(manifest, dict) else None
+    if not isinstance(files, list) or not files:
+        raise ValueError("文件清单为空或格式错误")
+    base_url = urljoin(manifest_url, manifest.get('base_url', ''))
+    pack_url = urljoin(manifest_url, manifest['pack']) if manifest.get('pack') else ''
+    result = []
+    for entry in files:
+        path = str(entry['path']).replace('\\', '/').lstrip('/')
+        size = int(entry['size'])
+        sha256 = str(entry['sha256']).lower()
+        url, offset = _resolve_manifest_location(entry, base_url, pack_url, quote(path))
+        patches = []
+        for patch in entry.get('patches') or []:
+            patch_url, patch_offset = _resolve_manifest_location(patch, base_url, pack_url, '')
+            patches.append({
+                'from_sha256': str(patch['from_sha256']).lower(),
+                'size': int(patch['size']),
+                'sha256': str(patch.get('sha256', '')).lower(),
+                'format': patch.get('format', 'bsdiff4'),
+                'url': patch_url,
+                'offset': patch_offset,
+            })
+        result.append({'path': path, 'size': size, 'sha256': sha256, 'url': url, 'offset': offset,
+                       'patches': patches})
+    return result
+
+
+def _resolve_manifest_location(entry, base_url, pack_url, default_url):
+    """返回清单条目的 (下载地址, pack 偏移)"""
+    if entry.get('offset') is not None:
+        if not pack_url:
+            raise ValueError("文件清单缺少 pack 地址")
+        return pack_url, int(entry['offset'])
+    url = entry.get('url') or default_url
+    if not url:
+        raise ValueError("文件清单条目缺少下载地址")
+    return urljoin(base_url, url), None
+
+
+class TransportReply:
+    """传输后端发起的一次 GET 请求
+    
+    status_code/headers 在收到响应头后可用（headers 的键为小写）；未指定 on_data 时响应体保存在 content 中；
+    error 为网络错误，HTTP 错误状态码由 raise_for_status 检查。
+    """
+    
+    def __init__(self, url):
+        self.url = url
+        self.status_code = 0
+        self.headers = {}
+        self.content = b''
+        self.error = None
+        self.finished = False
+        self.aborted = False
+    
+    def abort(self):
+        """取消请求（可在任意线程调用）"""
+        self.aborted = True
+    
+    def raise_for_status(self):
+        if self.error is not None:
+            raise self.error
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+
+class _RequestsReply(TransportReply):
+    
+    def __init__(self, url):
+        super().__init__(url)
+        self._response = None
+        self._connections = set()  # 请求正在使用的 urllib3 连接
+        self._lock = threading.Lock()
+    
+    def _attach(self, connection):
+        """登记请求使用的连接；已取消时立即断开"""
+        with self._lock:
+            self._connections.add(connection)
+            aborted = self.aborted
+        if aborted:
+            _disconnect(connection)
+    
+    def _detach(self):
+        """请求结束，连接归还连接池，之后取消不应再断开它"""
+        with self._lock:
+            self._connections.clear()
+    
+    def abort(self):
+        super().abort()
+        # 还在等待响应头的请求没有 _response，直接断开连接，阻塞的读取随即出错返回
+        with self._lock:
+            connections = list(self._connections)
+        for connection in connections:
+            _disconnect(connection)
+        if self._response is not None:
+            close_response(self._response)
+
+
+def _disconnect(connection):
+    """从其他线程断开 urllib3 连接的套接字（正在建立的连接由 happy_eyeballs_connect 检查取消）"""
+    sock = getattr(connection, 'sock', None)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class RequestsTransport:
+    """基于共享 requests 会话的传输：get 阻塞到请求结束，需在工作线程中调用"""
+    
+    name = 'requests'
+    blocking = True
+    
+    def get(self, url, headers=None, on_started=None, on_data=None, on_finished=None, timeout=None,
+            on_created=None):
+        """发起 GET 请求并返回 TransportReply
+        
+        on_created(reply) 在发起请求前调用，调用方可保存 reply 以便随时取消（包括连接和等待响应头期间），
+        on_started(reply) 在收到响应头后调用，on_data(reply, chunk) 在收到数据时调用，
+        on_finished(reply) 在请求结束（成功、失败或取消）时调用。
+        """
+        reply = _RequestsReply(url)
+        if on_created is not None:
+            on_created(reply)
+        _active_request.reply = reply
+        try:
+            if reply.aborted:
+                raise DownloadCancelledError("请求已取消")
+            response = get_http_session(retries=False).get(
+                url, headers=headers, stream=True, timeout=(HTTP_CONNECT_TIMEOUT, timeout or HTTP_READ_TIMEOUT))
+            reply._response = response
+            try:
+                reply.status_code = response.status_code
+                reply.headers = {key.lower(): value for key, value in response.headers.items()}
+                if on_started is not None:
+                    on_started(reply)
+                chunks = []
+                for chunk in iter_response_chunks(response):
+                    if on_data is not None:
+                        on_data(reply, chunk)
+                    else:
+                        chunks.append(chunk)
+                reply.content = b''.join(chunks)
+            finally:
+                reply._detach()
+                response.close()
+        except Exception as e:
+            reply.error = e
+        finally:
+            _active_request.reply = None
+        if reply.aborted:
+            reply.error = DownloadCancelledError("请求已取消")
+        reply.finished = True
+        if on_finished is not None:
+            on_finished(reply)
+        return reply
+
+
+class _QtReply(TransportReply):
+    
+    def __init__(self, url, reply):
+        super().__init__(url)
+        self._reply = reply
+    
+    def abort(self):
+        super().abort()
+        if not self.finished:
+            self._reply.abort()
+
+
+# QNetworkReply 的网络错误对应的异常，便于 RetryPolicy 按类型决定是否重试
+_QT_NETWORK_ERRORS = {
+    QNetworkReply.HostNotFoundError: socket.gaierror,
+    QNetworkReply.ConnectionRefusedError: ConnectionRefusedError,
+    QNetworkReply.TimeoutError: socket.timeout,
+    QNetworkReply.OperationCanceledError: socket.timeout,  # 超过 transferTimeout 时 Qt 以取消结束请求
+    QNetworkReply.RemoteHostClosedError: ConnectionResetError,
+    QNetworkReply.TemporaryNetworkFailureError: ConnectionResetError,
+    QNetworkReply.NetworkSessionFailedError: ConnectionResetError,
+}
+
+
+class QtTransport(QObject):
+    """基于 QNetworkAccessManager 的事件驱动传输：get 立即返回，回调在所属线程的事件循环中调用，不需要工作线程"""
+    
+    name = 'qt'
+    blocking = False
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.manager = QNetworkAccessManager(self)
+        # 进行中请求的槽函数；由传输持有引用直到请求结束，避免闭包在信号触发前被回收
+        self._slots = {}
+    
+    def get(self, url, headers=None, on_started=None, on_data=None, on_finished=None, timeout=None,
+            on_created=None):
+        """发起 GET 请求并返回 TransportReply，参数含义同 RequestsTransport.get"""
+        request = QNetworkRequest(QUrl(url))
+        request.setAttribute(QNetworkRequest.RedirectPolicyAttribute, QNetworkRequest.NoLessSafeRedirectPolicy)
+        request.setTransferTimeout(int((timeout or HTTP_READ_TIMEOUT) * 1000))
+        for key, value in (headers or {}).items():
+            request.setRawHeader(key.encode('latin-1'), value.encode('latin-1'))
+        qt_reply = self.manager.get(request)
+        reply = _QtReply(url, qt_reply)
+        if on_created is not None:
+            on_created(reply)
+        chunks = []
+        state = {'started': False, 'failed': False}
+        
+        def fail(error):
+            # 回调出错时结束请求；异常不能抛进 Qt 的槽函数，否则整个进程会退出
+            reply.error = error
+            state['failed'] = True
+            if not qt_reply.isFinished():
+                qt_reply.abort()
+        
+        def read_headers(final=False):
+            # 跟随重定向时每个响应都会触发 metaDataChanged，只把最终响应交给调用方
+            if state['started']:
+                return
+            reply.status_code = qt_reply.attribute(QNetworkRequest.HttpStatusCodeAttribute) or 0
+            reply.headers = {bytes(key).decode('latin-1').lower(): bytes(value).decode('latin-1')
+                             for key, value in qt_reply.rawHeaderPairs()}
+            if not reply.status_code or (300 <= reply.status_code < 400 and reply.status_code != 304 and not final):
+                return
+            state['started'] = True
+            if on_started is not None:
+                try:
+                    on_started(reply)
+                except Exception as e:
+                    fail(e)
+        
+        def read_data():
+            read_headers()
+            chunk = bytes(qt_reply.readAll())
+            if not chunk or reply.aborted or state['failed'] or not state['started']:
+                return
+            if on_data is not None:
+                try:
+                    on_data(reply, chunk)
+                except Exception as e:
+                    fail(e)
+            else:
+                chunks.append(chunk)
+        
+        def finish():
+            if not state['failed']:
+                read_headers(final=True)
+                read_data()
+            reply.content = b''.join(chunks)
+            error = qt_reply.error()
+            if reply.aborted:
+                reply.error = DownloadCancelledError("请求已取消")
+            elif not state['failed'] and error != QNetworkReply.NoError and reply.status_code < 400:
+                # 包括收到 200 后连接中途断开；HTTP 错误状态码仍由 raise_for_status 处理
+                reply.error = _QT_NETWORK_ERRORS.get(error, ConnectionError)(qt_reply.errorString())
+            reply.finished = True
+            self._slots.pop(id(qt_reply), None)
+            qt_reply.deleteLater()
+            if on_finished is not None:
+                try:
+                    on_finished(reply)
+                except Exception as e:
+                    logger.error(f"处理请求结果失败: {url}: {e}\n{traceback.format_exc()}")
+        
+        # metaDataChanged 经 lambda 连接，final 始终取默认值
+        slots = (lambda: read_headers(), read_data, finish)
+        self._slots[id(qt_reply)] = slots
+        qt_reply.metaDataChanged.connect(slots[0])
+        qt_reply.readyRead.connect(slots[1])
+        qt_reply.finished.connect(slots[2])
+        return reply
+
+
+_requests_transport = RequestsTransport()
+
+
+def create_transport(backend=None, parent=None):
+    """按 NETWORK_BACKEND（或 backend 参数）创建传输后端；Qt 后端需在使用它的线程中创建"""
+    backend = backend or NETWORK_BACKEND
+    if backend == 'qt':
+        return QtTransport(parent)
+    if backend != 'requests':
+        logger.warning(f"未知的网络传输后端 {backend}，使用 requests")
+    return _requests_transport
+
+
+class _GuiThreadReleaser(QObject):
+    """在 GUI 线程中释放对象的引用
+    
+    工作线程持有的可能是 NetworkWorker 等 QObject 的最后一个引用，在工作线程中释放会在错误的线程中
+    销毁它，而 GUI 线程的事件队列里可能还有发往它的信号；经排队信号转交后，引用在 GUI 线程中释放。
+    """
+    release = pyqtSignal(object)
+    
+    def __init__(self):
+        super().__init__()
+        self.release.connect(self._drop)
+    
+    def _drop(self, objects):
+        pass
+
+
+_gui_thread_releaser = _GuiThreadReleaser()  # 模块导入时创建，属于 GUI 线程
+
+
+def release_in_gui_thread(*objects):
+    """把 objects 的引用转交给 GUI 线程释放，调用方随后应丢弃自己的引用"""
+    _gui_thread_releaser.release.emit(objects)
+
+
+class _WorkerJob(QRunnable):
+    """线程池中执行的一个任务"""
+    
+    def __init__(self, pool, func, cancel):
+        super().__init__()
+        self.pool = pool
+        self.func = func
+        self.cancel = cancel
+    
+    def run(self):
+        try:
+            self.func()
+        except Exception as e:
+            # 任务应通过自己的信号报告错误，这里只防止异常丢失
+            logger.error(f"后台任务失败: {e}\n{traceback.format_exc()}")
+        finally:
+            self.pool._job_finished(self)
+            # 任务持有的对象（如 NetworkWorker）交给 GUI 线程释放
+            release_in_gui_thread(self.func, self.cancel)
+            self.func = self.cancel = None
+
+
+class WorkerPool:
+    """长期存在的网络和安装工作线程池
+    
+    线程只在第一次需要时创建，之后一直复用，不会在每次获取版本信息或下载时新建 QThread；
+    任务的结果由任务自己的信号（如 NetworkWorker 的信号）送回 GUI 线程。
+    shutdown 只通知任务取消并丢弃排队的任务，不等待线程退出。
+    """
+    
+    def __init__(self, max_threads=None, tasks=None):
+        self._pool = QThreadPool()
+        self._pool.setMaxThreadCount(max_threads or WORKER_POOL_SIZE)
+        self._pool.setExpiryTimeout(-1)  # 空闲线程不退出
+        self._lock = threading.Lock()
+        self._jobs = set()
+        self.closed = False
+        # 任务内部的子任务另用一个线程池，避免任务等待子任务时占满任务线程而死锁
+        self.tasks = tasks or ThreadPoolExecutor(max_workers=TASK_POOL_SIZE, thread_name_prefix='bloret-task')
+    
+    def submit(self, func, cancel=None):
+        """在工作线程中执行 func；cancel 为关闭线程池时调用的取消函数。线程池已关闭时返回 False"""
+        job = _WorkerJob(self, func, cancel)
+        with self._lock:
+            if self.closed:
+                return False
+            self._jobs.add(job)
+        self._pool.start(job)
+        return True
+    
+    def submit_task(self, func, *args):
+        """把下载或解压的子任务交给共用的线程池执行，返回 Future"""
+        call = [func, args]
+        
+        def run():
+            try:
+                return call[0](*call[1])
+            finally:
+                # func 和参数可能持有 NetworkWorker 等 QObject，交给 GUI 线程释放
+                release_in_gui_thread(call.pop(), call.pop())
+        return self.tasks.submit(run)
+    
+    def _job_finished(self, job):
+        with self._lock:
+            self._jobs.discard(job)
+    
+    def active_jobs(self):
+        """排队和正在执行的任务数"""
+        with self._lock:
+            return len(self._jobs)
+    
+    def wait(self, timeout=-1):
+        """等待所有任务结束并回收线程（只供测试和命令行使用，GUI 线程不应调用）"""
+        return self._pool.waitForDone(int(timeout * 1000) if timeout >= 0 else -1)
+    
+    def shutdown(self):
+        """异步关闭：丢弃排队的任务，通知正在执行的任务取消，不等待线程退出
+        
+        子任务线程池不关闭：正在执行的任务（如安装）仍需要它，空闲线程在进程退出时结束。
+        """
+        with self._lock:
+            self.closed = True
+            jobs = list(self._jobs)
+        self._pool.clear()
+        for job in jobs:
+            if job.cancel is not None:
+                try:
+                    job.cancel()
+                except Exception as e:
+                    logger.warning(f"取消后台任务失败: {e}")
+        logger.info(f"工作线程池已关闭，{len(jobs)} 个任务在后台结束")
+
+
+_worker_pool = None
+_worker_pool_lock = threading.Lock()
+
+
+def get_worker_pool():
+    """获取进程共用的工作线程池（关闭后再次获取时创建新的线程池）"""
+    global _worker_pool
+    with _worker_pool_lock:
+        if _worker_pool is None or _worker_pool.closed:
+            # 旧线程池中的任务仍可能在使用子任务线程，沿用同一个子任务线程池
+            _worker_pool = WorkerPool(tasks=_worker_pool.tasks if _worker_pool is not None else None)
+        return _worker_pool
+
+
+def run_tasks(func, items, workers):
+    """在共用的子任务线程池中处理 items，最多同时处理 workers 项，返回各处理者的 Future
+    
+    每个处理者依次取出下一项调用 func(*item)；任意一项出错后其余处理者不再取新的项。
+    """
+    items = iter(items)
+    lock = threading.Lock()
+    failed = threading.Event()
+    
+    def worker():
+        while not failed.is_set():
+            with lock:
+                item = next(items, None)
+            if item is None:
+                return
+            try:
+                func(*item)
+            except BaseException:
+                failed.set()
+                raise
+    
+    pool = get_worker_pool()
+    return [pool.submit_task(worker) for _ in range(max(1, workers))]
+
+
 class NetworkWorker(QObject):
     """网络请求工作线程 - 整合测试程序的成功实现"""
     info_received = pyqtSignal(dict)
-    download_progress = pyqtSignal(int)
+    download_progress = pyqtSignal(dict)  # 进度记录，见 make_progress_record
+    download_extracted = pyqtSignal(str)  # 边下边解压成功时发出解压目录（在 download_complete 之前）
     download_complete = pyqtSignal(str)
     error_occurred = pyqtSignal(str)
     
-    def __init__(self):
+    def __init__(self, transport=None):
         super().__init__()
         self.temp_file_path = None
+        self.install_path = ''  # 已知安装路径时，边下边解压直接解压到安装目录旁边的暂存目录
+        self._cancel_event = threading.Event()
+        # 传输后端：blocking 为 True 时各方法会阻塞，需移到工作线程中调用；否则直接在当前线程调用，结果通过信号返回
+        self.transport = transport or create_transport(parent=self)
+        self._active_reply = None
+        self._probes = {}  # 本次下载中已探测的地址 -> 探测结果，缓存查找和开始下载时共用
+    
+    def cancel(self):
+        """取消正在进行的下载（可在任意线程调用）"""
+        self._cancel_event.set()
+        reply = self._active_reply
+        if reply is not None:
+            reply.abort()
         
     def fetch_info(self):
-        """获取版本信息"""
+        """获取版本信息（带条件请求，未变化时使用缓存）"""
         logger.info("开始获取版本信息")
+        if not self.transport.blocking:
+            self._fetch_info_async(RetryPolicy(INFO_RETRY_ATTEMPTS, INFO_RETRY_MAX_ELAPSED), time.monotonic(), 0, {})
+            return
         try:
-            response = requests.get('http://pcfs.eno.ink:3001/api/info', timeout=10)
-            response.raise_for_status()
-            data = response.json()
+            policy = RetryPolicy(INFO_RETRY_ATTEMPTS, INFO_RETRY_MAX_ELAPSED)
+            data = policy.run('fetch_info', self._request_info, self._cancel_event)
             logger.info(f"成功获取版本信息: {data}")
             self.info_received.emit(data)
         except Exception as e:
             logger.error(f"获取版本信息失败: {str(e)}")
             self.error_occurred.emit(f"获取版本信息失败: {str(e)}")
     
-    def download_file(self, url, filename):
-        """下载文件 - 整合测试程序的成功实现"""
-        logger.info(f"开始下载文件: {url} -> {filename}")
+    def _request_info(self):
+        """同时请求所有版本信息接口，返回第一个通过格式检查的结果，其余请求随即取消"""
+        endpoints = get_info_endpoints()
+        if len(endpoints) == 1:
+            return self._request_info_from(endpoints[0])
+        
+        results = queue.Queue()
+        replies = []
+        lock = threading.Lock()
+        finished = threading.Event()
+        
+        def track(reply):
+            # 请求发起前登记；已有结果后才开始的请求直接取消
+            with lock:
+                replies.append(reply)
+                if finished.is_set():
+                    reply.abort()
+        
+        def request(endpoint):
+            try:
+                results.put((endpoint, self._request_info_from(endpoint, track), None))
+            except Exception as e:
+                results.put((endpoint, None, e))
+        
+        pool = get_worker_pool()
+        for endpoint in endpoints:
+            pool.submit_task(request, endpoint)
+        
+        errors = []
+        try:
+            for _ in endpoints:
+                endpoint, data, error = results.get()
+                if error is None:
+                    logger.info(f"使用版本信息接口: {endpoint}")
+                    return data
+                logger.warning(f"版本信息接口 {endpoint} 失败: {error}")
+                errors.append(error)
+        finally:
+            with lock:
+                finished.set()
+                pending = list(replies)
+            for reply in pending:
+                reply.abort()
+        # 全部失败：优先抛出可重试的错误，交给 RetryPolicy 决定是否重试
+        retryable = [e for e in errors if RetryPolicy.classify(e)]
+        raise (retryable or errors)[0]
+    
+    def _request_info_from(self, endpoint, on_created=None):
+        """向单个接口发送条件请求（阻塞），on_created 见 RequestsTransport.get"""
+        reply = self.transport.get(endpoint, get_info_cache().conditional_headers(endpoint),
+                                   on_created=on_created, timeout=10)
+        return self._parse_info_reply(reply)
+    
+    def _parse_info_reply(self, reply):
+        """处理版本信息接口的响应：304 时使用该接口的缓存，否则检查格式后写入缓存"""
+        if reply.error is not None:
+            raise reply.error
+        cache = get_info_cache()
+        data = load_cached_info(reply.url) if reply.status_code == 304 else None
+        if data is not None:
+            logger.info("版本信息未变化，使用缓存")
+            cache.touch(reply.url)
+            return data
+        reply.raise_for_status()
+        data = validate_info(json.loads(reply.content.decode('utf-8')))
+        cache.put(reply.url, reply.content, reply.headers.get('etag', ''), reply.headers.get('last-modified', ''))
+        return data
+    
+    def _fetch_info_async(self, policy, started, retries, errors):
+        """事件驱动地获取版本信息：同时请求所有接口，第一个有效响应胜出；全部失败时按重试策略用定时器稍后重试"""
+        endpoints = get_info_endpoints()
+        replies = []
+        failures = []
+        state = {'done': False}
+        
+        def finished(reply):
+            if state['done']:
+                return
+            try:
+                data = self._parse_info_reply(reply)
+            except Exception as e:
+                logger.warning(f"版本信息接口 {reply.url} 失败: {e}")
+                failures.append(e)
+                if len(failures) == len(endpoints):
+                    state['done'] = True
+                    self._retry_info_async(policy, started, retries, errors, failures)
+                return
+            # 已有结果，取消其余请求
+            state['done'] = True
+            for other in replies:
+                if other is not reply:
+                    other.abort()
+            get_install_metrics().record('fetch_info', retries, time.monotonic() - started, errors)
+            logger.info(f"成功获取版本信息: {data}")
+            self.info_received.emit(data)
+        
+        for endpoint in endpoints:
+            replies.append(self.transport.get(endpoint, get_info_cache().conditional_headers(endpoint),
+                                              on_finished=finished, timeout=10))
+    
+    def _retry_info_async(self, policy, started, retries, errors, failures):
+        retryable = [e for e in failures if RetryPolicy.classify(e)]
+        error = (retryable or failures)[0]
+        kind = RetryPolicy.classify(error)
+        delay = policy.delay(retries, error) if kind else 0
+        if (kind is None or self._cancel_event.is_set() or retries + 1 >= policy.max_attempts
+                or time.monotonic() - started + delay > policy.max_elapsed):
+            get_install_metrics().record('fetch_info', retries, time.monotonic() - started, errors)
+            logger.error(f"获取版本信息失败: {str(error)}")
+            self.error_occurred.emit(f"获取版本信息失败: {str(error)}")
+            return
+        errors[kind] = errors.get(kind, 0) + 1
+        logger.warning(f"fetch_info 失败（{kind}），{delay:.1f} 秒后第 {retries + 1} 次重试: {error}")
+        QTimer.singleShot(int(delay * 1000), lambda: self._fetch_info_async(policy, started, retries + 1, errors))
+    
+    def download_file(self, url, filename, digest=None):
+        """下载文件 - 整合测试程序的成功实现
+
+        url 可以是单个下载地址，也可以是镜像地址列表（会先测速排序再依次尝试）
+        digest 为 /api/info 中的校验信息（见 collect_package_digest），下载时同步计算哈希并校验
+        """
+        urls = [url] if isinstance(url, str) else [u for u in url if u]
+        digest = digest or {}
+        expected_sha256 = digest.get('sha256')
+        logger.info(f"开始下载文件: {urls} -> {filename}")
+        if not self.transport.blocking:
+            self._download_file_async(urls, filename, expected_sha256)
+            return
+        self._journal = None
+        self._validators = {}  # 实际下载的地址 -> 服务器返回的 ETag / Last-Modified，随安装包写入缓存
+        self._stream_written = 0
+        self._target = None
+        extractor = None
+        hasher = None
+        # 整个下载（所有镜像和重试）共用一个停滞看门狗
+        self._watchdog = StallWatchdog(STALL_WINDOW, STALL_MIN_SPEED, STALL_CHECK_INTERVAL)
+        self._watchdog.start()
         try:
             temp_dir = tempfile.gettempdir()
             self.temp_file_path = os.path.join(temp_dir, filename)
+            self.part_file_path = self.temp_file_path + '.part'
             logger.info(f"临时文件路径: {self.temp_file_path}")
             
-            response = requests.get(url, stream=True, timeout=30)
-            response.raise_for_status()
+            # 先查找安装包缓存，命中时不需要任何网络请求
+            if self._load_from_package_cache(urls, expected_sha256):
+                size = os.path.getsize(self.temp_file_path)
+                self.download_progress.emit(make_progress_record(size, size))
+                self.download_complete.emit(self.temp_file_path)
+                return
             
-            total_size = int(response.headers.get('content-length', 0))
-            logger.info(f"文件总大小: {total_size} bytes")
-            downloaded = 0
+            self._reset_progress()
             
-            last_progress = -1
-            last_update_time = time.time()
-            with open(self.temp_file_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=16384):  # 减小块大小到16KB，增加更新频率
-                    if chunk:
-                        f.write(chunk)
-                        downloaded += len(chunk)
-                        if total_size > 0:
-                            progress = int((downloaded / total_size) * 100)
-                            # 确保进度不超过100
-                            progress = min(progress, 100)
-                            current_time = time.time()
-                            # 只在进度有变化且间隔超过100ms时才更新，避免过于频繁
-                            if progress != last_progress and (current_time - last_update_time) > 0.1:
-                                # 减少日志频率，只在关键进度点记录
-                                if progress % 10 == 0:
-                                    logger.debug(f"下载进度: {progress}%")
-                                self.download_progress.emit(progress)
-                                last_progress = progress
-                                last_update_time = current_time
-                                # 不再添加延迟，让下载更流畅
-                        else:
-                            # 如果无法获取总大小，使用模拟进度
-                            if downloaded % (512 * 1024) == 0:  # 每512KB更新一次，更频繁
-                                simulated_progress = min(int((downloaded / (50 * 1024 * 1024)) * 100), 95)  # 假设50MB文件
-                                current_time = time.time()
-                                if simulated_progress != last_progress and (current_time - last_update_time) > 0.1:
-                                    # 减少日志频率，只在关键进度点记录
-                                    if simulated_progress % 10 == 0:
-                                        logger.debug(f"模拟下载进度: {simulated_progress}%")
-                                    self.download_progress.emit(simulated_progress)
-                                    last_progress = simulated_progress
-                                    last_update_time = current_time
+            # zip 文件边下载边解压到暂存目录
+            if STREAMING_EXTRACT and filename.lower().endswith('.zip'):
+                install_index = None
+                if self.install_path and os.path.isdir(self.install_path):
+                    install_index = InstallIndex(self.install_path)
+                extractor = StreamingZipExtractor(
+                    self.part_file_path, self._make_extract_dir(temp_dir), self._contiguous_bytes, install_index,
+                    lambda: self._target)
+                extractor.start()
+            
+            # 多个镜像时先并发测速，从最快的镜像开始下载
+            if len(urls) > 1:
+                mirrors = self._rank_mirrors(urls)
+            else:
+                mirrors = [{'url': urls[0], 'latency': 0.0, 'speed': 0.0}]
             
+            for attempt in range(DOWNLOAD_VERIFY_ATTEMPTS):
+                # 边下载边计算哈希
+                hasher = StreamingHasher(self.part_file_path, self._contiguous_bytes, digest.get('block_size', 0),
+                                         lambda: self._target)
+                hasher.start()
+                
+                # 所有镜像都失败且错误可以重试时，等待后从已下载的位置继续
+                policy = RetryPolicy(DOWNLOAD_RETRY_ATTEMPTS, DOWNLOAD_RETRY_MAX_ELAPSED)
+                policy.run('download', lambda: self._download_from_mirrors(mirrors, urls, expected_sha256),
+                           self._cancel_event, self._save_journal)
+                
+                total_size = os.path.getsize(self.part_file_path)
+                sha256, block_digests = hasher.finish(total_size)
+                hasher = None
+                if not expected_sha256 or sha256 == expected_sha256:
+                    break
+                if attempt + 1 == DOWNLOAD_VERIFY_ATTEMPTS:
+                    # 损坏的文件不能用于续传
+                    self._close_target()
+                    if self._journal is not None:
+                        self._journal.remove()
+                        self._journal = None
+                    os.remove(self.part_file_path)
+                    raise Exception("下载的文件校验失败（SHA-256 不一致）")
+                # 校验失败：有分块哈希时只重新下载损坏的块，否则重新下载整个文件
+                bad_ranges = self._corrupted_ranges(digest, block_digests, total_size)
+                logger.warning(f"下载的文件校验失败，重新下载 {len(bad_ranges)} 个区间: {bad_ranges}")
+                if self._journal is not None:
+                    for start, end in bad_ranges:
+                        self._journal.discard(start, end)
+            
+            # 等解压线程读完 .part 文件后再重命名（Windows 不能重命名已打开或已映射的文件）
+            if extractor is not None:
+                extractor.source_complete(os.path.getsize(self.part_file_path))
+                extractor.join()
+            self._close_target()
+            os.replace(self.part_file_path, self.temp_file_path)
             logger.info(f"文件下载完成: {self.temp_file_path}")
+            self._store_in_package_cache(urls, sha256)
+            if extractor is not None:
+                if extractor.verify(self.temp_file_path):
+                    self.download_extracted.emit(extractor.target_dir)
+                else:
+                    discard_staging_dir(extractor.target_dir)
+                extractor = None
             self.download_complete.emit(self.temp_file_path)
             
         except Exception as e:
+            if hasher is not None:
+                hasher.stop()
+            if extractor is not None:
+                extractor.stop()
+                extractor.join()
+                discard_staging_dir(extractor.target_dir)
+            self._close_target()
+            if self._cancel_event.is_set():
+                # 主动取消不算错误；不再写续传记录，避免覆盖新下载的记录
+                logger.info("下载已取消")
+                return
             logger.error(f"文件下载失败: {str(e)}")
+            # 保留 .part 文件和续传记录，重试或重启安装程序后可继续下载
+            if self._journal is not None:
+                self._journal.save()
             self.error_occurred.emit(f"下载失败: {str(e)}")
+        finally:
+            self._watchdog.stop()
+            self._probes = {}
+    
+    def _download_file_async(self, urls, filename, expected_sha256):
+        """事件驱动的下载（Qt 传输后端）：单连接依次尝试各镜像，边下载边写入预分配文件并计算 SHA-256
+        
+        不使用分段、续传和边下边解压，这些依赖工作线程，由 requests 后端提供。
+        """
+        self._target = None
+        self._validators = {}
+        self.temp_file_path = os.path.join(tempfile.gettempdir(), filename)
+        self.part_file_path = self.temp_file_path + '.part'
+        if self._load_from_package_cache(urls, expected_sha256):
+            size = os.path.getsize(self.temp_file_path)
+            self.download_progress.emit(make_progress_record(size, size))
+            self.download_complete.emit(self.temp_file_path)
+            return
+        # 从头写入 .part 文件，旧的续传记录不再有效
+        try:
+            os.remove(self.part_file_path + '.json')
+        except OSError:
+            pass
+        self._download_mirror_async(urls, 0, expected_sha256)
+    
+    def _download_mirror_async(self, urls, index, expected_sha256):
+        self._reset_progress()
+        state = {'sha256': hashlib.sha256(), 'offset': 0, 'total': 0, 'file': None}
+        
+        def started(reply):
+            if reply.status_code >= 400:
+                return
+            state['total'] = int(reply.headers.get('content-length') or 0)
+            if state['total'] > 0:
+                self._open_target(state['total'])
+            else:
+                state['file'] = open(self.part_file_path, 'wb')
+        
+        def received(reply, chunk):
+            if reply.status_code >= 400:
+                return
+            if self._target is not None:
+                self._target.write_at(state['offset'], chunk)
+            else:
+                state['file'].write(chunk)
+            state['sha256'].update(chunk)
+            state['offset'] += len(chunk)
+            self._report_progress(len(chunk), state['total'])
+        
+        def finished(reply):
+            self._active_reply = None
+            if state['file'] is not None:
+                state['file'].close()
+            try:
+                reply.raise_for_status()
+                if state['total'] and state['offset'] != state['total']:
+                    raise IncompleteDownloadError(f"连接提前关闭: {state['offset']}/{state['total']}")
+                sha256 = state['sha256'].hexdigest()
+                if expected_sha256 and sha256 != expected_sha256:
+                    raise Exception("下载的文件校验失败（SHA-256 不一致）")
+                self._close_target()
+                os.replace(self.part_file_path, self.temp_file_path)
+            except Exception as e:
+                self._close_target()
+                if self._cancel_event.is_set():
+                    logger.info("下载已取消")
+                    return
+                if index + 1 < len(urls):
+                    logger.warning(f"镜像 {urls[index]} 下载失败，切换到下一个镜像: {e}")
+                    self._download_mirror_async(urls, index + 1, expected_sha256)
+                    return
+                logger.error(f"文件下载失败: {str(e)}")
+                self.error_occurred.emit(f"下载失败: {str(e)}")
+                return
+            logger.info(f"文件下载完成: {self.temp_file_path}")
+            self._validators = _source_validators(urls[index], reply.headers.get('etag', ''),
+                                                  reply.headers.get('last-modified', ''))
+            self._store_in_package_cache(urls, sha256)
+            self.download_complete.emit(self.temp_file_path)
+        
+        logger.info(f"开始下载（{self.transport.name}）: {urls[index]}")
+        self._active_reply = self.transport.get(urls[index], on_started=started, on_data=received,
+                                                on_finished=finished)
+    
+    def _download_from_mirrors(self, mirrors, urls, sha256=None):
+        """依次尝试各镜像，失败或速度过低时切换到下一个镜像
+
+        已知 sha256 时下一个镜像可以从当前进度继续，否则换镜像后从头下载
+        """
+        for index, mirror in enumerate(mirrors):
+            can_switch = index + 1 < len(mirrors)
+            try:
+                self._download_from_mirror(mirror, urls, can_switch, sha256)
+                return
+            except Exception as e:
+                if not can_switch or self._cancel_event.is_set():
+                    raise
+                # 保存续传记录，重试或重启后可从当前进度继续
+                self._save_journal()
+                logger.warning(f"镜像 {mirror['url']} 下载失败或速度过低，切换到下一个镜像: {e}")
+    
+    def _save_journal(self):
+        if self._journal is not None:
+            self._journal.save()
+    
+    def _open_target(self, size, preallocate=True):
+        """打开（或复用）预分配的 .part 文件；preallocate 为 False 时保留已下载的内容"""
+        target = self._target
+        if target is not None and target.size == size and not preallocate:
+            return target
+        self._close_target()
+        self._target = DownloadTarget(self.part_file_path, size, preallocate)
+        return self._target
+    
+    def _close_target(self):
+        target, self._target = self._target, None
+        if target is not None:
+            target.close()
+    
+    def _corrupted_ranges(self, digest, block_digests, total_size):
+        """根据分块哈希找出损坏的区间；没有分块哈希时返回整个文件"""
+        expected = digest.get('block_sha256')
+        block_size = digest.get('block_size', 0)
+        if not expected or len(expected) != len(block_digests):
+            return [(0, total_size)]
+        return [(i * block_size, min((i + 1) * block_size, total_size))
+                for i, (actual, wanted) in enumerate(zip(block_digests, expected)) if actual != wanted]
+    
+    def _load_from_package_cache(self, urls, sha256=None):
+        """在本地和共享缓存中查找安装包，命中时放到临时文件路径并返回 True
+        
+        已知哈希时按哈希查找；否则按地址查找，并先向服务器确认文件没有变化
+        （事件驱动的传输后端不能在 GUI 线程中阻塞探测，没有哈希时不使用缓存）。
+        """
+        expected_sha256 = sha256
+        probe = self._probe_once if self.transport.blocking else None
+        caches = get_package_caches()
+        for cache in caches:
+            sha256 = cache.lookup(urls, expected_sha256, probe)
+            if sha256 and cache.fetch(sha256, self.temp_file_path):
+                logger.info(f"使用缓存的安装包: {cache.directory} {sha256}")
+                if cache.read_only:
+                    # 共享缓存命中时同时加入本地缓存
+                    caches[0].put(self.temp_file_path, sha256, urls, cache.validators(sha256))
+                return True
+        return False
+    
+    def _store_in_package_cache(self, urls, sha256):
+        try:
+            get_package_caches()[0].put(self.temp_file_path, sha256, urls, self._validators)
+        except Exception as e:
+            logger.warning(f"安装包加入缓存失败: {e}")
+    
+    def _reset_progress(self):
+        """重置进度状态（分段下载时多个线程共享）"""
+        self._downloaded = 0
+        self._last_progress = -1
+        self._last_update_time = time.time()
+        self._progress_lock = threading.Lock()
+        self._progress_tracker = ProgressTracker()
+    
+    def download_update(self, manifest_urls, urls, filename, digest=None):
+        """已有安装时按文件清单只下载变化的文件；不适用或失败时下载完整安装包"""
+        if not self.transport.blocking:
+            # 增量更新需要并行的阻塞请求，事件驱动的传输后端直接下载完整安装包
+            self.download_file(urls, filename, digest)
+            return
+        sha256 = (digest or {}).get('sha256')
+        url_list = urls if isinstance(urls, list) else [urls]
+        self._probes = {}
+        if any(cache.lookup(url_list, sha256, self._probe_once) for cache in get_package_caches()):
+            # 完整安装包已在缓存中，不需要下载
+            self.download_file(urls, filename, digest)
+            return
+        try:
+            if self._download_delta(manifest_urls, filename):
+                return
+        except Exception as e:
+            if self._cancel_event.is_set():
+                logger.info("下载已取消")
+                return
+            logger.warning(f"增量更新失败，改为下载完整安装包: {e}")
+        self.download_file(urls, filename, digest)
+    
+    def _download_delta(self, manifest_urls, filename):
+        """下载安装目录中缺失或变化的文件到暂存目录，完成时返回 True；变化太多不值得增量更新时返回 False"""
+        manifest_url, manifest = self._fetch_manifest(manifest_urls)
+        files = parse_manifest(manifest, manifest_url)
+        install_index = InstallIndex(self.install_path)
+        changed = [(entry, self._select_patch(entry, install_index)) for entry in files
+                   if not install_index.has_file(entry['path'], entry['size'], entry['sha256'])]
+        total_bytes = sum(entry['size'] for entry in files)
+        changed_bytes = sum(patch['size'] if patch else entry['size'] for entry, patch in changed)
+        patched = sum(1 for _, patch in changed if patch)
+        logger.info(f"增量更新：{len(changed)}/{len(files)} 个文件需要更新，其中 {patched} 个使用补丁"
+                    f"（下载 {changed_bytes}/{total_bytes} 字节）")
+        if changed_bytes > total_bytes * DELTA_MAX_RATIO:
+            logger.info("变化的文件太多，直接下载完整安装包")
+            return False
+        try:
+            install_index.save()  # 保存计算过的哈希，下次不必重新读取
+        except OSError as e:
+            logger.warning(f"保存安装索引失败: {e}")
+        
+        staging_dir = make_staging_dir(self.install_path)
+        self._reset_progress()
+        abort_event = threading.Event()
+        futures = []
+        try:
+            changed.sort(key=lambda item: item[1]['size'] if item[1] else item[0]['size'], reverse=True)
+            futures = run_tasks(lambda entry, patch: self._download_manifest_file(
+                entry, patch, staging_dir, changed_bytes, abort_event), changed, DOWNLOAD_CONNECTIONS)
+            finished, _ = wait(futures, return_when=FIRST_EXCEPTION)
+            for future in finished:
+                if future.exception() is not None:
+                    raise future.exception()
+        except Exception:
+            abort_event.set()
+            wait(futures)
+            discard_staging_dir(staging_dir)
+            raise
+        
+        # 保存规范化后的清单，安装步骤据此确认文件完整并更新安装索引
+        manifest_path = os.path.join(tempfile.gettempdir(), os.path.splitext(filename)[0] + MANIFEST_SUFFIX)
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': manifest.get('version', ''), 'files': files}, f, ensure_ascii=False)
+        logger.info(f"增量更新下载完成: {staging_dir}")
+        self.download_progress.emit(make_progress_record(changed_bytes, changed_bytes))
+        self.download_extracted.emit(staging_dir)
+        self.download_complete.emit(manifest_path)
+        return True
+    
+    def _fetch_manifest(self, manifest_urls):
+        """依次尝试各下载源的文件清单，返回 (地址, 清单)"""
+        last_error = None
+        for url in manifest_urls:
+            try:
+                response = get_http_session().get(url, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+                response.raise_for_status()
+                return url, response.json()
+            except Exception as e:
+                logger.warning(f"获取文件清单失败: {url}: {e}")
+                last_error = e
+        raise last_error or Exception("没有可用的文件清单")
+    
+    def _select_patch(self, entry, install_index):
+        """现有文件正好是补丁的旧版本时返回该补丁，否则返回 None"""
+        patches = [patch for patch in entry['patches'] if patch['format'] in PATCH_FORMATS]
+        if not patches:
+            return None
+        local_sha256 = install_index.file_sha256(entry['path'])
+        for patch in patches:
+            if patch['from_sha256'] == local_sha256:
+                return patch
+        return None
+    
+    def _download_manifest_file(self, entry, patch, staging_dir, total_size, abort_event):
+        """下载清单中的一个文件到暂存目录并校验 SHA-256；有可用补丁时先尝试补丁"""
+        target = zip_member_path(staging_dir, entry['path'])
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if patch is not None:
+            patch_path = target + '.patch'
+            try:
+                patch_sha256 = self._fetch_to_file(patch['url'], patch['offset'], patch['size'], patch_path,
+                                                   total_size, abort_event)
+                if patch['sha256'] and patch_sha256 != patch['sha256']:
+                    raise Exception("补丁文件校验失败")
+                old_path = zip_member_path(self.install_path, entry['path'])
+                if (apply_bsdiff_patch(old_path, patch_path, target) == entry['sha256']
+                        and os.path.getsize(target) == entry['size']):
+                    return
+                raise Exception("应用补丁后的文件校验失败")
+            except DownloadCancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"补丁更新失败，改为下载完整文件: {entry['path']}: {e}")
+            finally:
+                if os.path.exists(patch_path):
+                    os.remove(patch_path)
+        
+        if self._fetch_to_file(entry['url'], entry['offset'], entry['size'], target,
+                               total_size, abort_event) != entry['sha256']:
+            raise Exception(f"文件校验失败: {entry['path']}")
+    
+    def _fetch_to_file(self, url, offset, size, path, total_size, abort_event):
+        """下载 size 字节（offset 不为 None 时从 pack 中按 Range 读取）到 path，返回 SHA-256"""
+        headers = {}
+        if offset is not None:
+            headers['Range'] = f"bytes={offset}-{offset + size - 1}"
+        digest = hashlib.sha256()
+        written = 0
+        with get_http_session().get(url, headers=headers, stream=True,
+                                    timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)) as response:
+            response.raise_for_status()
+            if headers and response.status_code != 206:
+                raise Exception(f"服务器不支持 Range 请求: {url}")
+            with open(path, 'wb') as f:
+                for chunk in iter_response_chunks(response, size):
+                    if self._cancel_event.is_set() or abort_event.is_set():
+                        raise DownloadCancelledError("下载已取消")
+                    if chunk:
+                        f.write(chunk)
+                        digest.update(chunk)
+                        written += len(chunk)
+                        self._report_progress(len(chunk), total_size)
+        if written != size:
+            raise IncompleteDownloadError(f"下载的数据不完整: {url}")
+        return digest.hexdigest()
+    
+    def _rank_mirrors(self, urls):
+        """并发测速所有镜像，按速度从快到慢排序（失败的排在最后）"""
+        pool = get_worker_pool()
+        results = [future.result() for future in [pool.submit_task(self._probe_mirror, url) for url in urls]]
+        results.sort(key=lambda m: (m['speed'] <= 0, -m['speed'], m['latency']))
+        for mirror in results:
+            logger.info(f"镜像测速: {mirror['url']} 延迟 {mirror['latency']:.3f}s, 速度 {mirror['speed'] / 1024:.1f} KB/s")
+        return results
+    
+    def _probe_mirror(self, url):
+        """测量镜像的响应延迟，并下载一小段数据估算速度"""
+        result = {'url': url, 'latency': float('inf'), 'speed': 0.0}
+        try:
+            start_time = time.time()
+            response = get_http_session().get(url, headers={'Range': f'bytes=0-{MIRROR_PROBE_BYTES - 1}'},
+                                              stream=True, timeout=MIRROR_PROBE_TIMEOUT)
+            response.raise_for_status()
+            first_byte_time = time.time()
+            result['latency'] = first_byte_time - start_time
+            received = 0
+            for chunk in response.iter_content(chunk_size=16384):
+                received += len(chunk)
+                if received >= MIRROR_PROBE_BYTES or time.time() - first_byte_time > MIRROR_PROBE_TIMEOUT:
+                    break
+            response.close()
+            result['speed'] = received / max(time.time() - first_byte_time, 1e-3)
+        except Exception as e:
+            logger.warning(f"镜像测速失败: {url}: {e}")
+        return result
+    
+    def _download_from_mirror(self, mirror, urls, can_switch, sha256=None):
+        """从指定镜像下载，支持 Range 时断点续传并分段下载"""
+        url = mirror['url']
+        restarted = False
+        while True:
+            # 第一次使用查找缓存时的探测结果，重新开始时再探测一次
+            probe = self._probes.pop(url, None) or self._probe_download(url)
+            total_size = probe['total_size']
+            self._validators = _source_validators(url, probe['etag'], probe['last_modified'])
+            if not (probe['accept_ranges'] and total_size > 0):
+                logger.info("服务器不支持 Range 请求，使用单连接下载")
+                self._journal = None
+                self._download_single(url)
+                return
+            try:
+                # 不同镜像的同名文件不一定相同，只有下载完成后能校验哈希时才接着其他镜像的进度下载
+                self._journal = self._open_journal(url, probe, urls if sha256 else ())
+                # 还有备用镜像时才监控速度，速度过低则切换
+                min_speed = mirror['speed'] * MIRROR_SWITCH_RATIO if can_switch else 0
+                self._download_ranges(probe['url'], self._journal, total_size, min_speed)
+                self._journal.remove()
+                return
+            except SourceChangedError as e:
+                # 已下载的部分属于旧文件：删除 .part 和续传记录，重新探测后从头下载（只重新开始一次）
+                self._discard_partial()
+                if restarted:
+                    raise
+                restarted = True
+                logger.warning(f"{e}，丢弃已下载的部分并重新下载")
+    
+    def _discard_partial(self):
+        """删除 .part 文件和续传记录"""
+        self._close_target()
+        if self._journal is not None:
+            self._journal.remove()
+            self._journal = None
+        try:
+            os.remove(self.part_file_path)
+        except OSError as e:
+            logger.warning(f"删除未完成的下载文件失败: {e}")
+    
+    def _make_extract_dir(self, temp_dir):
+        """优先在安装目录旁边创建暂存目录，失败时退回系统临时目录"""
+        if self.install_path:
+            try:
+                return make_staging_dir(self.install_path)
+            except OSError as e:
+                logger.warning(f"无法在安装目录旁创建暂存目录，改用临时目录: {e}")
+        return tempfile.mkdtemp(prefix='bloret_temp_', dir=temp_dir)
+    
+    def _contiguous_bytes(self):
+        """下载文件开头已连续写入磁盘的字节数（供边下边解压使用）"""
+        journal = self._journal
+        if journal is not None:
+            return journal.contiguous_bytes()
+        return self._stream_written
+    
+    def _probe_once(self, url):
+        """探测下载信息，本次下载中已探测过的地址直接使用之前的结果"""
+        if url not in self._probes:
+            self._probes[url] = self._probe_download(url)
+        return self._probes[url]
+    
+    def _probe_download(self, url):
+        """探测文件大小、校验信息及是否支持 Range 请求"""
+        probe = {'total_size': 0, 'accept_ranges': False, 'url': url,
+                 'etag': '', 'last_modified': ''}
+        try:
+            response = get_http_session(retries=False).head(url, allow_redirects=True,
+                                                            timeout=(HTTP_CONNECT_TIMEOUT, 10))
+            response.raise_for_status()
+            probe['total_size'] = int(response.headers.get('content-length', 0))
+            probe['accept_ranges'] = response.headers.get('accept-ranges', '').lower() == 'bytes'
+            probe['url'] = response.url
+            probe['etag'] = response.headers.get('etag', '')
+            probe['last_modified'] = response.headers.get('last-modified', '')
+            logger.info(f"探测结果: 大小 {probe['total_size']} bytes, Accept-Ranges: {probe['accept_ranges']}")
+        except Exception as e:
+            # 部分服务器不支持 HEAD，直接回退到单连接下载
+            logger.warning(f"探测下载信息失败，回退到单连接下载: {e}")
+        return probe
+    
+    def _open_journal(self, url, probe, mirrors=()):
+        """读取续传记录，与服务器文件一致时继续使用，否则重新开始"""
+        journal = self._journal or DownloadJournal(self.part_file_path + '.json')
+        part_size = os.path.getsize(self.part_file_path) if os.path.exists(self.part_file_path) else -1
+        if ((journal is self._journal or journal.load()) and part_size == probe['total_size']
+                and journal.matches(url, probe['total_size'], probe['etag'], probe['last_modified'], mirrors)):
+            logger.info(f"找到续传记录，已完成 {journal.completed_bytes()} / {probe['total_size']} bytes")
+            journal.switch_source(url, probe['etag'], probe['last_modified'])
+            self._open_target(probe['total_size'], preallocate=False)
+        else:
+            logger.info("没有可用的续传记录，从头开始下载")
+            journal.reset(url, probe['total_size'], probe['etag'], probe['last_modified'])
+            # 预分配文件，各段可直接写到自己的偏移位置
+            self._open_target(probe['total_size'])
+            journal.save()
+        return journal
+    
+    def _report_progress(self, nbytes, total_size):
+        """累计已下载字节数，按 PROGRESS_INTERVAL 的时间间隔发出进度信号（与读取大小无关，线程安全）"""
+        with self._progress_lock:
+            self._downloaded += nbytes
+            downloaded = self._downloaded
+            current_time = time.time()
+            finished = total_size > 0 and downloaded >= total_size
+            if not finished and current_time - self._last_update_time < PROGRESS_INTERVAL:
+                return
+            self._last_update_time = current_time
+            record = self._progress_tracker.update(downloaded, total_size, current_time)
+            # 减少日志频率，只在每 10% 记录一次
+            progress = record['percent'] if record['percent'] is not None else -1
+            if progress // 10 != self._last_progress // 10:
+                logger.debug(f"下载进度: {format_progress_text(record)}")
+                self._last_progress = progress
+            self.download_progress.emit(record)
+    
+    def _download_single(self, url):
+        """单连接流式下载；连接停滞时重新连接（服务器不支持 Range，只能从头下载）"""
+        for _ in range(STALL_MAX_RESTARTS + 1):
+            try:
+                self._stream_single(url)
+                return
+            except ConnectionStalledError as e:
+                logger.warning(f"单连接下载停滞，重新连接: {e}")
+        raise DownloadStalledError(f"连接连续 {STALL_MAX_RESTARTS + 1} 次停滞")
+    
+    def _stream_single(self, url):
+        self._downloaded = 0
+        self._stream_written = 0
+        response = get_http_session(retries=False).get(url, stream=True,
+                                                       timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+        connection = self._watchdog.watch(response)
+        try:
+            self._write_single(response, connection)
+            connection.raise_if_stalled()
+        except ConnectionStalledError:
+            raise
+        except Exception:
+            # 被看门狗断开的连接读取时会出错
+            connection.raise_if_stalled()
+            raise
+        finally:
+            self._watchdog.unwatch(connection)
+            response.close()
+    
+    def _write_single(self, response, connection):
+        response.raise_for_status()
+        
+        total_size = int(response.headers.get('content-length', 0))
+        logger.info(f"文件总大小: {total_size} bytes")
+        
+        # 大小已知且未压缩传输时预分配并通过映射写入，否则按原方式追加写入
+        encoding = response.headers.get('content-encoding', 'identity').lower()
+        if total_size > 0 and encoding == 'identity':
+            target = self._open_target(total_size)
+            for chunk in iter_response_chunks(response, on_read=connection.count):
+                if self._cancel_event.is_set():
+                    raise DownloadCancelledError("下载已取消")
+                if chunk:
+                    target.write_at(self._stream_written, chunk)
+                    self._stream_written += len(chunk)
+                    connection.received += len(chunk)
+                    self._report_progress(len(chunk), total_size)
+            if self._stream_written != total_size:
+                raise IncompleteDownloadError(f"下载不完整: {self._stream_written}/{total_size} bytes")
+            return
+        
+        self._close_target()
+        with open(self.part_file_path, 'wb') as f:
+            for chunk in iter_response_chunks(response, on_read=connection.count):
+                if self._cancel_event.is_set():
+                    raise DownloadCancelledError("下载已取消")
+                if chunk:
+                    f.write(chunk)
+                    f.flush()
+                    self._stream_written += len(chunk)
+                    connection.received += len(chunk)
+                    self._report_progress(len(chunk), total_size)
+    
+    def _download_ranges(self, url, journal, total_size, min_speed=0):
+        """下载续传记录中尚未完成的区间，文件足够大时拆分为多段并行下载
+
+        min_speed 大于 0 时监控下载速度，持续低于该值则抛出 MirrorTooSlowError
+        """
+        self._downloaded = journal.completed_bytes()
+        missing = journal.missing_ranges()
+        # 剩余部分按连接数拆分，但每段不小于 DOWNLOAD_MIN_SEGMENT_SIZE
+        remaining = total_size - self._downloaded
+        segment_size = max(DOWNLOAD_MIN_SEGMENT_SIZE, -(-remaining // DOWNLOAD_CONNECTIONS))
+        segments = []
+        for start, end in missing:
+            segments.extend((pos, min(pos + segment_size, end))
+                            for pos in range(start, end, segment_size))
+        logger.info(f"待下载分段数量: {len(segments)}，已完成 {self._downloaded} bytes")
+        if not segments:
+            return
+        
+        self._abort_event = threading.Event()
+        self._active_responses = set()
+        workers = max(1, min(DOWNLOAD_CONNECTIONS, len(segments)))
+        futures = run_tasks(lambda start, end: self._download_segment(url, journal, start, end, total_size),
+                            segments, workers)
+        monitor = ThroughputMonitor(MIRROR_CHECK_WINDOW)
+        monitor.add_sample(self._downloaded)
+        try:
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=0.5, return_when=FIRST_EXCEPTION)
+                for future in done:
+                    future.result()
+                if self._cancel_event.is_set():
+                    raise DownloadCancelledError("下载已取消")
+                monitor.add_sample(self._downloaded)
+                if min_speed > 0 and monitor.covers_window() and monitor.rate() < min_speed:
+                    raise MirrorTooSlowError(
+                        f"下载速度 {monitor.rate() / 1024:.1f} KB/s 低于预期 {min_speed / 1024:.1f} KB/s")
+        except Exception:
+            # 任意一段失败则通知其余分段尽快退出，并关闭正在读取的连接，等它们退出后再切换镜像或重试
+            self._abort_event.set()
+            for response in list(self._active_responses):
+                close_response(response)
+            wait(futures)
+            raise
+    
+    def _download_segment(self, url, journal, start, end, total_size):
+        """下载单个分段 [start, end) 并写入文件对应位置，同时更新续传记录
+
+        连接停滞时从已写入的位置重新连接，连续停滞 STALL_MAX_RESTARTS 次后放弃当前镜像
+        """
+        for _ in range(STALL_MAX_RESTARTS + 1):
+            if self._abort_event.is_set():
+                return
+            headers = {'Range': f'bytes={start}-{end - 1}'}
+            # If-Range: 服务器文件已变化时会返回完整文件 (200) 而不是分段
+            if journal.etag or journal.last_modified:
+                headers['If-Range'] = journal.etag or journal.last_modified
+            response = get_http_session(retries=False).get(url, headers=headers, stream=True,
+                                                           timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+            self._active_responses.add(response)
+            connection = self._watchdog.watch(response)
+            try:
+                self._write_segment(response, journal, start, end, total_size, connection)
+                return
+            except Exception:
+                if not connection.stalled or self._abort_event.is_set():
+                    raise
+                start += connection.received
+                logger.warning(f"分段连接停滞，从 {start} 处重新连接")
+            finally:
+                self._watchdog.unwatch(connection)
+                self._active_responses.discard(response)
+                response.close()
+        raise DownloadStalledError(f"分段 {start}-{end - 1} 的连接连续 {STALL_MAX_RESTARTS + 1} 次停滞")
+    
+    def _write_segment(self, response, journal, start, end, total_size, connection):
+        """把分段响应写入文件对应位置"""
+        response.raise_for_status()
+        if response.status_code != 206:
+            raise SourceChangedError(f"服务器文件已变化或不支持分段 (HTTP {response.status_code})")
+        
+        pos = start
+        target = self._target
+        for chunk in iter_response_chunks(response, end - start, connection.count):
+            if self._abort_event.is_set() or self._cancel_event.is_set():
+                return
+            if chunk:
+                chunk = chunk[:end - pos]
+                # 先写入映射再记录，解压和哈希线程可以安全读取已记录的区间
+                target.write_at(pos, chunk)
+                journal.mark(pos, pos + len(chunk))
+                pos += len(chunk)
+                connection.received += len(chunk)
+                self._report_progress(len(chunk), total_size)
+                journal.save_if_due()
+        
+        if pos != end:
+            raise IncompleteDownloadError(f"分段 {start}-{end - 1} 下载不完整: {pos - start}/{end - start} bytes")
 
 def apply_theme(self, is_dark=None):
     """应用主题到应用程序"""
@@ -1303,12 +4805,23 @@ class BloretInstaller(QMainWindow):
             'installation_type': 'quick',  # 'quick' or 'custom'
             'latest_version': '25.0',  # 默认版本
             'download_url': '',
-            'downloaded_file': ''
+            'download_mirrors': [],  # /api/info 中的所有镜像下载地址
+            'manifest_urls': [],  # /api/info 中的文件清单地址（增量更新）
+            'package_digest': {},  # /api/info 中安装包的 SHA-256（及分块哈希）
+            'downloaded_file': '',
+            'extracted_dir': ''  # 边下边解压得到的目录，安装时可跳过解压
         }
         
-        # 网络工作线程
-        self.network_thread = None
+        # 网络传输后端（所有 NetworkWorker 共用；Qt 后端事件驱动，不需要工作线程）
+        self.network_transport = create_transport(parent=self)
+        # 获取版本信息的工作对象（任务在工作线程池中执行）
         self.network_worker = None
+        # 下载工作对象（与获取版本信息分开，快速启动时两者可同时运行）
+        self.download_worker = None
+        self._download_state = 'idle'  # 'idle' / 'running' / 'done'
+        self._install_requested = False  # 用户是否已进入安装页面（预下载时为 False）
+        self._last_download_progress = None  # 最近一次的下载进度记录
+        self._download_install_path = ''  # 当前下载使用的安装路径
         self.downloading_dialog = None
         # 用于防止并发创建下载对话框
         import threading as _threading
@@ -1316,12 +4829,18 @@ class BloretInstaller(QMainWindow):
         
         # 检查快速启动参数
         self.is_quickstart = "--quickstart" in sys.argv
+        self._quickstart_triggered = False
         
         # 初始化 UI
         self.initUI()
         
         # 启动时获取版本信息（测试时可传入 fetch_version=False 以避免网络线程）
         if fetch_version:
+            # 快速启动时先用缓存的版本信息立即开始，同时在后台确认是否有新版本
+            cached_info = load_cached_info() if self.is_quickstart else None
+            if cached_info:
+                logger.info("快速启动模式：使用缓存的版本信息立即开始安装")
+                QTimer.singleShot(0, lambda: self.on_version_info_received(cached_info, from_cache=True))
             self.fetch_version_info()
         elif self.is_quickstart:
             # 如果不获取版本但启用了快速启动，直接开始
@@ -1375,6 +4894,9 @@ class BloretInstaller(QMainWindow):
             self.page2_2.next_button.clicked.connect(self.on_page2_2_next)
         
         # 页面3信号
+        # 安装完成时保存网络统计，日志关闭时也能查看重试次数和耗时
+        self.page3.install_complete.connect(lambda: get_install_metrics().save('success'))
+        self.page3.install_failed.connect(lambda message: get_install_metrics().save(message))
         if hasattr(self.page3, 'next_button'):
             self.page3.next_button.clicked.connect(self.on_install_complete)
         elif hasattr(self.page3, 'finish_button'):
@@ -1463,24 +4985,25 @@ class BloretInstaller(QMainWindow):
         
     def fetch_version_info(self):
         """获取版本信息"""
-        # 创建网络工作线程
-        self.network_thread = QThread()
-        self.network_worker = NetworkWorker()
-        self.network_worker.moveToThread(self.network_thread)
-        
-        # 连接信号
-        self.network_thread.started.connect(self.network_worker.fetch_info)
+        self.network_worker = NetworkWorker(self.network_transport)
         self.network_worker.info_received.connect(self.on_version_info_received)
         self.network_worker.error_occurred.connect(self.on_network_error)
-        
-        # 启动线程
-        self.network_thread.start()
+        if not self.network_transport.blocking:
+            # 事件驱动的传输后端直接在 GUI 线程发起请求，结果通过信号返回
+            self.network_worker.fetch_info()
+            return
+        get_worker_pool().submit(self.network_worker.fetch_info, self.network_worker.cancel)
     
-    def on_version_info_received(self, data):
-        """接收到版本信息"""
+    def on_version_info_received(self, data, from_cache=False):
+        """接收到版本信息（from_cache 表示来自本地缓存，后台仍在获取最新信息）"""
+        previous_url = self.install_config['download_url']
         try:
             self.install_config['latest_version'] = data.get('latestVersion', 'Unknown')
-            self.install_config['download_url'] = data.get('downloads', {}).get('stable', {}).get('gitcode', {}).get('zip', '')
+            mirrors = collect_download_mirrors(data)
+            self.install_config['download_mirrors'] = mirrors
+            self.install_config['download_url'] = mirrors[0] if mirrors else ''
+            self.install_config['manifest_urls'] = collect_manifest_urls(data)
+            self.install_config['package_digest'] = collect_package_digest(data)
             
             # 更新页面1的版本显示
             latest_version = self.install_config['latest_version']
@@ -1489,22 +5012,85 @@ class BloretInstaller(QMainWindow):
             
             print(f"最新版本: {self.install_config['latest_version']}")
             print(f"下载链接: {self.install_config['download_url']}")
+            logger.info(f"可用镜像: {len(self.install_config['download_mirrors'])} 个")
         except Exception as e:
             print(f"处理版本信息失败: {e}")
-            self.on_network_error(f"处理版本信息失败: {e}")
+            if not from_cache:
+                self.on_network_error(f"处理版本信息失败: {e}")
             return
         
-        # 清理线程
-        self.cleanup_network_thread()
+        # 释放工作对象（缓存数据不是由网络任务发出的，任务仍在后台确认）
+        if not from_cache:
+            self.cleanup_network_thread()
+
+        # 下载地址变化（发现新版本）时切换正在进行的下载，否则在用户浏览向导时提前后台下载
+        if previous_url and self.install_config['download_url'] != previous_url:
+            logger.info(f"发现新版本 {self.install_config['latest_version']}，切换下载目标")
+            self.restart_download()
+        else:
+            self.start_prefetch()
 
         # 如果开启了快速启动模式，自动开始快速安装
-        if self.is_quickstart:
+        if self.is_quickstart and not self._quickstart_triggered:
+            self._quickstart_triggered = True
             logger.info("快速启动模式：收到版本信息，自动开始快速安装")
             self.on_quick_install()
     
+    def start_prefetch(self):
+        """在后台预先下载安装包（不显示下载窗口），用户进入安装页面时直接接管"""
+        if not self.install_config['download_url'] or self._download_state != 'idle':
+            return
+        logger.info("开始后台预下载安装包")
+        self._start_download_worker()
+    
+    def restart_download(self):
+        """取消正在进行的下载并以新的下载地址重新开始"""
+        if self._download_state == 'done':
+            if self._install_requested:
+                logger.info("旧版本已下载完成并开始安装，忽略新版本")
+                return
+            # 预下载的是旧版本，丢弃后重新下载
+            self.install_config['downloaded_file'] = ''
+            discard_staging_dir(self.install_config['extracted_dir'])
+            self.install_config['extracted_dir'] = ''
+        elif self.download_worker is not None:
+            # 取消旧下载，不等待任务退出，避免阻塞 GUI 线程（任务结束前由线程池持有工作对象）
+            old_worker = self.download_worker
+            try:
+                old_worker.download_progress.disconnect()
+                old_worker.download_extracted.disconnect()
+                old_worker.download_complete.disconnect()
+                old_worker.error_occurred.disconnect()
+            except TypeError:
+                pass
+            old_worker.cancel()
+            self.download_worker = None
+        self._download_state = 'idle'
+        if self._install_requested:
+            self.start_download()
+        else:
+            self.start_prefetch()
+    
     def start_download(self):
-        """开始下载 - 整合测试程序的成功实现"""
+        """开始下载 - 整合测试程序的成功实现；后台预下载已在进行或已完成时直接接管"""
         logger.info("开始下载流程")
+        if (self._download_state != 'idle' and self.install_config.get('manifest_urls')
+                and self._download_install_path != self.resolve_install_path()):
+            # 增量更新是按预下载时的安装目录计算的，安装路径改变后需要重新准备
+            logger.info("安装路径已变化，重新准备下载")
+            self.restart_download()
+        self._install_requested = True
+        if self._download_state == 'done' and os.path.exists(self.install_config['downloaded_file']):
+            logger.info("后台预下载已完成，直接开始安装")
+            self.start_installation()
+            return
+        if self._download_state == 'running':
+            logger.info("后台预下载正在进行，显示下载进度窗口并等待完成")
+            self.show_downloading_dialog()
+            if self._last_download_progress is not None:
+                self.update_download_progress(self._last_download_progress)
+            return
+        
         # 防止重复触发下载流程
         if getattr(self, '_download_starting', False):
             logger.info('下载流程已在启动中，跳过重复调用')
@@ -1531,34 +5117,56 @@ class BloretInstaller(QMainWindow):
         time.sleep(0.1)  # 给UI一点时间完全初始化
         QApplication.processEvents()
         
-        # 创建网络工作线程 - 参考测试程序
-        logger.info("创建网络工作线程")
-        self.network_thread = QThread()
-        self.network_worker = NetworkWorker()
-        self.network_worker.moveToThread(self.network_thread)
-        logger.info("网络工作对象已移动到线程")
-        
-        # 连接信号 - 参考测试程序
-        logger.info("连接网络线程信号")
-        self.network_thread.started.connect(lambda: self.network_worker.download_file(
-            self.install_config['download_url'], 
-            'Bloret-Launcher-Setup.zip'
-        ))
-        self.network_worker.download_progress.connect(self.update_download_progress)
-        self.network_worker.download_complete.connect(self.on_download_complete)
-        self.network_worker.error_occurred.connect(self.on_download_error)
-        logger.info("信号连接完成")
-        
-        # 启动线程 - 参考测试程序
-        logger.info("启动网络线程")
-        self.network_thread.start()
-        logger.info("网络线程已启动")
+        self._start_download_worker()
         # 允许后续的下载启动（仅阻止创建阶段的并发）
         try:
             self._download_starting = False
         except Exception:
             pass
     
+    def resolve_install_path(self):
+        """下载时使用的安装路径（未选择时为默认路径），无法确定时返回空字符串"""
+        install_path = self.install_config['install_path'] or os.path.expandvars(r'%APPDATA%\Bloret-Launcher\Bloret-Launcher')
+        return os.path.normpath(install_path) if os.path.isabs(install_path) else ''
+    
+    def _start_download_worker(self):
+        """创建下载工作对象，在工作线程池中开始下载"""
+        logger.info("创建下载工作对象")
+        self._download_state = 'running'
+        self._last_download_progress = None
+        self.download_worker = NetworkWorker(self.network_transport)
+        
+        # 连接信号 - 参考测试程序
+        logger.info("连接下载信号")
+        download_worker = self.download_worker
+        download_worker.install_path = self._download_install_path = self.resolve_install_path()
+        urls = self.install_config.get('download_mirrors') or self.install_config['download_url']
+        manifest_urls = self.install_config.get('manifest_urls')
+        digest = self.install_config.get('package_digest')
+        if manifest_urls and download_worker.install_path and os.path.isdir(download_worker.install_path):
+            # 已有安装：按文件清单只下载变化的文件
+            start = lambda: download_worker.download_update(
+                manifest_urls, urls, 'Bloret-Launcher-Setup.zip', digest
+            )
+        else:
+            start = lambda: download_worker.download_file(
+                urls, 
+                'Bloret-Launcher-Setup.zip',
+                digest
+            )
+        self.download_worker.download_progress.connect(self.update_download_progress)
+        self.download_worker.download_extracted.connect(self.on_download_extracted)
+        self.download_worker.download_complete.connect(self.on_download_complete)
+        self.download_worker.error_occurred.connect(self.on_download_error)
+        logger.info("信号连接完成")
+        
+        if not self.network_transport.blocking:
+            # 事件驱动的传输后端不需要工作线程；下一轮事件循环再开始，与线程池一样在调用方返回后才收到信号
+            QTimer.singleShot(0, start)
+            return
+        get_worker_pool().submit(start, download_worker.cancel)
+        logger.info("下载任务已提交")
+    
     def show_downloading_dialog(self):
         """显示下载进度窗口"""
         logger.info("开始显示下载进度窗口")
@@ -1661,21 +5269,28 @@ class BloretInstaller(QMainWindow):
         
         self.downloading_dialog.show()
         logger.info("下载进度窗口（稳定版）已显示")
-    def update_download_progress(self, progress):
-        """更新下载进度"""
+    def update_download_progress(self, record):
+        """更新下载进度（record 为进度记录，见 make_progress_record）"""
         # logger.info(f"更新进度: {progress}%") # 减少日志频率，避免IO阻塞影响UI流畅度
+        self._last_download_progress = record
+        if hasattr(self, 'page3') and hasattr(self.page3, 'update_download_status'):
+            self.page3.update_download_status(record)
         
         if self.downloading_dialog and self.downloading_dialog.isVisible():
             try:
-                # 更新进度条
+                # 更新进度条（总大小未知时显示为忙碌状态）
                 if hasattr(self, 'download_progress_bar'):
-                    self.download_progress_bar.setValue(progress)
+                    if record['percent'] is None:
+                        self.download_progress_bar.setRange(0, 0)
+                    else:
+                        self.download_progress_bar.setRange(0, 100)
+                        self.download_progress_bar.setValue(record['percent'])
                     # 某些情况下显式 update 可以确保 Fluent 组件及时重绘
                     self.download_progress_bar.update()
                 
                 # 更新标签文本
                 if hasattr(self, 'download_progress_label'):
-                    self.download_progress_label.setText(f"{progress}%")
+                    self.download_progress_label.setText(format_progress_text(record))
                 
                 # 简单地处理事件循环即可，移除之前的过度刷新逻辑
                 QApplication.processEvents()
@@ -1687,10 +5302,25 @@ class BloretInstaller(QMainWindow):
         # 完全移除了定时刷新逻辑，让Qt的事件循环自然处理
         pass
     
+    def on_download_extracted(self, extract_dir):
+        """下载时已同时解压完成并通过校验"""
+        logger.info(f"边下边解压完成: {extract_dir}")
+        self.install_config['extracted_dir'] = extract_dir
+    
     def on_download_complete(self, file_path):
         """下载完成"""
         logger.info(f"下载完成: {file_path}")
         self.install_config['downloaded_file'] = file_path
+        self._download_state = 'done'
+        
+        # 清理线程
+        logger.info("开始清理下载线程")
+        self.cleanup_download_thread()
+        
+        if not self._install_requested:
+            # 后台预下载完成，等用户进入安装页面后再安装
+            logger.info("后台预下载完成，等待用户开始安装")
+            return
         
         # 隐藏下载进度窗口
         if self.downloading_dialog:
@@ -1700,10 +5330,6 @@ class BloretInstaller(QMainWindow):
         else:
             logger.warning("下载进度窗口不存在")
         
-        # 清理线程
-        logger.info("开始清理网络线程")
-        self.cleanup_network_thread()
-        
         # 继续安装流程
         logger.info("开始安装流程")
         self.start_installation()
@@ -1711,6 +5337,12 @@ class BloretInstaller(QMainWindow):
     def on_download_error(self, error_msg):
         """下载错误"""
         logger.error(f"下载错误: {error_msg}")
+        self._download_state = 'idle'
+        if not self._install_requested:
+            # 后台预下载失败不打扰用户，进入安装页面时会重新下载（可从 .part 续传）
+            logger.info("后台预下载失败，稍后由用户开始安装时重试")
+            self.cleanup_download_thread()
+            return
         # 隐藏下载进度窗口
         if self.downloading_dialog:
             logger.info("隐藏下载进度窗口")
@@ -1720,11 +5352,13 @@ class BloretInstaller(QMainWindow):
             logger.warning("下载进度窗口不存在")
         
         # 清理线程
-        logger.info("开始清理网络线程")
-        self.cleanup_network_thread()
+        logger.info("开始清理下载线程")
+        self.cleanup_download_thread()
         
         # 显示错误
         logger.info(f"显示错误信息: {error_msg}")
+        logger.info(f"安装统计: {get_install_metrics().summary()}")
+        get_install_metrics().save(error_msg)
         self.show_error(error_msg)
     
     def on_network_error(self, error_msg):
@@ -1733,27 +5367,36 @@ class BloretInstaller(QMainWindow):
         print(f"网络错误: {error_msg}")
     
     def cleanup_network_thread(self):
-        """清理网络线程"""
-        logger.info("开始清理网络线程")
-        if self.network_thread:
-            logger.info("正在停止网络线程")
-            self.network_thread.quit()
-            self.network_thread.wait()
-            self.network_thread = None
-            logger.info("网络线程已清理")
-        else:
-            logger.warning("网络线程不存在")
+        """释放网络工作对象（线程属于工作线程池，不需要等待退出）"""
         if self.network_worker:
             logger.info("清理网络工作对象")
             self.network_worker = None
         else:
             logger.warning("网络工作对象不存在")
-        logger.info("网络线程清理完成")
+    
+    def cleanup_download_thread(self):
+        """释放下载工作对象（线程属于工作线程池，不需要等待退出）"""
+        self.download_worker = None
+        logger.info("下载工作对象已清理")
+    
+    def closeEvent(self, event):
+        """关闭窗口时取消网络任务并异步关闭工作线程池，不阻塞 GUI 线程"""
+        for worker in (self.network_worker, self.download_worker):
+            if worker is not None:
+                worker.cancel()
+        # 安装任务正在使用解压目录时不删除：关闭线程池会取消安装，由安装任务自行清理
+        if not self.page3.installing:
+            # 预下载时边下边解压得到、尚未用于安装的目录（正在进行的下载取消时会自行删除）
+            discard_staging_dir(self.install_config['extracted_dir'])
+            self.install_config['extracted_dir'] = ''
+        get_worker_pool().shutdown()
+        super().closeEvent(event)
     
     def on_install_complete(self):
         """安装完成"""
         # 逻辑已移至 Page3 内部处理，此处仅做日志记录
         logger.info("安装流程已全部完成")
+        logger.info(f"安装统计: {get_install_metrics().summary()}")
         
     def show_error(self, message):
         """显示错误信息"""
@@ -0,0 +1,109 @@
+"""比较 requests 与 QNetworkAccessManager 两种网络传输后端的吞吐量和界面响应
+
+默认从本地测试服务器下载随机数据，也可以用 --url 指定真实的下载地址：
+
+    python scripts/benchmark_transport.py --size 64 --runs 3
+    python scripts/benchmark_transport.py --url https://example.com/Bloret-Launcher-Setup.zip
+
+界面响应用 GUI 线程上 10ms 定时器的最大间隔衡量：间隔越接近 10ms，下载期间界面越流畅。
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+import argparse
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QTimer
+from installer import RequestsTransport, QtTransport
+
+TICK_INTERVAL = 10  # 定时器间隔（毫秒）
+
+
+def start_server(size):
+    """启动返回 size 字节数据的本地 HTTP 服务器，返回 (server, url)"""
+    payload = os.urandom(size)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}/payload.bin'
+
+
+def run_once(app, transport, url):
+    """下载一次，返回 (字节数, 耗时, 定时器最大间隔毫秒, 错误)"""
+    state = {'bytes': 0, 'done': False, 'error': None}
+    gaps = []
+    last_tick = [time.perf_counter()]
+
+    def tick():
+        now = time.perf_counter()
+        gaps.append((now - last_tick[0]) * 1000)
+        last_tick[0] = now
+
+    def received(reply, chunk):
+        state['bytes'] += len(chunk)
+
+    def finished(reply):
+        state['error'] = reply.error
+        state['done'] = True
+
+    timer = QTimer()
+    timer.timeout.connect(tick)
+    timer.start(TICK_INTERVAL)
+    started = time.perf_counter()
+    if transport.blocking:
+        # 与安装程序一样在工作线程中阻塞下载，GUI 线程只处理事件
+        threading.Thread(target=transport.get, args=(url,),
+                         kwargs={'on_data': received, 'on_finished': finished}, daemon=True).start()
+    else:
+        transport.get(url, on_data=received, on_finished=finished)
+    while not state['done']:
+        app.processEvents()
+    elapsed = time.perf_counter() - started
+    timer.stop()
+    return state['bytes'], elapsed, max(gaps, default=0.0), state['error']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='比较网络传输后端的吞吐量和界面响应')
+    parser.add_argument('--url', help='下载地址（默认使用本地测试服务器）')
+    parser.add_argument('--size', type=int, default=64, help='本地测试数据大小（MB）')
+    parser.add_argument('--runs', type=int, default=3, help='每个后端的下载次数')
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication([])
+    server = None
+    url = args.url
+    if not url:
+        server, url = start_server(args.size * 1024 * 1024)
+    print(f'下载地址: {url}')
+
+    try:
+        for transport in (RequestsTransport(), QtTransport()):
+            for run in range(args.runs):
+                size, elapsed, max_gap, error = run_once(app, transport, url)
+                if error is not None:
+                    print(f'{transport.name:>8} 第 {run + 1} 次: 失败 {error}')
+                    continue
+                speed = size / elapsed / 1024 / 1024 if elapsed > 0 else 0.0
+                print(f'{transport.name:>8} 第 {run + 1} 次: {size / 1024 / 1024:.1f} MB, '
+                      f'{elapsed:.2f} 秒, {speed:.1f} MB/s, 界面最大停顿 {max_gap:.1f} ms')
+    finally:
+        if server is not None:
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,2182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import io
+import json
+import os
+import re
+import shutil
+import threading
+import tempfile
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PyQt5.QtWidgets import QApplication
+
+# 整个测试模块共用一个 QApplication，避免被回收后 QFluentWidgets 的全局配置失效
+app = QApplication.instance() or QApplication([])
+
+@pytest.fixture(autouse=True)
+def isolated_package_cache(monkeypatch, tmp_path):
+    """每个测试使用独立的安装包缓存，避免测试之间（以及与真实缓存）互相影响"""
+    import installer
+    caches = [installer.PackageCache(str(tmp_path / 'package-cache'), installer.PACKAGE_CACHE_MAX_SIZE)]
+    monkeypatch.setattr(installer, '_package_caches', caches)
+    return caches
+
+
+# 测试用的下载内容（约 5MB，足够触发分段下载）
+PAYLOAD = os.urandom(5 * 1024 * 1024 + 123)
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """支持 Range 请求的简易文件服务器"""
+    accept_ranges = True
+    requested_ranges = []
+    payload = PAYLOAD
+
+    def log_message(self, *args):
+        pass
+
+    def _send_headers(self, status, length, extra=None):
+        self.send_response(status)
+        self.send_header('Content-Length', str(length))
+        self.send_header('ETag', '"bloret-test"')
+        if self.accept_ranges:
+            self.send_header('Accept-Ranges', 'bytes')
+        for key, value in (extra or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+
+    def do_HEAD(self):
+        self._send_headers(200, len(self.payload))
+
+    def do_GET(self):
+        self.requested_ranges.append(self.headers.get('Range', ''))
+        match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        if match and self.accept_ranges:
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else len(self.payload) - 1
+            body = self.payload[start:end + 1]
+            self._send_headers(206, len(body), {'Content-Range': f'bytes {start}-{end}/{len(self.payload)}'})
+        else:
+            body = self.payload
+            self._send_headers(200, len(body))
+        self.wfile.write(body)
+
+
+class NoRangeHandler(RangeHandler):
+    accept_ranges = False
+
+
+def start_server(handler):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/package.zip"
+
+
+def run_download(url, filename, digest=None):
+    """在当前线程直接执行下载，返回 (完成的文件路径, 进度列表, 错误列表)"""
+    from installer import NetworkWorker
+
+    worker = NetworkWorker()
+    completed, progress, errors = [], [], []
+    worker.download_complete.connect(completed.append)
+    worker.download_progress.connect(progress.append)
+    worker.error_occurred.connect(errors.append)
+    worker.download_file(url, filename, digest)
+    # 分段下载线程发出的信号会排队到主线程
+    app.processEvents()
+    return completed, progress, errors
+
+
+def test_segmented_download():
+    """服务器支持 Range 时应分段下载且内容完整"""
+    import installer
+    server, url = start_server(RangeHandler)
+    try:
+        completed, progress, errors = run_download(url, 'bloret_test_segmented.zip')
+        assert not errors, f"下载出错: {errors}"
+        assert completed, "未收到下载完成信号"
+        with open(completed[0], 'rb') as f:
+            assert f.read() == PAYLOAD, "分段下载的内容与原文件不一致"
+        done = [record['done'] for record in progress]
+        assert done == sorted(done), f"进度应单调递增: {done}"
+        assert progress[-1]['done'] == progress[-1]['total'] == len(PAYLOAD)
+        assert progress[-1]['percent'] == 100 and progress[-1]['eta'] == 0
+        assert installer.DOWNLOAD_CONNECTIONS > 1
+    finally:
+        server.shutdown()
+        os.remove(os.path.join(tempfile.gettempdir(), 'bloret_test_segmented.zip'))
+
+
+def test_fallback_without_accept_ranges():
+    """服务器未声明 Accept-Ranges 时应回退到单连接下载"""
+    server, url = start_server(NoRangeHandler)
+    try:
+        completed, progress, errors = run_download(url, 'bloret_test_single.zip')
+        assert not errors, f"下载出错: {errors}"
+        with open(completed[0], 'rb') as f:
+            assert f.read() == PAYLOAD, "单连接下载的内容与原文件不一致"
+    finally:
+        server.shutdown()
+        os.remove(os.path.join(tempfile.gettempdir(), 'bloret_test_single.zip'))
+
+
+def test_resume_from_journal():
+    """存在 .part 文件和续传记录时只下载缺失的区间"""
+    import json
+    from installer import DownloadJournal
+    server, url = start_server(RangeHandler)
+    target = os.path.join(tempfile.gettempdir(), 'bloret_test_resume.zip')
+    half = len(PAYLOAD) // 2
+    try:
+        # 模拟上次下载中断：前半部分已写入 .part
+        with open(target + '.part', 'wb') as f:
+            f.write(PAYLOAD[:half])
+            f.truncate(len(PAYLOAD))
+        journal = DownloadJournal(target + '.part.json')
+        journal.reset(url, len(PAYLOAD), '"bloret-test"', '')
+        journal.mark(0, half)
+        journal.save()
+
+        RangeHandler.requested_ranges = []
+        completed, progress, errors = run_download(url, 'bloret_test_resume.zip')
+        assert not errors, f"下载出错: {errors}"
+        with open(completed[0], 'rb') as f:
+            assert f.read() == PAYLOAD, "续传后的内容与原文件不一致"
+        starts = [int(r[len('bytes='):].split('-')[0]) for r in RangeHandler.requested_ranges]
+        assert starts and min(starts) >= half, f"不应重新下载已完成的部分: {RangeHandler.requested_ranges}"
+        assert not os.path.exists(target + '.part.json'), "下载完成后应删除续传记录"
+    finally:
+        server.shutdown()
+        for path in (target, target + '.part', target + '.part.json'):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+@pytest.mark.parametrize('known_sha256', [True, False])
+def test_resume_across_mirrors_requires_sha256(monkeypatch, known_sha256):
+    """其他镜像留下的 .part 只有在已知 SHA-256（下载后校验）时才能续传，否则从头下载"""
+    import hashlib
+    from installer import DownloadJournal, NetworkWorker
+    server, url = start_server(RangeHandler)
+    other_mirror = 'http://127.0.0.1:1/package.zip'
+    monkeypatch.setattr(NetworkWorker, '_rank_mirrors', lambda self, urls: [
+        {'url': u, 'latency': 0.0, 'speed': 0.0} for u in urls])
+    target = os.path.join(tempfile.gettempdir(), 'bloret_test_cross_mirror.zip')
+    half = len(PAYLOAD) // 2
+    try:
+        with open(target + '.part', 'wb') as f:
+            f.write(PAYLOAD[:half])
+            f.truncate(len(PAYLOAD))
+        journal = DownloadJournal(target + '.part.json')
+        journal.reset(other_mirror, len(PAYLOAD), '"other-mirror"', '')
+        journal.mark(0, half)
+        journal.save()
+
+        RangeHandler.requested_ranges = []
+        digest = {'sha256': hashlib.sha256(PAYLOAD).hexdigest()} if known_sha256 else None
+        completed, progress, errors = run_download([url, other_mirror], 'bloret_test_cross_mirror.zip', digest)
+        assert not errors, f"下载出错: {errors}"
+        with open(completed[0], 'rb') as f:
+            assert f.read() == PAYLOAD
+        starts = [int(r[len('bytes='):].split('-')[0]) for r in RangeHandler.requested_ranges]
+        if known_sha256:
+            assert min(starts) >= half, f"已知哈希时应接着其他镜像的进度下载: {RangeHandler.requested_ranges}"
+        else:
+            assert min(starts) == 0, f"未知哈希时应丢弃其他镜像的 .part: {RangeHandler.requested_ranges}"
+    finally:
+        server.shutdown()
+        for path in (target, target + '.part', target + '.part.json'):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class ChangedFileHandler(RangeHandler):
+    """服务器文件已更新（ETag "v2"），但第一次 HEAD 仍返回旧的 ETag（例如 CDN 节点未同步）"""
+    payload = os.urandom(len(PAYLOAD))
+    stale_heads = 1
+    statuses = []
+
+    def _send_headers(self, status, length, extra=None):
+        self.statuses.append(status)
+        self.send_response(status)
+        self.send_header('Content-Length', str(length))
+        etag = '"v2"'
+        if self.command == 'HEAD' and ChangedFileHandler.stale_heads > 0:
+            ChangedFileHandler.stale_heads -= 1
+            etag = '"v1"'
+        self.send_header('ETag', etag)
+        self.send_header('Accept-Ranges', 'bytes')
+        for key, value in (extra or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+
+    def do_GET(self):
+        if self.headers.get('If-Range', '"v2"') != '"v2"':
+            # If-Range 不匹配：返回完整的新文件
+            self._send_headers(200, len(self.payload))
+            self.wfile.write(self.payload)
+            return
+        super().do_GET()
+
+
+def test_resume_restarts_when_etag_changes():
+    """续传时服务器文件已变化（If-Range 返回 200），应丢弃 .part 重新探测并完整下载新文件"""
+    from installer import DownloadJournal
+    server, url = start_server(ChangedFileHandler)
+    target = os.path.join(tempfile.gettempdir(), 'bloret_test_changed.zip')
+    half = len(PAYLOAD) // 2
+    try:
+        # 上次运行下载了旧文件 (ETag "v1") 的前半部分
+        with open(target + '.part', 'wb') as f:
+            f.write(PAYLOAD[:half])
+            f.truncate(len(PAYLOAD))
+        journal = DownloadJournal(target + '.part.json')
+        journal.reset(url, len(PAYLOAD), '"v1"', '')
+        journal.mark(0, half)
+        journal.save()
+
+        completed, progress, errors = run_download(url, 'bloret_test_changed.zip')
+        assert not errors, f"下载出错: {errors}"
+        assert 200 in ChangedFileHandler.statuses[1:], "If-Range 请求应收到完整文件"
+        with open(completed[0], 'rb') as f:
+            assert f.read() == ChangedFileHandler.payload, "应下载服务器上的新文件，不能混入旧的部分"
+        assert not os.path.exists(target + '.part') and not os.path.exists(target + '.part.json')
+    finally:
+        server.shutdown()
+        for path in (target, target + '.part', target + '.part.json'):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def test_journal_missing_ranges():
+    """续传记录应正确合并区间并计算缺失部分"""
+    from installer import DownloadJournal
+    journal = DownloadJournal(os.path.join(tempfile.gettempdir(), 'bloret_test_journal.json'))
+    journal.reset('http://example.invalid/a.zip', 100, '', '')
+    journal.mark(10, 20)
+    journal.mark(20, 30)
+    journal.mark(50, 60)
+    assert journal.completed == [[10, 30], [50, 60]]
+    assert journal.missing_ranges() == [(0, 10), (30, 50), (60, 100)]
+    assert journal.completed_bytes() == 30
+
+
+class BrokenRangeHandler(RangeHandler):
+    """HEAD 正常但分段请求总是失败的镜像"""
+
+    def do_GET(self):
+        self.send_error(503)
+
+
+def test_collect_download_mirrors():
+    """应收集所有镜像的 zip 地址，并把 gitcode 排在首位"""
+    from installer import collect_download_mirrors
+    data = {'downloads': {'stable': {
+        'github': {'zip': 'https://github.example/a.zip'},
+        'gitcode': {'zip': 'https://gitcode.example/a.zip'},
+        'broken': {},
+    }}}
+    assert collect_download_mirrors(data) == ['https://gitcode.example/a.zip', 'https://github.example/a.zip']
+    assert collect_download_mirrors({}) == []
+
+
+def test_mirror_failover(monkeypatch):
+    """第一个镜像下载失败时应切换到下一个镜像"""
+    from installer import NetworkWorker
+    broken, broken_url = start_server(BrokenRangeHandler)
+    good, good_url = start_server(RangeHandler)
+    # 固定镜像顺序，让失败的镜像排在前面
+    monkeypatch.setattr(NetworkWorker, '_rank_mirrors', lambda self, urls: [
+        {'url': u, 'latency': 0.0, 'speed': 1.0} for u in urls])
+    target = os.path.join(tempfile.gettempdir(), 'bloret_test_mirror.zip')
+    try:
+        completed, progress, errors = run_download([broken_url, good_url], 'bloret_test_mirror.zip')
+        assert not errors, f"下载出错: {errors}"
+        with open(completed[0], 'rb') as f:
+            assert f.read() == PAYLOAD, "切换镜像后的内容与原文件不一致"
+    finally:
+        broken.shutdown()
+        good.shutdown()
+        for path in (target, target + '.part', target + '.part.json'):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def test_rank_mirrors_puts_unreachable_last():
+    """无法连接的镜像应排在最后"""
+    from installer import NetworkWorker
+    good, good_url = start_server(RangeHandler)
+    try:
+        dead_url = 'http://127.0.0.1:9/package.zip'
+        ranked = NetworkWorker()._rank_mirrors([dead_url, good_url])
+        assert [m['url'] for m in ranked] == [good_url, dead_url]
+        assert ranked[0]['speed'] > 0
+    finally:
+        good.shutdown()
+
+
+def test_throughput_monitor_window():
+    """滑动窗口速度统计"""
+    from installer import ThroughputMonitor
+    monitor = ThroughputMonitor(2.0)
+    monitor.add_sample(0, now=0.0)
+    monitor.add_sample(1000, now=1.0)
+    assert not monitor.covers_window()
+    monitor.add_sample(2000, now=2.0)
+    monitor.add_sample(2100, now=3.0)
+    assert monitor.covers_window()
+    assert abs(monitor.rate() - 550.0) < 1e-6
+
+
+def test_http_session_is_shared():
+    """所有网络请求应复用同一个带连接池的会话"""
+    import installer
+    session = installer.get_http_session()
+    assert installer.get_http_session() is session
+    adapter = session.get_adapter('http://pcfs.eno.ink:3001/api/info')
+    assert adapter._pool_maxsize >= installer.DOWNLOAD_CONNECTIONS
+    assert adapter.max_retries.total == installer.HTTP_MAX_RETRIES
+
+
+def _png_bytes(width, height):
+    from PyQt5.QtCore import QBuffer, QByteArray, QIODevice
+    from PyQt5.QtGui import QImage, QColor
+    image = QImage(width, height, QImage.Format_ARGB32)
+    image.fill(QColor('#0078d4'))
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, 'PNG')
+    return bytes(data)
+
+
+def test_image_loader_async(monkeypatch, tmp_path):
+    """图片应在后台加载，标签先显示占位文字，完成后按标签尺寸显示"""
+    import time
+    from PyQt5.QtWidgets import QLabel
+    import installer
+    from installer import ImageLoader, AssetCache
+    monkeypatch.setattr(installer, '_asset_cache', AssetCache(str(tmp_path), 1024 * 1024))
+
+    png = _png_bytes(400, 400)
+
+    class PngHandler(RangeHandler):
+        def do_GET(self):
+            time.sleep(0.2)
+            self._send_headers(200, len(png), {'Content-Type': 'image/png'})
+            self.wfile.write(png)
+
+    server, url = start_server(PngHandler)
+    try:
+        label = QLabel()
+        label.setFixedSize(100, 100)
+        loader = ImageLoader()
+        loader.load(url, label, "LOGO", "加载失败")
+        assert label.text() == "LOGO", "加载过程中应显示占位文字"
+
+        deadline = time.time() + 10
+        while (label.pixmap() is None or label.pixmap().isNull()) and time.time() < deadline:
+            app.processEvents()
+            time.sleep(0.01)
+        pixmap = label.pixmap()
+        assert pixmap is not None and not pixmap.isNull(), "图片未加载到标签上"
+        assert pixmap.width() == int(100 * label.devicePixelRatioF()), "图片应按标签尺寸缩放"
+    finally:
+        server.shutdown()
+
+
+def test_asset_cache_revalidate_and_lru(tmp_path):
+    """资源缓存应保存校验信息，并在超出容量时淘汰最久未使用的条目"""
+    import time
+    from installer import AssetCache
+    cache = AssetCache(str(tmp_path), 250)
+    cache.put('http://a/1.png', b'1' * 100, etag='"v1"')
+    time.sleep(0.01)
+    cache.put('http://a/2.png', b'2' * 100, last_modified='Mon, 01 Jan 2024 00:00:00 GMT')
+    time.sleep(0.01)
+    # 读取 1.png 使其成为最近使用的条目
+    content, entry = cache.get('http://a/1.png')
+    assert content == b'1' * 100 and entry['etag'] == '"v1"'
+    assert cache.conditional_headers('http://a/1.png') == {'If-None-Match': '"v1"'}
+    assert cache.conditional_headers('http://a/2.png') == {'If-Modified-Since': 'Mon, 01 Jan 2024 00:00:00 GMT'}
+
+    cache.put('http://a/3.png', b'3' * 100)
+    assert cache.get('http://a/2.png') == (None, None), "应淘汰最久未使用的 2.png"
+    assert cache.get('http://a/1.png')[0] == b'1' * 100
+    # 重新打开缓存目录，索引应已持久化
+    assert AssetCache(str(tmp_path), 250).get('http://a/3.png')[0] == b'3' * 100
+
+
+def test_image_loader_uses_cache_on_304(monkeypatch, tmp_path):
+    """服务器返回 304 时应直接显示缓存的图片"""
+    import time
+    from PyQt5.QtWidgets import QLabel
+    import installer
+    from installer import ImageLoader, AssetCache
+
+    png = _png_bytes(50, 50)
+    requests_seen = []
+
+    class NotModifiedHandler(RangeHandler):
+        def do_GET(self):
+            requests_seen.append(self.headers.get('If-None-Match'))
+            self.send_response(304)
+            self.end_headers()
+
+    server, url = start_server(NotModifiedHandler)
+    cache = AssetCache(str(tmp_path), 1024 * 1024)
+    cache.put(url, png, etag='"bloret-test"')
+    monkeypatch.setattr(installer, '_asset_cache', cache)
+    try:
+        label = QLabel()
+        label.setFixedSize(50, 50)
+        ImageLoader(label).load(url, label, "LOGO", "加载失败")
+        deadline = time.time() + 10
+        while not requests_seen and time.time() < deadline:
+            app.processEvents()
+            time.sleep(0.01)
+        for _ in range(20):
+            app.processEvents()
+            time.sleep(0.01)
+        assert requests_seen == ['"bloret-test"'], "应使用 If-None-Match 向服务器确认"
+        assert label.pixmap() is not None and not label.pixmap().isNull()
+        assert label.text() != "加载失败"
+    finally:
+        server.shutdown()
+
+
+def test_image_loader_updates_validators_when_bytes_unchanged(monkeypatch, tmp_path):
+    """服务器返回 200 但内容与缓存相同时，也要记录新的 ETag，下次才能得到 304"""
+    from PyQt5.QtCore import QSize
+    from PyQt5.QtWidgets import QLabel
+    import installer
+    from installer import AssetCache, ImageLoader
+
+    png = _png_bytes(50, 50)
+
+    class SameBytesHandler(RangeHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(png)))
+            self.send_header('ETag', '"bloret-v2"')
+            self.end_headers()
+            self.wfile.write(png)
+
+    server, url = start_server(SameBytesHandler)
+    cache = AssetCache(str(tmp_path), 1024 * 1024)
+    cache.put(url, png, etag='"bloret-v1"')
+    monkeypatch.setattr(installer, '_asset_cache', cache)
+    try:
+        label = QLabel()
+        installer._ImageLoadTask(ImageLoader(label), 0, url, QSize(50, 50)).run()
+        assert cache.conditional_headers(url) == {'If-None-Match': '"bloret-v2"'}
+    finally:
+        server.shutdown()
+
+
+class InfoHandler(BaseHTTPRequestHandler):
+    """返回 /api/info，支持 ETag 条件请求"""
+    body = b'{"latestVersion": "26.1", "downloads": {}}'
+    delay = 0.0
+    conditional_hits = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        import time
+        time.sleep(self.delay)
+        if self.headers.get('If-None-Match') == '"info-v1"':
+            self.conditional_hits.append(self.path)
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(self.body)))
+        self.send_header('ETag', '"info-v1"')
+        self.end_headers()
+        self.wfile.write(self.body)
+
+
+def test_fetch_info_cached_with_validators(monkeypatch, tmp_path):
+    """版本信息应连同 ETag 一起缓存，再次获取时使用条件请求"""
+    import installer
+    server, url = start_server(InfoHandler)
+    monkeypatch.setattr(installer, 'INFO_URL', url)
+    monkeypatch.setattr(installer, '_info_cache', installer.AssetCache(str(tmp_path), 1024 * 1024))
+    try:
+        received = []
+        worker = installer.NetworkWorker()
+        worker.info_received.connect(received.append)
+        worker.fetch_info()
+        assert received[-1]['latestVersion'] == '26.1'
+        assert installer.load_cached_info()['latestVersion'] == '26.1'
+
+        InfoHandler.conditional_hits = []
+        worker.fetch_info()
+        assert InfoHandler.conditional_hits, "第二次获取应发送 If-None-Match"
+        assert received[-1]['latestVersion'] == '26.1', "304 时应使用缓存的版本信息"
+    finally:
+        server.shutdown()
+
+
+class SlowInfoHandler(InfoHandler):
+    """响应很慢的版本信息接口"""
+    body = b'{"latestVersion": "25.9", "downloads": {}}'
+    delay = 3.0
+
+
+class InvalidInfoHandler(InfoHandler):
+    """立即返回但格式不正确的版本信息接口"""
+    body = b'{"downloads": []}'
+
+
+def test_fetch_info_first_valid_endpoint_wins(monkeypatch, tmp_path):
+    """多个版本信息接口同时请求，第一个通过格式检查的响应胜出，无需等待慢接口"""
+    import time
+    import installer
+    slow_server, slow_url = start_server(SlowInfoHandler)
+    invalid_server, invalid_url = start_server(InvalidInfoHandler)
+    server, url = start_server(InfoHandler)
+    monkeypatch.setattr(installer, 'INFO_URL', slow_url)
+    monkeypatch.setattr(installer, 'INFO_ENDPOINTS', [invalid_url, url])
+    monkeypatch.setattr(installer, '_info_cache', installer.AssetCache(str(tmp_path), 1024 * 1024))
+    try:
+        received = []
+        worker = installer.NetworkWorker()
+        worker.info_received.connect(received.append)
+        started = time.time()
+        worker.fetch_info()
+        assert time.time() - started < SlowInfoHandler.delay, "不应等待慢接口"
+        assert received and received[-1]['latestVersion'] == '26.1'
+        assert installer.load_cached_info(url)['latestVersion'] == '26.1'
+        assert installer.load_cached_info(invalid_url) is None, "格式不正确的响应不应写入缓存"
+        with pytest.raises(ValueError):
+            installer.validate_info({'downloads': []})
+    finally:
+        server.shutdown()
+        invalid_server.shutdown()
+        slow_server.shutdown()
+
+
+class HangingInfoHandler(InfoHandler):
+    """一直不返回响应头的版本信息接口，记录客户端断开连接的时间"""
+    disconnected = []
+
+    def do_GET(self):
+        import select
+        import time
+        # GET 请求没有请求体，连接可读即客户端已断开
+        readable, _, _ = select.select([self.connection], [], [], 10)
+        if readable:
+            self.disconnected.append(time.time())
+
+
+def test_fetch_info_aborts_losers_waiting_for_headers(monkeypatch, tmp_path):
+    """胜出的接口确定后，仍在等待响应头的请求应立即断开，而不是等到超时"""
+    import time
+    import installer
+    HangingInfoHandler.disconnected = []
+    hanging_server, hanging_url = start_server(HangingInfoHandler)
+    server, url = start_server(InfoHandler)
+    monkeypatch.setattr(installer, 'INFO_URL', hanging_url)
+    monkeypatch.setattr(installer, 'INFO_ENDPOINTS', [url])
+    monkeypatch.setattr(installer, '_info_cache', installer.AssetCache(str(tmp_path), 1024 * 1024))
+    try:
+        received = []
+        worker = installer.NetworkWorker()
+        worker.info_received.connect(received.append)
+        worker.fetch_info()
+        finished = time.time()
+        assert received and received[-1]['latestVersion'] == '26.1'
+        deadline = finished + 2
+        while not HangingInfoHandler.disconnected and time.time() < deadline:
+            time.sleep(0.01)
+        assert HangingInfoHandler.disconnected, "未胜出的请求应立即断开连接"
+        assert HangingInfoHandler.disconnected[0] - finished < 1
+    finally:
+        server.shutdown()
+        hanging_server.shutdown()
+
+
+def test_aborted_request_stops_connecting():
+    """建立连接期间取消请求时应立即放弃连接"""
+    import socket
+    import time
+    import installer
+    # 连接队列已满且不 accept 的服务器：新的连接一直停在建立阶段
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(0)
+    fillers = []
+    try:
+        for _ in range(3):
+            filler = socket.socket()
+            filler.setblocking(False)
+            filler.connect_ex(listener.getsockname())
+            fillers.append(filler)
+        time.sleep(0.2)
+        started = time.time()
+        with pytest.raises(ConnectionAbortedError):
+            installer.happy_eyeballs_connect(listener.getsockname(), timeout=5,
+                                             cancelled=lambda: time.time() - started > 0.2)
+        assert time.time() - started < 1
+    finally:
+        for filler in fillers:
+            filler.close()
+        listener.close()
+
+
+def wait_for(condition, timeout=10):
+    """运行事件循环直到 condition() 为真（事件驱动的传输后端需要事件循环）"""
+    import time
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        app.processEvents()
+        time.sleep(0.005)
+    return condition()
+
+
+def test_qt_transport_fetch_info(monkeypatch, tmp_path):
+    """Qt 传输后端无需工作线程即可获取版本信息，格式不正确的响应不会胜出"""
+    import installer
+    invalid_server, invalid_url = start_server(InvalidInfoHandler)
+    server, url = start_server(InfoHandler)
+    monkeypatch.setattr(installer, 'INFO_URL', invalid_url)
+    monkeypatch.setattr(installer, 'INFO_ENDPOINTS', [url])
+    monkeypatch.setattr(installer, '_info_cache', installer.AssetCache(str(tmp_path), 1024 * 1024))
+    try:
+        received, errors = [], []
+        worker = installer.NetworkWorker(installer.QtTransport())
+        worker.info_received.connect(received.append)
+        worker.error_occurred.connect(errors.append)
+        worker.fetch_info()
+        assert not received, "Qt 后端应立即返回，结果通过信号送达"
+        assert wait_for(lambda: received or errors), "未收到版本信息"
+        assert not errors, f"获取出错: {errors}"
+        assert received[-1]['latestVersion'] == '26.1'
+
+        # 再次获取时使用条件请求
+        InfoHandler.conditional_hits = []
+        received.clear()
+        worker.fetch_info()
+        assert wait_for(lambda: received), "未收到版本信息"
+        assert InfoHandler.conditional_hits, "第二次获取应发送 If-None-Match"
+    finally:
+        server.shutdown()
+        invalid_server.shutdown()
+
+
+class OtherPayloadHandler(RangeHandler):
+    """与 PAYLOAD 不同的文件，避免命中安装包缓存"""
+    payload = os.urandom(2 * 1024 * 1024 + 7)
+
+
+def test_qt_transport_download_with_failover():
+    """Qt 传输后端事件驱动地下载并校验 SHA-256，镜像不可用时切换到下一个"""
+    import hashlib
+    import socket
+    import installer
+    probe = socket.socket()
+    probe.bind(('127.0.0.1', 0))
+    dead_url = f'http://127.0.0.1:{probe.getsockname()[1]}/dead.zip'
+    probe.close()
+    server, url = start_server(OtherPayloadHandler)
+    filename = 'bloret_test_qt_transport.zip'
+    try:
+        worker = installer.NetworkWorker(installer.QtTransport())
+        completed, progress, errors = [], [], []
+        worker.download_complete.connect(completed.append)
+        worker.download_progress.connect(progress.append)
+        worker.error_occurred.connect(errors.append)
+        worker.download_file([dead_url, url], filename,
+                             {'sha256': hashlib.sha256(OtherPayloadHandler.payload).hexdigest()})
+        assert wait_for(lambda: completed or errors), "下载未结束"
+        assert not errors, f"下载出错: {errors}"
+        with open(completed[0], 'rb') as f:
+            assert f.read() == OtherPayloadHandler.payload
+        assert progress[-1]['done'] == len(OtherPayloadHandler.payload)
+    finally:
+        server.shutdown()
+        try:
+            os.remove(os.path.join(tempfile.gettempdir(), filename))
+        except OSError:
+            pass
+
+
+class TruncatedHandler(RangeHandler):
+    """声明完整长度，只发送一半内容后断开连接；/missing 返回 404"""
+
+    def do_GET(self):
+        if self.path == '/missing':
+            self.send_error(404)
+            return
+        self._send_headers(200, len(self.payload))
+        self.wfile.write(self.payload[:len(self.payload) // 2])
+        self.wfile.flush()
+        self.close_connection = True
+
+
+def test_qt_transport_reports_connection_drop_after_200():
+    """Qt 传输后端：收到 200 后连接中途断开应报告错误，HTTP 错误状态码仍通过 raise_for_status 报告"""
+    import requests
+    import installer
+    server, url = start_server(TruncatedHandler)
+    try:
+        transport = installer.QtTransport()
+        replies = []
+        transport.get(url, on_data=lambda reply, chunk: None, on_finished=replies.append)
+        transport.get(url.rsplit('/', 1)[0] + '/missing', on_finished=replies.append)
+        assert wait_for(lambda: len(replies) == 2), "请求未结束"
+        dropped, missing = sorted(replies, key=lambda reply: reply.status_code)
+        assert dropped.status_code == 200 and dropped.error is not None
+        assert missing.status_code == 404 and missing.error is None
+        with pytest.raises(requests.HTTPError):
+            missing.raise_for_status()
+    finally:
+        server.shutdown()
+
+
+def test_worker_pool_reuses_threads_and_shuts_down_without_waiting():
+    """工作线程池复用同一批线程；关闭时只通知任务取消，不等待线程退出"""
+    import time
+    import installer
+    pool = installer.WorkerPool(max_threads=1)
+    threads = []
+    for _ in range(3):
+        done = threading.Event()
+        assert pool.submit(lambda: (threads.append(threading.get_ident()), done.set()))
+        assert done.wait(5)
+        time.sleep(0.05)
+    assert len(set(threads)) == 1, "任务应复用同一个长期存在的线程"
+
+    cancelled = threading.Event()
+    pool.submit(lambda: cancelled.wait(5), cancelled.set)
+    pool.submit(lambda: threads.append('queued'))
+    started = time.time()
+    pool.shutdown()
+    assert time.time() - started < 0.5, "关闭线程池不应等待任务结束"
+    assert cancelled.is_set(), "关闭时应调用任务的取消函数"
+    assert not pool.submit(lambda: None), "关闭后不再接受任务"
+    assert pool.wait(5)
+    assert 'queued' not in threads, "排队中的任务应被丢弃"
+    assert installer.get_worker_pool() is not pool
+
+
+class RedirectHandler(OtherPayloadHandler):
+    """/redirect 返回带响应体的 302，跳转到实际文件"""
+    payload = os.urandom(300000)
+    redirect_body = b'x' * 90
+
+    def do_GET(self):
+        if self.path == '/redirect':
+            self.send_response(302)
+            self.send_header('Location', '/file.zip')
+            self.send_header('Content-Length', str(len(self.redirect_body)))
+            self.end_headers()
+            self.wfile.write(self.redirect_body)
+            return
+        super().do_GET()
+
+
+def test_qt_transport_follows_redirect():
+    """Qt 传输后端跟随重定向时按最终响应的状态和大小下载；回调出错时请求失败而不是抛进 Qt"""
+    import hashlib
+    import installer
+    server, url = start_server(RedirectHandler)
+    base = url.rsplit('/', 1)[0]
+    filename = 'bloret_test_qt_redirect.zip'
+    try:
+        transport = installer.QtTransport()
+        started = []
+        transport.get(base + '/redirect', on_started=lambda reply: started.append(
+            (reply.status_code, reply.headers.get('content-length'))))
+        assert wait_for(lambda: started), "未收到响应头"
+        assert started == [(200, str(len(RedirectHandler.payload)))], f"应只收到最终响应: {started}"
+
+        def broken(reply, chunk):
+            raise ValueError("写入失败")
+        finished = []
+        transport.get(base + '/redirect', on_data=broken, on_finished=finished.append)
+        assert wait_for(lambda: finished), "请求未结束"
+        assert isinstance(finished[0].error, ValueError)
+
+        worker = installer.NetworkWorker(transport)
+        completed, errors = [], []
+        worker.download_complete.connect(completed.append)
+        worker.error_occurred.connect(errors.append)
+        worker.download_file(base + '/redirect', filename,
+                             {'sha256': hashlib.sha256(RedirectHandler.payload).hexdigest()})
+        assert wait_for(lambda: completed or errors), "下载未结束"
+        assert not errors, f"下载出错: {errors}"
+        with open(completed[0], 'rb') as f:
+            assert f.read() == RedirectHandler.payload
+    finally:
+        server.shutdown()
+        try:
+            os.remove(os.path.join(tempfile.gettempdir(), filename))
+        except OSError:
+            pass
+
+
+def test_download_subtasks_reuse_pooled_threads(monkeypatch):
+    """分段、哈希、看门狗等子任务复用共用线程池的线程，第二次下载不再创建新线程"""
+    server, url = start_server(RangeHandler)
+    started = []
+    original_start = threading.Thread.start
+
+    def record_start(thread):
+        if 'process_request_thread' not in thread.name:  # 测试服务器处理请求的线程
+            started.append(thread.name)
+        return original_start(thread)
+
+    try:
+        for attempt in range(2):
+            started.clear()
+            RangeHandler.requested_ranges = []
+            monkeypatch.setattr(threading.Thread, 'start', record_start)
+            try:
+                # 每次使用不同的地址，避免命中安装包缓存
+                token = os.urandom(4).hex()
+                completed, progress, errors = run_download([f'{url}?a={token}', f'{url}?b={token}'],
+                                                           'bloret_test_pooled.zip')
+            finally:
+                monkeypatch.setattr(threading.Thread, 'start', original_start)
+            assert not errors, f"下载出错: {errors}"
+            assert RangeHandler.requested_ranges, "应通过网络下载而不是命中缓存"
+        assert not started, f"第二次下载不应创建新线程: {started}"
+    finally:
+        server.shutdown()
+        os.remove(os.path.join(tempfile.gettempdir(), 'bloret_test_pooled.zip'))
+
+
+def test_pool_tasks_release_objects_in_gui_thread():
+    """子任务持有的对象（如 NetworkWorker）应在 GUI 线程中释放，而不是在子任务线程中"""
+    import installer
+    released = []
+
+    class Holder:
+        def __del__(self):
+            released.append(threading.current_thread() is threading.main_thread())
+
+    holder = Holder()
+    proceed = threading.Event()
+    future = installer.get_worker_pool().submit_task(lambda held: proceed.wait(5), holder)
+    del holder
+    proceed.set()
+    future.result()
+    assert wait_for(lambda: released), "对象未被释放"
+    assert released == [True], "对象应在 GUI 线程中释放"
+
+
+def test_quickstart_uses_cached_info_immediately(monkeypatch, tmp_path):
+    """快速启动时有缓存则无需等待 /api/info 即开始安装"""
+    import sys
+    import time
+    import installer
+    server, url = start_server(InfoHandler)
+    InfoHandler.delay = 2.0
+    cache = installer.AssetCache(str(tmp_path), 1024 * 1024)
+    monkeypatch.setattr(installer, 'INFO_URL', url)
+    monkeypatch.setattr(installer, '_info_cache', cache)
+    cache.put(url, b'{"latestVersion": "26.0", "downloads": {}}', etag='"info-v0"')
+    monkeypatch.setattr(sys, 'argv', sys.argv + ['--quickstart'])
+    try:
+        inst = installer.BloretInstaller()
+        deadline = time.time() + 0.5
+        while time.time() < deadline:
+            app.processEvents()
+            time.sleep(0.01)
+        assert inst._quickstart_triggered, "应使用缓存立即开始快速安装"
+        assert inst.stacked_widget.currentWidget() is inst.page3
+        assert inst.install_config['latest_version'] == '26.0'
+
+        # 后台确认完成后应更新为最新版本
+        deadline = time.time() + 10
+        while inst.network_worker is not None and time.time() < deadline:
+            app.processEvents()
+            time.sleep(0.01)
+        assert inst.install_config['latest_version'] == '26.1'
+    finally:
+        InfoHandler.delay = 0.0
+        server.shutdown()
+
+
+def test_unused_staging_dir_removed_on_close(tmp_path):
+    """关闭安装程序时删除预下载解压得到、尚未安装的暂存目录，以及为它新建的上级目录"""
+    import installer
+    install_path = tmp_path / 'Bloret-Launcher' / 'Bloret-Launcher'
+    staging = installer.make_staging_dir(str(install_path))
+    with open(os.path.join(staging, 'Bloret-Launcher.exe'), 'wb') as f:
+        f.write(b'exe')
+    kept = installer.make_staging_dir(str(install_path))
+
+    inst = installer.BloretInstaller(fetch_version=False)
+    inst.install_config['extracted_dir'] = staging
+    inst.close()
+    assert not os.path.exists(staging), "未安装的暂存目录应被删除"
+    assert os.path.isdir(kept)
+    installer.discard_staging_dir(kept)
+    assert not (tmp_path / 'Bloret-Launcher').exists(), "为暂存目录新建的上级目录在最后一个暂存目录删除后应一并删除"
+
+
+def test_close_during_install_leaves_staging_dir_to_install_job(tmp_path, monkeypatch):
+    """安装任务正在使用预解压目录时关闭窗口：窗口不删除该目录，由取消后的安装任务清理"""
+    import threading
+    import installer
+    install_path = str(tmp_path / 'Bloret-Launcher')
+    old_files = {'Bloret-Launcher/Bloret-Launcher.exe': b'old'}
+    _write_tree(install_path, old_files)
+    staging = installer.make_staging_dir(install_path)
+    _write_tree(staging, {name: data for name, (data, _) in ZIP_FILES.items()})
+    zip_path = tmp_path / 'package.zip'
+    zip_path.write_bytes(_build_zip(ZIP_FILES))
+
+    discarded = []
+    real_discard = installer.discard_staging_dir
+
+    def recording_discard(path):
+        discarded.append((path, threading.current_thread()))
+        real_discard(path)
+
+    monkeypatch.setattr(installer, 'discard_staging_dir', recording_discard)
+    inst = installer.BloretInstaller(fetch_version=False)
+    inst.install_config.update({'install_path': install_path, 'downloaded_file': str(zip_path),
+                                'extracted_dir': staging})
+    inst.page3.start_installation(inst.install_config)
+    inst.close()
+
+    assert wait_for(lambda: not inst.page3.installing, timeout=20)
+    assert not os.path.exists(staging), "取消的安装任务应清理预解压目录"
+    assert discarded and all(thread is not threading.main_thread() for path, thread in discarded if path == staging), \
+        "安装任务运行时关闭窗口不应删除它正在使用的目录"
+    assert _read_tree(install_path) == old_files
+
+
+def test_prefetch_then_attach(monkeypatch):
+    """收到下载地址后应在后台预下载，开始安装时直接使用已下载的文件"""
+    import time
+    import installer
+    server, url = start_server(RangeHandler)
+    inst = installer.BloretInstaller(fetch_version=False)
+    started = []
+    monkeypatch.setattr(inst, 'start_installation', lambda: started.append(inst.install_config['downloaded_file']))
+    try:
+        inst.on_version_info_received({'latestVersion': '26.1', 'downloads': {'stable': {'gitcode': {'zip': url}}}})
+        assert inst._download_state == 'running', "收到下载地址后应立即开始后台预下载"
+        assert not (inst.downloading_dialog and inst.downloading_dialog.isVisible()), "预下载不应弹出下载窗口"
+
+        deadline = time.time() + 20
+        while inst._download_state == 'running' and time.time() < deadline:
+            app.processEvents()
+            time.sleep(0.01)
+        assert inst._download_state == 'done'
+        assert not started, "用户尚未开始安装时不应自动安装"
+
+        inst.start_download()
+        assert started and os.path.exists(started[0]), "预下载完成后应直接开始安装"
+        with open(started[0], 'rb') as f:
+            assert f.read() == PAYLOAD
+    finally:
+        server.shutdown()
+        path = inst.install_config.get('downloaded_file')
+        if path and os.path.exists(path):
+            os.remove(path)
+
+
+class UnseekableBuffer:
+    """不可 seek 的输出，让 zipfile 写出带数据描述符的条目"""
+
+    def __init__(self):
+        self.buffer = io.BytesIO()
+
+    def write(self, data):
+        return self.buffer.write(data)
+
+    def flush(self):
+        pass
+
+
+def _build_zip(files, streamed=False):
+    """生成测试用 zip；streamed=True 时条目带数据描述符（大小写在数据之后）"""
+    import zipfile
+    output = UnseekableBuffer() if streamed else io.BytesIO()
+    with zipfile.ZipFile(output, 'w') as zf:
+        zf.writestr('Bloret-Launcher/', b'')
+        for name, (data, compress_type) in files.items():
+            zf.writestr(zipfile.ZipInfo(name), data, compress_type=compress_type)
+    return (output.buffer if streamed else output).getvalue()
+
+
+ZIP_FILES = {
+    'Bloret-Launcher/Bloret-Launcher.exe': (os.urandom(3 * 1024 * 1024), 0),
+    'Bloret-Launcher/data/config.json': (b'{"theme": "light"}' * 50000, 8),
+    'Bloret-Launcher/readme.txt': ('布洛瑞特启动器'.encode('utf-8') * 1000, 8),
+}
+
+
+def _run_streaming_download(handler, filename):
+    from installer import NetworkWorker
+
+    worker = NetworkWorker()
+    extracted, completed, errors = [], [], []
+    worker.download_extracted.connect(extracted.append)
+    worker.download_complete.connect(completed.append)
+    worker.error_occurred.connect(errors.append)
+    server, url = start_server(handler)
+    try:
+        worker.download_file(url, filename)
+    finally:
+        server.shutdown()
+        path = os.path.join(tempfile.gettempdir(), filename)
+        if os.path.exists(path):
+            os.remove(path)
+    return extracted, completed, errors
+
+
+def _assert_extracted(extract_dir, files):
+    for name, (data, _) in files.items():
+        with open(os.path.join(extract_dir, *name.split('/')), 'rb') as f:
+            assert f.read() == data, f"解压内容不一致: {name}"
+
+
+def test_streaming_extract_segmented():
+    """分段下载时边下边解压，完成后解压目录与 zip 内容一致"""
+    class ZipHandler(RangeHandler):
+        payload = _build_zip(ZIP_FILES)
+
+    extracted, completed, errors = _run_streaming_download(ZipHandler, 'bloret_test_stream.zip')
+    assert not errors, f"下载出错: {errors}"
+    assert completed and extracted, "应在下载完成前得到解压目录"
+    try:
+        _assert_extracted(extracted[0], ZIP_FILES)
+    finally:
+        shutil.rmtree(extracted[0], ignore_errors=True)
+
+
+def test_streaming_extract_data_descriptor():
+    """单连接下载、条目带数据描述符时也能流式解压（仅 deflate 条目可以确定结尾）"""
+    files = {name: (data, 8) for name, (data, _) in ZIP_FILES.items()}
+
+    class ZipHandler(NoRangeHandler):
+        payload = _build_zip(files, streamed=True)
+
+    extracted, completed, errors = _run_streaming_download(ZipHandler, 'bloret_test_stream_dd.zip')
+    assert not errors, f"下载出错: {errors}"
+    assert completed and extracted, "带数据描述符的 zip 应能边下边解压"
+    try:
+        _assert_extracted(extracted[0], files)
+    finally:
+        shutil.rmtree(extracted[0], ignore_errors=True)
+
+
+def test_streaming_extract_falls_back_on_unsupported():
+    """遇到不支持的压缩方式时放弃流式解压，下载本身不受影响"""
+    import zipfile
+    files = dict(ZIP_FILES)
+    files['Bloret-Launcher/data/big.bin'] = (b'bloret' * 10000, zipfile.ZIP_BZIP2)
+
+    class ZipHandler(RangeHandler):
+        payload = _build_zip(files)
+
+    extracted, completed, errors = _run_streaming_download(ZipHandler, 'bloret_test_stream_bz2.zip')
+    assert not errors, f"下载出错: {errors}"
+    assert completed, "未收到下载完成信号"
+    assert not extracted, "不支持的 zip 不应报告解压完成"
+
+
+def _write_tree(root, files):
+    for name, data in files.items():
+        path = os.path.join(root, *name.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+
+def _read_tree(root):
+    result = {}
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            with open(path, 'rb') as f:
+                result[os.path.relpath(path, root).replace(os.sep, '/')] = f.read()
+    return result
+
+
+def test_swap_install_dir_keeps_user_files(tmp_path):
+    """暂存目录替换安装目录：安装包文件以新版本为准，未变化的安装包文件和用户数据保留，旧版本的其他文件删除"""
+    from installer import Page3, make_staging_dir
+    install_path = str(tmp_path / 'Bloret-Launcher')
+    _write_tree(install_path, {'Bloret-Launcher.exe': b'old', 'libs/same.dll': b'same', 'libs/removed.dll': b'stale',
+                               'config/user.json': b'user', '.minecraft/saves/a': b'save'})
+    staging = make_staging_dir(install_path)
+    assert os.path.dirname(staging) == str(tmp_path)
+    _write_tree(staging, {'Bloret-Launcher.exe': b'new', 'config/default.json': b'default'})
+
+    # libs/same.dll 未变化，解压时没有写入暂存目录；libs/removed.dll 已不在新安装包中
+    Page3().swap_install_dir(staging, install_path,
+                             ['Bloret-Launcher.exe', 'libs/same.dll', 'config/default.json'])
+
+    assert _read_tree(install_path) == {
+        'Bloret-Launcher.exe': b'new',
+        'libs/same.dll': b'same',
+        'config/default.json': b'default',
+        'config/user.json': b'user',
+        '.minecraft/saves/a': b'save',
+    }
+    assert sorted(os.listdir(tmp_path)) == ['Bloret-Launcher'], "替换后不应留下暂存目录或旧目录"
+
+
+def test_swap_install_dir_rolls_back_on_failure(tmp_path, monkeypatch):
+    """替换失败时旧安装保持原样"""
+    from installer import Page3, make_staging_dir
+    install_path = str(tmp_path / 'Bloret-Launcher')
+    old_files = {'Bloret-Launcher.exe': b'old', 'config/user.json': b'user'}
+    _write_tree(install_path, old_files)
+    staging = make_staging_dir(install_path)
+    _write_tree(staging, {'Bloret-Launcher.exe': b'new'})
+
+    real_rename = os.rename
+
+    def failing_rename(src, dst):
+        if src == staging:
+            raise PermissionError("安装目录被占用")
+        return real_rename(src, dst)
+
+    monkeypatch.setattr(os, 'rename', failing_rename)
+    try:
+        Page3().swap_install_dir(staging, install_path)
+        assert False, "应抛出异常"
+    except PermissionError:
+        pass
+    monkeypatch.undo()
+
+    assert _read_tree(install_path) == old_files
+    assert _read_tree(staging) == {'Bloret-Launcher.exe': b'new'}
+
+
+def test_install_failure_shown_in_gui_thread(tmp_path, monkeypatch):
+    """替换安装目录失败时，错误信息回到 GUI 线程显示，安装页不会卡住"""
+    import threading
+    import installer
+    from installer import Page3
+    install_path = str(tmp_path / 'Bloret-Launcher')
+    old_files = {'Bloret-Launcher/Bloret-Launcher.exe': b'old'}
+    _write_tree(install_path, old_files)
+    zip_path = tmp_path / 'package.zip'
+    zip_path.write_bytes(_build_zip(ZIP_FILES))
+
+    def failing_swap(self, staging, install_path, names=()):
+        raise PermissionError("安装目录被占用")
+
+    monkeypatch.setattr(installer.Page3, 'swap_install_dir', failing_swap)
+    errors = []
+    page = Page3()
+    page.install_failed.connect(lambda message: errors.append((message, threading.current_thread())))
+    page.start_installation({'install_path': install_path, 'downloaded_file': str(zip_path),
+                             'extracted_dir': ''})
+
+    assert wait_for(lambda: page.finish_button.isVisibleTo(page), timeout=20)
+    assert len(errors) == 1 and "安装目录被占用" in errors[0][0]
+    assert errors[0][1] is threading.main_thread()
+    assert page.title_label.text() == "安装失败 / Installation Failed"
+    assert _read_tree(install_path) == old_files
+    assert sorted(os.listdir(tmp_path)) == ['Bloret-Launcher'], "失败后应清理暂存目录和下载文件"
+
+
+def test_extract_zip_parallel(tmp_path):
+    """多线程解压结果与 zip 内容一致，字节进度最终等于总大小"""
+    from installer import extract_zip_parallel
+    files = dict(ZIP_FILES)
+    for i in range(20):
+        files[f'Bloret-Launcher/libs/lib{i}.dll'] = (os.urandom(1000 * i), 8)
+    zip_path = tmp_path / 'package.zip'
+    zip_path.write_bytes(_build_zip(files))
+
+    reports = []
+    extract_zip_parallel(str(zip_path), str(tmp_path / 'out'), workers=4,
+                         progress_callback=lambda done, total: reports.append((done, total)))
+
+    _assert_extracted(str(tmp_path / 'out'), files)
+    total = sum(len(data) for data, _ in files.values())
+    assert reports and reports[-1] == (total, total)
+
+
+def test_extract_zip_parallel_detects_corruption(tmp_path):
+    """条目数据损坏时抛出 BadZipFile"""
+    import zipfile
+    from installer import extract_zip_parallel
+    data = bytearray(_build_zip({'Bloret-Launcher/readme.txt': (b'bloret' * 1000, 0)}))
+    offset = data.index(b'bloret')
+    data[offset:offset + 6] = b'BLORET'
+    zip_path = tmp_path / 'broken.zip'
+    zip_path.write_bytes(bytes(data))
+    try:
+        extract_zip_parallel(str(zip_path), str(tmp_path / 'out'), workers=2)
+        assert False, "应检测到 CRC 错误"
+    except zipfile.BadZipFile:
+        pass
+
+
+def test_incremental_install_skips_unchanged_files(tmp_path):
+    """再次安装时只写入变化的文件，未变化的文件通过替换目录保留下来"""
+    import zipfile
+    from installer import InstallIndex, Page3, extract_zip_parallel, make_staging_dir
+    install_path = str(tmp_path / 'Bloret-Launcher')
+    old_files = {name: data for name, (data, _) in ZIP_FILES.items()}
+    old_files['Bloret-Launcher/readme.txt'] = b'old readme'
+    _write_tree(install_path, old_files)
+    zip_path = tmp_path / 'package.zip'
+    zip_path.write_bytes(_build_zip(ZIP_FILES))
+    with zipfile.ZipFile(zip_path) as zf:
+        infos = zf.infolist()
+
+    page = Page3()
+    staging = make_staging_dir(install_path)
+    skipped = extract_zip_parallel(str(zip_path), staging, install_index=InstallIndex(install_path))
+    assert skipped == 2
+    assert _read_tree(staging) == {'Bloret-Launcher/readme.txt': ZIP_FILES['Bloret-Launcher/readme.txt'][0]}
+    assert page.skipped_files_present(staging, install_path, [info.filename for info in infos if not info.is_dir()])
+
+    page.swap_install_dir(staging, install_path, [info.filename for info in infos if not info.is_dir()])
+    page.save_install_index(install_path, infos)
+    installed = _read_tree(install_path)
+    assert installed.pop('.bloret-install-index.json')
+    assert installed == {name: data for name, (data, _) in ZIP_FILES.items()}
+
+
+def test_install_index_uses_cached_crc(tmp_path):
+    """大小和修改时间未变时使用索引中的 CRC，不重新读取文件"""
+    import zipfile
+    from installer import InstallIndex
+    install_path = str(tmp_path / 'Bloret-Launcher')
+    _write_tree(install_path, {'Bloret-Launcher/readme.txt': b'bloret v1'})
+    info = zipfile.ZipInfo('Bloret-Launcher/readme.txt')
+    info.CRC = zipfile.crc32(b'bloret v1')
+    info.file_size = 9
+
+    index = InstallIndex(install_path)
+    index.rebuild([info])
+    index.save()
+
+    # 内容改变但大小和修改时间不变：索引仍认为未变化（说明没有重新读取）
+    path = os.path.join(install_path, 'Bloret-Launcher', 'readme.txt')
+    stat = os.stat(path)
+    with open(path, 'wb') as f:
+        f.write(b'bloret v2')
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert InstallIndex(install_path).is_unchanged(info.filename, info.CRC, 9)
+
+    # 修改时间变化后重新计算 CRC
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert not InstallIndex(install_path).is_unchanged(info.filename, info.CRC, 9)
+
+
+def test_streaming_extract_skips_unchanged_files(tmp_path):
+    """边下边解压时与现有安装相同的文件直接跳过，校验仍然通过"""
+    from installer import NetworkWorker
+
+    class ZipHandler(RangeHandler):
+        payload = _build_zip(ZIP_FILES)
+
+    install_path = str(tmp_path / 'Bloret-Launcher')
+    _write_tree(install_path, {'Bloret-Launcher/Bloret-Launcher.exe': ZIP_FILES['Bloret-Launcher/Bloret-Launcher.exe'][0]})
+    worker = NetworkWorker()
+    worker.install_path = install_path
+    extracted = []
+    worker.download_extracted.connect(extracted.append)
+    server, url = start_server(ZipHandler)
+    try:
+        worker.download_file(url, 'bloret_test_stream_incremental.zip')
+    finally:
+        server.shutdown()
+        os.remove(os.path.join(tempfile.gettempdir(), 'bloret_test_stream_incremental.zip'))
+    assert extracted and os.path.dirname(extracted[0]) == str(tmp_path)
+    staged = _read_tree(extracted[0])
+    assert 'Bloret-Launcher/Bloret-Launcher.exe' not in staged
+    assert set(staged) == set(ZIP_FILES) - {'Bloret-Launcher/Bloret-Launcher.exe'}
+
+
+def test_parse_manifest_resolves_urls():
+    """文件清单中的相对地址和 pack 偏移应解析为可直接下载的地址"""
+    from installer import parse_manifest
+    manifest = {
+        'version': '25.1',
+        'base_url': 'files/',
+        'pack': '/packs/25.1.pack',
+        'files': [
+            {'path': 'Bloret-Launcher.exe', 'size': 3, 'sha256': 'AB'},
+            {'path': 'data\\config.json', 'size': 4, 'sha256': 'cd', 'offset': 10},
+        ],
+    }
+    files = parse_manifest(manifest, 'http://example.com/releases/25.1/manifest.json')
+    assert files[0]['url'] == 'http://example.com/releases/25.1/files/Bloret-Launcher.exe'
+    assert files[0]['offset'] is None and files[0]['sha256'] == 'ab'
+    assert files[1]['path'] == 'data/config.json'
+    assert files[1]['url'] == 'http://example.com/packs/25.1.pack' and files[1]['offset'] == 10
+
+
+def _manifest_server(files, manifest_status=200, patches=None):
+    """提供文件清单、单个文件和 pack 文件的服务器；返回 (server, 清单地址, 请求记录)
+
+    patches: {文件名: (旧版本内容, 补丁内容)}，补丁放在 /patches/<文件名>.patch
+    """
+    import hashlib
+    import json
+    names = sorted(files)
+    pack = b''.join(files[name] for name in names)
+    offsets, offset = {}, 0
+    for name in names:
+        offsets[name] = offset
+        offset += len(files[name])
+    manifest = {'version': '25.1', 'base_url': 'files/', 'pack': 'launcher.pack', 'files': [
+        dict({'path': name, 'size': len(files[name]), 'sha256': hashlib.sha256(files[name]).hexdigest()},
+             **({'offset': offsets[name]} if name.endswith('.json') else {}))
+        for name in names]}
+    patches = patches or {}
+    for entry in manifest['files']:
+        if entry['path'] in patches:
+            old, patch = patches[entry['path']]
+            entry['patches'] = [{'from_sha256': hashlib.sha256(old).hexdigest(), 'size': len(patch),
+                                 'url': f"../patches/{entry['path']}.patch"}]
+    requested = []
+
+    class ManifestHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            requested.append(self.path)
+            status, body = 404, b''
+            if self.path == '/manifest.json':
+                status, body = manifest_status, json.dumps(manifest).encode('utf-8')
+            elif self.path.startswith('/files/') and self.path[len('/files/'):] in files:
+                status, body = 200, files[self.path[len('/files/'):]]
+            elif self.path.startswith('/patches/') and self.path[len('/patches/'):-len('.patch')] in patches:
+                status, body = 200, patches[self.path[len('/patches/'):-len('.patch')]][1]
+            elif self.path == '/launcher.pack':
+                start, end = map(int, re.match(r'bytes=(\d+)-(\d+)', self.headers['Range']).groups())
+                status, body = 206, pack[start:end + 1]
+            self.send_response(status)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ManifestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/manifest.json", requested
+
+
+def test_delta_update_downloads_only_changed_files(tmp_path):
+    """已有安装时只下载缺失或变化的文件（单独文件地址和 pack 偏移两种方式）"""
+    from installer import NetworkWorker
+    new_files = {
+        'Bloret-Launcher.exe': os.urandom(200000),
+        'libs/core.dll': os.urandom(300000),
+        'data/config.json': b'{"version": "25.1"}',
+        'data/theme.json': b'{"theme": "dark"}',
+    }
+    install_path = str(tmp_path / 'Bloret-Launcher')
+    _write_tree(install_path, {
+        'Bloret-Launcher.exe': new_files['Bloret-Launcher.exe'],
+        'libs/core.dll': new_files['libs/core.dll'],
+        'data/config.json': b'{"version": "25.0"}',
+        'config/user.json': b'user',
+    })
+
+    server, manifest_url, requested = _manifest_server(new_files)
+    worker = NetworkWorker()
+    worker.install_path = install_path
+    extracted, completed, errors = [], [], []
+    worker.download_extracted.connect(extracted.append)
+    worker.download_complete.connect(completed.append)
+    worker.error_occurred.connect(errors.append)
+    try:
+        worker.download_update([manifest_url], 'http://127.0.0.1:1/unused.zip', 'bloret_test_delta.zip')
+    finally:
+        server.shutdown()
+    assert not errors, f"下载出错: {errors}"
+    assert completed and completed[0].endswith('.manifest.json')
+    try:
+        assert sorted(requested) == ['/launcher.pack', '/launcher.pack', '/manifest.json']
+        assert _read_tree(extracted[0]) == {name: new_files[name] for name in ('data/config.json', 'data/theme.json')}
+    finally:
+        shutil.rmtree(extracted[0], ignore_errors=True)
+        os.remove(completed[0])
+
+
+def test_delta_update_falls_back_to_full_package(tmp_path):
+    """文件清单不可用时回退到下载完整安装包"""
+    from installer import NetworkWorker
+    manifest_server, manifest_url, _ = _manifest_server({'a.txt': b'a'}, manifest_status=404)
+    zip_server, zip_url = start_server(RangeHandler)
+    worker = NetworkWorker()
+    worker.install_path = str(tmp_path)
+    completed, errors = [], []
+    worker.download_complete.connect(completed.append)
+    worker.error_occurred.connect(errors.append)
+    try:
+        worker.download_update([manifest_url], zip_url, 'bloret_test_delta_fallback.zip')
+    finally:
+        manifest_server.shutdown()
+        zip_server.shutdown()
+    assert not errors, f"下载出错: {errors}"
+    try:
+        with open(completed[0], 'rb') as f:
+            assert f.read() == PAYLOAD
+    finally:
+        os.remove(completed[0])
+
+
+def _offtout(value):
+    return (abs(value) | (1 << 63 if value < 0 else 0)).to_bytes(8, 'little')
+
+
+def _make_bsdiff(old, new, controls):
+    """按给定的控制数据 [(相加长度, 额外长度, 旧文件偏移), ...] 生成 BSDIFF40 补丁"""
+    import bz2
+    ctrl, diff, extra = bytearray(), bytearray(), bytearray()
+    old_pos = new_pos = 0
+    for add_len, copy_len, seek_len in controls:
+        ctrl += _offtout(add_len) + _offtout(copy_len) + _offtout(seek_len)
+        for i in range(add_len):
+            old_byte = old[old_pos + i] if 0 <= old_pos + i < len(old) else 0
+            diff.append((new[new_pos + i] - old_byte) & 0xff)
+        extra += new[new_pos + add_len:new_pos + add_len + copy_len]
+        old_pos += add_len + seek_len
+        new_pos += add_len + copy_len
+    assert new_pos == len(new)
+    ctrl, diff, extra = bz2.compress(bytes(ctrl)), bz2.compress(bytes(diff)), bz2.compress(bytes(extra))
+    return b'BSDIFF40' + _offtout(len(ctrl)) + _offtout(len(diff)) + _offtout(len(new)) + ctrl + diff + extra
+
+
+def _patched_pair():
+    """旧文件和新文件：新文件大部分由旧文件的片段少量修改而来"""
+    old = bytearray(os.urandom(3 * 1024 * 1024))
+    new = bytearray(old[1024 * 1024:]) + os.urandom(5000) + old[:500000]
+    for i in range(0, len(new), 4096):
+        new[i] ^= 0x5a
+    controls = [(0, 0, 1024 * 1024), (2 * 1024 * 1024, 5000, -3 * 1024 * 1024), (500000, 0, 0)]
+    return bytes(old), bytes(new), _make_bsdiff(old, new, controls)
+
+
+def test_apply_bsdiff_patch(tmp_path):
+    """流式应用 BSDIFF40 补丁，结果与新文件一致"""
+    import hashlib
+    from installer import apply_bsdiff_patch
+    old, new, patch = _patched_pair()
+    (tmp_path / 'old').write_bytes(old)
+    (tmp_path / 'patch').write_bytes(patch)
+    digest = apply_bsdiff_patch(str(tmp_path / 'old'), str(tmp_path / 'patch'), str(tmp_path / 'new'))
+    assert (tmp_path / 'new').read_bytes() == new
+    assert digest == hashlib.sha256(new).hexdigest()
+    assert len(patch) < len(new) // 10
+
+
+def test_delta_update_applies_binary_patch(tmp_path):
+    """现有文件是补丁的旧版本时只下载补丁；补丁损坏时回退到完整文件"""
+    from installer import NetworkWorker
+    old, new, patch = _patched_pair()
+    new_files = {'Bloret-Launcher.exe': new, 'libs/core.dll': os.urandom(4 * 1024 * 1024)}
+    for broken in (False, True):
+        install_path = str(tmp_path / f'install-{broken}')
+        _write_tree(install_path, {'Bloret-Launcher.exe': old, 'libs/core.dll': new_files['libs/core.dll']})
+        served_patch = patch[:-10] + bytes(10) if broken else patch
+        server, manifest_url, requested = _manifest_server(
+            new_files, patches={'Bloret-Launcher.exe': (old, served_patch)})
+        worker = NetworkWorker()
+        worker.install_path = install_path
+        extracted, errors = [], []
+        worker.download_extracted.connect(extracted.append)
+        worker.error_occurred.connect(errors.append)
+        try:
+            worker.download_update([manifest_url], 'http://127.0.0.1:1/unused.zip', 'bloret_test_patch.zip')
+        finally:
+            server.shutdown()
+        assert not errors and extracted, f"下载出错: {errors}"
+        try:
+            assert _read_tree(extracted[0]) == {'Bloret-Launcher.exe': new}
+            expected = ['/manifest.json', '/patches/Bloret-Launcher.exe.patch']
+            if broken:
+                expected.append('/files/Bloret-Launcher.exe')
+            assert requested == expected
+        finally:
+            shutil.rmtree(extracted[0], ignore_errors=True)
+
+
+def test_package_cache_lru_and_lookup(tmp_path):
+    """按地址或哈希查找安装包，超出容量时淘汰最久未使用的安装包；按地址查找时需服务器上的文件未变化"""
+    import hashlib
+    import time
+    from installer import PackageCache
+    cache = PackageCache(str(tmp_path / 'cache'), max_size=250)
+    packages = {}
+    for i in range(3):
+        data = os.urandom(100)
+        path = tmp_path / f'p{i}.zip'
+        path.write_bytes(data)
+        packages[i] = hashlib.sha256(data).hexdigest()
+        cache.put(str(path), packages[i], [f'http://example.com/{i}.zip'],
+                  {f'http://example.com/{i}.zip': {'etag': f'"v{i}"', 'last_modified': ''}})
+        if i == 1:
+            # 使用第 0 个，第 1 个成为最久未使用
+            time.sleep(0.01)
+            assert cache.fetch(packages[0], str(tmp_path / 'out.zip'))
+        time.sleep(0.01)
+    probed = []
+
+    def probe(url):
+        probed.append(url)
+        return {'total_size': 100, 'etag': '"v0"', 'last_modified': ''}
+
+    assert cache.lookup(['http://example.com/0.zip']) is None, "没有哈希也没有 probe 时不应按地址命中"
+    assert cache.lookup(['http://example.com/0.zip'], probe=probe) == packages[0]
+    assert cache.lookup(['http://example.com/2.zip'], probe=probe) is None, "ETag 不同说明文件已更新"
+    assert cache.lookup(['http://example.com/1.zip'], probe=probe) is None
+    assert probed == ['http://example.com/0.zip', 'http://example.com/2.zip'], "只有缓存中有该地址时才探测"
+    assert cache.lookup(sha256=packages[2]) == packages[2]
+
+    # 缓存文件损坏时 fetch 失败并移除该条目
+    with open(os.path.join(cache.directory, packages[2] + '.zip'), 'r+b') as f:
+        f.write(b'x')
+    assert not cache.fetch(packages[2], str(tmp_path / 'out.zip'))
+    assert cache.lookup(sha256=packages[2]) is None
+
+
+def test_reinstall_uses_package_cache_without_network(isolated_package_cache):
+    """下载完成后安装包进入缓存，已知哈希时再次下载不访问网络"""
+    import hashlib
+    digest = {'sha256': hashlib.sha256(PAYLOAD).hexdigest()}
+    server, url = start_server(RangeHandler)
+    try:
+        completed, _, errors = run_download(url, 'bloret_test_cache.zip', digest)
+        assert not errors and completed
+    finally:
+        server.shutdown()
+    os.remove(completed[0])
+
+    # 服务器已关闭，仍可从缓存得到安装包
+    completed, progress, errors = run_download(url, 'bloret_test_cache.zip', digest)
+    assert not errors, f"下载出错: {errors}"
+    try:
+        with open(completed[0], 'rb') as f:
+            assert f.read() == PAYLOAD
+        assert progress[-1]['percent'] == 100
+    finally:
+        os.remove(completed[0])
+
+
+def test_shared_package_cache_tier(isolated_package_cache, tmp_path):
+    """本地缓存未命中时使用只读共享缓存，并复制到本地缓存"""
+    import hashlib
+    from installer import PackageCache
+    url = 'http://127.0.0.1:1/Bloret-Launcher-Windows.zip'
+    sha256 = hashlib.sha256(PAYLOAD).hexdigest()
+    shared_dir = tmp_path / 'share'
+    writer = PackageCache(str(shared_dir), max_size=10 ** 9)
+    (tmp_path / 'seed.zip').write_bytes(PAYLOAD)
+    writer.put(str(tmp_path / 'seed.zip'), sha256, [url])
+    isolated_package_cache.append(PackageCache(str(shared_dir), read_only=True))
+
+    completed, _, errors = run_download(url, 'bloret_test_shared_cache.zip', {'sha256': sha256})
+    assert not errors, f"下载出错: {errors}"
+    try:
+        with open(completed[0], 'rb') as f:
+            assert f.read() == PAYLOAD
+    finally:
+        os.remove(completed[0])
+    assert isolated_package_cache[0].lookup(sha256=sha256) == sha256
+
+
+class ChangingETagHandler(RangeHandler):
+    """ETag 可以改变的文件服务器（模拟同一地址上的安装包已更新）"""
+    etag = '"bloret-test"'
+    requested_ranges = []
+
+    def _send_headers(self, status, length, extra=None):
+        self.send_response(status)
+        self.send_header('Content-Length', str(length))
+        self.send_header('ETag', self.etag)
+        self.send_header('Accept-Ranges', 'bytes')
+        for key, value in (extra or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+
+
+def test_package_cache_without_hash_revalidates_with_server():
+    """没有哈希时只有服务器上的文件大小和 ETag 未变化才使用缓存的安装包"""
+    ChangingETagHandler.etag = '"bloret-v1"'
+    ChangingETagHandler.requested_ranges = []
+    server, url = start_server(ChangingETagHandler)
+    path = os.path.join(tempfile.gettempdir(), 'bloret_test_revalidate.zip')
+    try:
+        completed, _, errors = run_download(url, 'bloret_test_revalidate.zip')
+        assert not errors and completed
+        os.remove(path)
+
+        # 文件未变化：命中缓存，不再 GET
+        ChangingETagHandler.requested_ranges = []
+        completed, _, errors = run_download(url, 'bloret_test_revalidate.zip')
+        assert not errors and completed
+        assert not ChangingETagHandler.requested_ranges, "文件未变化时应使用缓存"
+        os.remove(path)
+
+        # 同一地址上的文件已更新：不使用缓存，重新下载
+        ChangingETagHandler.etag = '"bloret-v2"'
+        completed, _, errors = run_download(url, 'bloret_test_revalidate.zip')
+        assert not errors and completed
+        assert ChangingETagHandler.requested_ranges, "ETag 变化后应重新下载"
+    finally:
+        server.shutdown()
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class CountingHeadHandler(ChangingETagHandler):
+    heads = 0
+
+    def do_HEAD(self):
+        CountingHeadHandler.heads += 1
+        super().do_HEAD()
+
+
+def test_download_update_probes_server_once(tmp_path):
+    """增量更新回退到完整安装包时，缓存查找和下载共用一次 HEAD 探测"""
+    from installer import NetworkWorker
+    CountingHeadHandler.etag = '"bloret-v1"'
+    manifest_server, manifest_url, _ = _manifest_server({'a.txt': b'a'}, manifest_status=404)
+    server, url = start_server(CountingHeadHandler)
+    path = os.path.join(tempfile.gettempdir(), 'bloret_test_probe_once.zip')
+    try:
+        completed, _, errors = run_download(url, 'bloret_test_probe_once.zip')
+        assert not errors and completed
+        os.remove(path)
+
+        for etag in ('"bloret-v1"', '"bloret-v2"'):  # 缓存命中 / 服务器文件已更新
+            CountingHeadHandler.etag = etag
+            CountingHeadHandler.heads = 0
+            worker = NetworkWorker()
+            worker.install_path = str(tmp_path)
+            completed, errors = [], []
+            worker.download_complete.connect(completed.append)
+            worker.error_occurred.connect(errors.append)
+            worker.download_update([manifest_url], url, 'bloret_test_probe_once.zip')
+            assert not errors and completed, f"下载出错: {errors}"
+            assert CountingHeadHandler.heads == 1, f"{etag}: HEAD 请求了 {CountingHeadHandler.heads} 次"
+            os.remove(path)
+    finally:
+        manifest_server.shutdown()
+        server.shutdown()
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def test_collect_package_digest():
+    """应读取 /api/info 中的 SHA-256 和分块哈希，优先 gitcode"""
+    from installer import collect_package_digest
+    data = {'downloads': {'stable': {
+        'github': {'zip': 'https://github.example/a.zip', 'sha256': 'BBBB'},
+        'gitcode': {'zip': 'https://gitcode.example/a.zip', 'sha256': 'AAAA',
+                    'block_size': 1024, 'block_sha256': ['C1', 'C2']},
+    }}}
+    assert collect_package_digest(data) == {'sha256': 'aaaa', 'block_size': 1024, 'block_sha256': ['c1', 'c2']}
+    assert collect_package_digest({'downloads': {'stable': {'gitcode': {'zip': 'x'}}}}) == {}
+
+
+def _block_digest(payload, block_size):
+    import hashlib
+    return {
+        'sha256': hashlib.sha256(payload).hexdigest(),
+        'block_size': block_size,
+        'block_sha256': [hashlib.sha256(payload[i:i + block_size]).hexdigest()
+                         for i in range(0, len(payload), block_size)],
+    }
+
+
+class CorruptOnceHandler(RangeHandler):
+    """第一次返回包含 CORRUPT_OFFSET 的区间时篡改一个字节"""
+    requested_ranges = []
+    corrupted = []
+    CORRUPT_OFFSET = 3 * 1024 * 1024 + 5
+
+    def do_GET(self):
+        self.requested_ranges.append(self.headers.get('Range', ''))
+        match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        start = int(match.group(1)) if match else 0
+        end = int(match.group(2)) if match and match.group(2) else len(self.payload) - 1
+        body = bytearray(self.payload[start:end + 1])
+        if not self.corrupted and start <= self.CORRUPT_OFFSET <= end:
+            self.corrupted.append(self.CORRUPT_OFFSET)
+            body[self.CORRUPT_OFFSET - start] ^= 0xFF
+        if match:
+            self._send_headers(206, len(body), {'Content-Range': f'bytes {start}-{end}/{len(self.payload)}'})
+        else:
+            self._send_headers(200, len(body))
+        self.wfile.write(bytes(body))
+
+
+def test_download_verifies_sha256():
+    """下载时应同步计算 SHA-256，与 /api/info 一致时正常完成并按哈希写入缓存"""
+    import hashlib
+    import installer
+    server, url = start_server(RangeHandler)
+    try:
+        digest = {'sha256': hashlib.sha256(PAYLOAD).hexdigest()}
+        completed, progress, errors = run_download(url, 'bloret_test_verify.zip', digest)
+        assert not errors, f"下载出错: {errors}"
+        assert installer.get_package_caches()[0].lookup(sha256=digest['sha256']) == digest['sha256']
+    finally:
+        server.shutdown()
+        os.remove(os.path.join(tempfile.gettempdir(), 'bloret_test_verify.zip'))
+
+
+def test_download_refetches_corrupted_block():
+    """分块哈希不一致时只重新下载损坏的块"""
+    CorruptOnceHandler.requested_ranges = []
+    CorruptOnceHandler.corrupted = []
+    server, url = start_server(CorruptOnceHandler)
+    block_size = 256 * 1024
+    try:
+        completed, progress, errors = run_download(url, 'bloret_test_refetch.zip', _block_digest(PAYLOAD, block_size))
+        assert not errors, f"下载出错: {errors}"
+        with open(completed[0], 'rb') as f:
+            assert f.read() == PAYLOAD, "重新下载后的内容应与原文件一致"
+        assert CorruptOnceHandler.corrupted, "测试服务器应篡改过一次数据"
+        block_start = CorruptOnceHandler.CORRUPT_OFFSET // block_size * block_size
+        assert CorruptOnceHandler.requested_ranges[-1] == f'bytes={block_start}-{block_start + block_size - 1}', \
+            f"应只重新请求损坏的块: {CorruptOnceHandler.requested_ranges}"
+    finally:
+        server.shutdown()
+        os.remove(os.path.join(tempfile.gettempdir(), 'bloret_test_refetch.zip'))
+
+
+def test_download_rejects_wrong_digest():
+    """重新下载后仍与 /api/info 的哈希不一致时应报告错误，且不产生安装包"""
+    import hashlib
+    server, url = start_server(RangeHandler)
+    try:
+        digest = {'sha256': hashlib.sha256(b'other').hexdigest()}
+        completed, progress, errors = run_download(url, 'bloret_test_badsum.zip', digest)
+        assert not completed
+        assert errors and '校验失败' in errors[0]
+        assert not os.path.exists(os.path.join(tempfile.gettempdir(), 'bloret_test_badsum.zip'))
+        assert not os.path.exists(os.path.join(tempfile.gettempdir(), 'bloret_test_badsum.zip.part'))
+    finally:
+        server.shutdown()
+
+
+def test_download_target_positional_writes(tmp_path):
+    """预分配的下载文件应支持多线程按偏移写入，并可从映射读取"""
+    from installer import DownloadTarget
+    path = str(tmp_path / 'package.zip.part')
+    target = DownloadTarget(path, len(PAYLOAD))
+    assert os.path.getsize(path) == len(PAYLOAD), "应预分配到完整大小"
+    block = 1024 * 1024
+    threads = [threading.Thread(target=target.write_at, args=(pos, PAYLOAD[pos:pos + block]))
+               for pos in range(0, len(PAYLOAD), block)]
+    for thread in reversed(threads):
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert target.read_at(block, 16) == PAYLOAD[block:block + 16]
+    with pytest.raises(Exception):
+        target.write_at(len(PAYLOAD) - 1, b'xx')
+    target.close()
+    assert target.read_at(0, 16) is None, "关闭后应改为由调用方读取文件"
+    with open(path, 'rb') as f:
+        assert f.read() == PAYLOAD
+
+    # 续传时保留已有内容
+    target = DownloadTarget(path, len(PAYLOAD), preallocate=False)
+    assert target.read_at(0, 16) == PAYLOAD[:16]
+    target.close()
+
+
+def test_adaptive_chunk_size():
+    """读取大小应随速度增长（每次最多翻倍），速度下降时缩小，且不超出上下限"""
+    from installer import AdaptiveChunkSize
+    sizer = AdaptiveChunkSize(minimum=64 * 1024, maximum=4 * 1024 * 1024, target_time=0.25)
+    sizes = []
+    for _ in range(10):
+        # 100MB/s 的连接
+        sizer.update(sizer.size, sizer.size / (100 * 1024 * 1024))
+        sizes.append(sizer.size)
+    assert sizes[0] == 128 * 1024, "每次最多翻倍"
+    assert sizes[-1] == 4 * 1024 * 1024, "不应超过上限"
+    sizer.update(sizer.size, 10.0)
+    assert sizer.size == 2 * 1024 * 1024, "速度下降时每次最多减半"
+    sizer.update(1024, 10.0)
+    assert sizer.size == 2 * 1024 * 1024, "短块不应影响读取大小"
+    for _ in range(10):
+        sizer.update(sizer.size, 10.0)
+    assert sizer.size == 64 * 1024, "不应低于下限"
+
+
+def test_iter_response_chunks_respects_limit():
+    """按分段长度读取时不应多读"""
+    import installer
+    server, url = start_server(RangeHandler)
+    try:
+        response = installer.get_http_session().get(url, stream=True)
+        chunks = list(installer.iter_response_chunks(response, 1000 * 1000))
+        response.close()
+        assert b''.join(chunks) == PAYLOAD[:1000 * 1000]
+    finally:
+        server.shutdown()
+
+
+def test_progress_tracker_speed_and_eta():
+    """进度记录应包含字节数、当前速度、平滑速度和剩余时间"""
+    from installer import ProgressTracker, format_progress_text, make_progress_record
+    tracker = ProgressTracker(window=2.0, smoothing=5.0)
+    mb = 1024 * 1024
+    record = tracker.update(0, 100 * mb, now=0.0)
+    assert record['speed'] == 0 and record['eta'] is None
+    for second in range(1, 5):
+        record = tracker.update(second * mb, 100 * mb, now=float(second))
+    assert record['speed'] == pytest.approx(mb)
+    assert record['avg_speed'] == pytest.approx(mb)
+    assert record['eta'] == pytest.approx(96)
+    assert format_progress_text(record) == "4% · 4.0 MB / 100.0 MB · 1.0 MB/s · 剩余 1:36"
+
+    # 速度突然变快时平滑速度逐步跟上
+    record = tracker.update(14 * mb, 100 * mb, now=5.0)
+    assert mb < record['avg_speed'] < 10 * mb
+
+    # 总大小未知
+    record = make_progress_record(3 * mb)
+    assert record['total'] is None and record['percent'] is None and record['eta'] is None
+    assert format_progress_text(record) == "3.0 MB"
+
+
+class TrickleOnceHandler(RangeHandler):
+    """第一次请求包含 TRICKLE_OFFSET 的区间时，先正常发送 64KB，之后每 0.1 秒只发送 1 字节"""
+    requested_ranges = []
+    trickled = []
+    TRICKLE_OFFSET = 2 * 1024 * 1024
+
+    def do_GET(self):
+        import time
+        self.requested_ranges.append(self.headers.get('Range', ''))
+        match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        start = int(match.group(1))
+        end = int(match.group(2)) if match.group(2) else len(self.payload) - 1
+        body = self.payload[start:end + 1]
+        self._send_headers(206, len(body), {'Content-Range': f'bytes {start}-{end}/{len(self.payload)}'})
+        if self.trickled or not start <= self.TRICKLE_OFFSET <= end:
+            self.wfile.write(body)
+            return
+        self.trickled.append(start)
+        sent = 64 * 1024
+        try:
+            self.wfile.write(body[:sent])
+            self.wfile.flush()
+            deadline = time.time() + 20
+            while sent < len(body) and time.time() < deadline:
+                self.wfile.write(body[sent:sent + 1])
+                self.wfile.flush()
+                sent += 1
+                time.sleep(0.1)
+        except OSError:
+            pass
+
+
+def test_stalled_segment_resumes_from_offset(monkeypatch):
+    """分段连接停滞时应断开并从已下载的位置重新请求"""
+    import time
+    import installer
+    monkeypatch.setattr(installer, 'STALL_WINDOW', 1.0)
+    monkeypatch.setattr(installer, 'STALL_MIN_SPEED', 256 * 1024)
+    monkeypatch.setattr(installer, 'STALL_CHECK_INTERVAL', 0.1)
+    TrickleOnceHandler.requested_ranges = []
+    TrickleOnceHandler.trickled = []
+    server, url = start_server(TrickleOnceHandler)
+    try:
+        started = time.time()
+        completed, progress, errors = run_download(url, 'bloret_test_stall.zip')
+        assert not errors, f"下载出错: {errors}"
+        assert time.time() - started < 10, "停滞的连接应在统计窗口后被断开"
+        with open(completed[0], 'rb') as f:
+            assert f.read() == PAYLOAD
+        stalled_start = TrickleOnceHandler.trickled[0]
+        assert f'bytes={stalled_start + 64 * 1024}-' in ' '.join(TrickleOnceHandler.requested_ranges), \
+            f"应从停滞前已下载的位置继续: {TrickleOnceHandler.requested_ranges}"
+    finally:
+        server.shutdown()
+        os.remove(os.path.join(tempfile.gettempdir(), 'bloret_test_stall.zip'))
+
+
+class SteadySlowHandler(NoRangeHandler):
+    """以约 40KB/s 的稳定速度发送（每 0.05 秒 2KB），读满一个 64KB 的块需要 1.6 秒"""
+    payload = os.urandom(160 * 1024)
+    requests = []
+
+    def do_GET(self):
+        import time
+        self.requests.append(self.path)
+        self._send_headers(200, len(self.payload))
+        try:
+            for offset in range(0, len(self.payload), 2048):
+                self.wfile.write(self.payload[offset:offset + 2048])
+                self.wfile.flush()
+                time.sleep(0.05)
+        except OSError:
+            pass
+
+
+@pytest.mark.parametrize('has_read1', [True, False])
+def test_slow_connection_above_floor_is_not_stalled(monkeypatch, has_read1):
+    """速度高于下限的慢速连接不应因为一块还没读满而被看门狗断开（urllib3 1.x 没有 read1 时同样）"""
+    import urllib3
+    import installer
+    if not has_read1:
+        # 模拟 urllib3 1.x：响应对象没有 read1
+        monkeypatch.delattr(urllib3.response.HTTPResponse, 'read1')
+        monkeypatch.delattr(urllib3.response.BaseHTTPResponse, 'read1', raising=False)
+    monkeypatch.setattr(installer, 'STALL_WINDOW', 1.0)
+    monkeypatch.setattr(installer, 'STALL_MIN_SPEED', 10 * 1024)
+    monkeypatch.setattr(installer, 'STALL_CHECK_INTERVAL', 0.1)
+    SteadySlowHandler.requests = []
+    server, url = start_server(SteadySlowHandler)
+    try:
+        completed, progress, errors = run_download(url, 'bloret_test_steady_slow.zip')
+        assert not errors, f"下载出错: {errors}"
+        assert len(SteadySlowHandler.requests) == 1, "连接不应被判定为停滞而重新连接"
+        with open(completed[0], 'rb') as f:
+            assert f.read() == SteadySlowHandler.payload
+    finally:
+        server.shutdown()
+        os.remove(os.path.join(tempfile.gettempdir(), 'bloret_test_steady_slow.zip'))
+
+
+def test_stall_watchdog_floor():
+    """速度在完整窗口内低于下限才断开连接"""
+    from installer import StallWatchdog
+
+    class FakeResponse:
+        closed = False
+        raw = None
+
+        def close(self):
+            self.closed = True
+
+    watchdog = StallWatchdog(window=2.0, min_speed=1000, interval=0.5)
+    fast, slow = FakeResponse(), FakeResponse()
+    fast_conn, slow_conn = watchdog.watch(fast), watchdog.watch(slow)
+    for conn in (fast_conn, slow_conn):
+        conn.monitor.samples.clear()
+        conn.monitor.add_sample(0, now=0.0)
+    fast_conn.arrived, slow_conn.arrived = 5000, 100
+    watchdog.check(now=1.0)
+    assert not slow.closed, "窗口未满时不应断开"
+    fast_conn.arrived, slow_conn.arrived = 10000, 200
+    watchdog.check(now=2.5)
+    assert slow.closed and slow_conn.stalled
+    assert not fast.closed and not fast_conn.stalled
+
+
+def test_retry_policy_classify_and_delay():
+    """应区分错误类型，429 遵守 Retry-After，其余按带抖动的指数退避"""
+    import socket
+    import requests
+    from installer import RetryPolicy, IncompleteDownloadError, DownloadCancelledError
+
+    def http_error(status, headers=None):
+        response = requests.Response()
+        response.status_code = status
+        response.headers.update(headers or {})
+        return requests.HTTPError(response=response)
+
+    def wrapped(cause):
+        # 模拟 requests 包装底层异常的方式
+        try:
+            raise cause
+        except Exception as e:
+            return requests.ConnectionError(e)
+
+    classify = RetryPolicy.classify
+    assert classify(wrapped(socket.gaierror(-2, 'Name or service not known'))) == 'dns'
+    assert classify(wrapped(ConnectionRefusedError())) == 'connect'
+    assert classify(requests.ReadTimeout()) == 'timeout'
+    assert classify(wrapped(ConnectionResetError())) == 'reset'
+    assert classify(IncompleteDownloadError()) == 'reset'
+    assert classify(http_error(503)) == 'server'
+    assert classify(http_error(429)) == 'throttled'
+    assert classify(http_error(404)) is None
+    assert classify(DownloadCancelledError()) is None
+    assert classify(ValueError()) is None
+
+    policy = RetryPolicy(max_attempts=5, max_elapsed=60, base_delay=1.0, max_delay=8.0)
+    assert policy.delay(0, http_error(429, {'Retry-After': '7'})) == 7
+    for retry in range(6):
+        assert 0 <= policy.delay(retry, IncompleteDownloadError()) <= min(8.0, 2 ** retry)
+
+
+class ThrottleHandler(NoRangeHandler):
+    """前 3 次 GET 返回 429（Retry-After: 0），之后正常"""
+    throttled = []
+
+    def do_GET(self):
+        if len(self.throttled) < 3:
+            self.throttled.append(True)
+            self.send_response(429)
+            self.send_header('Retry-After', '0')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        super().do_GET()
+
+
+class DropOnceHandler(RangeHandler):
+    """第一次请求包含 DROP_OFFSET 的区间时只发送一部分数据就断开"""
+    requested_ranges = []
+    dropped = []
+    DROP_OFFSET = 4 * 1024 * 1024
+
+    def do_GET(self):
+        self.requested_ranges.append(self.headers.get('Range', ''))
+        match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        start = int(match.group(1))
+        end = int(match.group(2)) if match.group(2) else len(self.payload) - 1
+        body = self.payload[start:end + 1]
+        self._send_headers(206, len(body), {'Content-Range': f'bytes {start}-{end}/{len(self.payload)}'})
+        if self.dropped or not start <= self.DROP_OFFSET <= end:
+            self.wfile.write(body)
+            return
+        self.dropped.append(start)
+        self.wfile.write(body[:128 * 1024])
+        self.wfile.flush()
+        self.connection.shutdown(2)
+
+
+def test_download_retries_throttled_request(monkeypatch):
+    """429 应按 Retry-After 重试，并记入安装统计；连接池不再自动重试，每次 429 都由 RetryPolicy 处理"""
+    import installer
+    monkeypatch.setattr(installer, '_install_metrics', installer.InstallMetrics())
+    ThrottleHandler.throttled = []
+    server, url = start_server(ThrottleHandler)
+    try:
+        completed, progress, errors = run_download(url, 'bloret_test_throttle.zip')
+        assert not errors, f"下载出错: {errors}"
+        metrics = installer.get_install_metrics().snapshot()['download']
+        assert metrics['retries'] == 3 and metrics['errors'] == {'throttled': 3}
+        assert len(ThrottleHandler.throttled) == 3
+    finally:
+        server.shutdown()
+        os.remove(os.path.join(tempfile.gettempdir(), 'bloret_test_throttle.zip'))
+
+
+def test_install_metrics_saved_to_file(monkeypatch, tmp_path):
+    """安装统计应追加到记录文件，只保留最近 METRICS_HISTORY 条"""
+    import installer
+    monkeypatch.setattr(installer, 'METRICS_HISTORY', 3)
+    path = str(tmp_path / 'metrics' / 'install-metrics.jsonl')
+    metrics = installer.InstallMetrics()
+    metrics.record('download', 2, 1.5, {'reset': 2})
+    for i in range(4):
+        metrics.save(f'error {i}', path)
+    metrics.save('success', path)
+    with open(path, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+    assert [r['result'] for r in records] == ['error 2', 'error 3', 'success']
+    assert records[-1]['operations']['download'] == {'calls': 1, 'retries': 2, 'elapsed': 1.5,
+                                                     'errors': {'reset': 2}}
+
+
+def test_retry_policy_requests_bypass_pool_retries():
+    """由 RetryPolicy 重试的请求使用不自动重试的会话，并与共享会话共用连接池"""
+    import installer
+    session = installer.get_http_session()
+    no_retry = installer.get_http_session(retries=False)
+    assert no_retry is not session and no_retry is installer.get_http_session(retries=False)
+    assert no_retry.get_adapter('https://').max_retries.total == 0
+    assert session.get_adapter('https://').max_retries.total == installer.HTTP_MAX_RETRIES
+    assert no_retry.get_adapter('http://').poolmanager is session.get_adapter('http://').poolmanager
+
+
+def test_download_resumes_after_connection_drop(monkeypatch):
+    """连接中断后应重试，并从已下载的位置继续，而不是从头下载"""
+    import installer
+    monkeypatch.setattr(installer, '_install_metrics', installer.InstallMetrics())
+    monkeypatch.setattr(installer, 'RETRY_BASE_DELAY', 0.05)
+    DropOnceHandler.requested_ranges = []
+    DropOnceHandler.dropped = []
+    server, url = start_server(DropOnceHandler)
+    try:
+        completed, progress, errors = run_download(url, 'bloret_test_drop.zip')
+        assert not errors, f"下载出错: {errors}"
+        with open(completed[0], 'rb') as f:
+            assert f.read() == PAYLOAD
+        dropped_start = DropOnceHandler.dropped[0]
+        assert any(r.startswith('bytes=') and int(re.match(r'bytes=(\d+)-', r).group(1)) > dropped_start
+                   for r in DropOnceHandler.requested_ranges), f"应从中断处续传: {DropOnceHandler.requested_ranges}"
+        # 分段由池中的线程并发请求，到达服务器的顺序不固定；从头重新下载会再次请求从 0 开始的区间
+        from_start = [r for r in DropOnceHandler.requested_ranges if r.startswith('bytes=0-')]
+        assert len(from_start) == len(set(from_start)), f"不应从头重新下载: {DropOnceHandler.requested_ranges}"
+        metrics = installer.get_install_metrics().snapshot()['download']
+        assert metrics['retries'] >= 1 and 'reset' in metrics['errors']
+    finally:
+        server.shutdown()
+        os.remove(os.path.join(tempfile.gettempdir(), 'bloret_test_drop.zip'))
+
+
+def test_resolve_host_interleaves_families_and_caches(monkeypatch):
+    """解析结果应按 IPv6 / IPv4 交替排列，并在进程内缓存"""
+    import socket
+    import installer
+    calls = []
+
+    def fake_getaddrinfo(host, port, family, sock_type):
+        calls.append(host)
+        v6 = [(socket.AF_INET6, socket.SOCK_STREAM, 6, '', (f'2001:db8::{i}', port, 0, 0)) for i in (1, 2)]
+        v4 = [(socket.AF_INET, socket.SOCK_STREAM, 6, '', (f'192.0.2.{i}', port)) for i in (1, 2, 3)]
+        return v6 + v4
+
+    monkeypatch.setattr(installer, '_resolved_hosts', {})
+    monkeypatch.setattr(socket, 'getaddrinfo', fake_getaddrinfo)
+    ordered = [info[4][0] for info in installer.resolve_host('mirror.example', 443)]
+    assert ordered == ['2001:db8::1', '192.0.2.1', '2001:db8::2', '192.0.2.2', '192.0.2.3']
+    installer.resolve_host('mirror.example', 443)
+    assert calls == ['mirror.example'], "同一主机只应解析一次"
+
+
+def test_happy_eyeballs_skips_unresponsive_address(monkeypatch):
+    """第一个地址无响应时，应在短暂间隔后改用下一个地址，而不是等到连接超时"""
+    import socket
+    import time
+    import installer
+
+    # backlog 已满的监听套接字不会响应新的连接请求，模拟不通的 IPv6 地址
+    black_hole = socket.socket()
+    black_hole.bind(('127.0.0.1', 0))
+    black_hole.listen(0)
+    fillers = []
+    for _ in range(4):
+        filler = socket.socket()
+        filler.setblocking(False)
+        filler.connect_ex(black_hole.getsockname())
+        fillers.append(filler)
+    time.sleep(0.1)
+
+    server, url = start_server(RangeHandler)
+    port = server.server_address[1]
+    monkeypatch.setattr(installer, '_resolved_hosts', {('bloret-mirror.test', port): [
+        (socket.AF_INET, socket.SOCK_STREAM, 6, '', black_hole.getsockname()),
+        (socket.AF_INET, socket.SOCK_STREAM, 6, '', ('127.0.0.1', port)),
+    ]})
+    try:
+        session = installer.create_http_session()
+        started = time.time()
+        response = session.get(f'http://bloret-mirror.test:{port}/package.zip', headers={'Range': 'bytes=0-9'},
+                               timeout=(5, 5))
+        assert response.content == PAYLOAD[:10]
+        assert time.time() - started < 2, "不应等到第一个地址连接超时"
+    finally:
+        server.shutdown()
+        black_hole.close()
+        for filler in fillers:
+            filler.close()